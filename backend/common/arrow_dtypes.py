@@ -0,0 +1,53 @@
+import os
+
+import pandas as pd
+import pyarrow as pa
+
+
+# Arrow native mode: uploads are parsed by the multithreaded pyarrow CSV reader
+# into Arrow backed columns, inferred and processed columns are kept Arrow
+# backed, and Parquet is read back without converting to NumPy.
+USE_ARROW_DTYPES = os.getenv("USE_ARROW_DTYPES", "false").lower() == "true"
+
+ARROW_READ_OPTIONS = {"dtype_backend": "pyarrow"} if USE_ARROW_DTYPES else {}
+ARROW_CSV_OPTIONS = {"engine": "pyarrow", **ARROW_READ_OPTIONS} if USE_ARROW_DTYPES else {}
+
+
+def is_arrow_string(col: pd.Series) -> bool:
+    return isinstance(col.dtype, pd.ArrowDtype) and (
+        pa.types.is_string(col.dtype.pyarrow_dtype)
+        or pa.types.is_large_string(col.dtype.pyarrow_dtype)
+    )
+
+
+def to_arrow_dtype(col: pd.Series) -> pd.Series:
+    """Return col backed by an Arrow array.
+
+    Categoricals are kept as they are: pandas supports few operations on Arrow
+    dictionary columns and Parquet stores both the same way. Arrow dates, which
+    the pyarrow CSV reader produces for ISO columns, become timestamps like the
+    NumPy path would.
+    """
+    if isinstance(col.dtype, pd.ArrowDtype):
+        if pa.types.is_date(col.dtype.pyarrow_dtype):
+            return col.astype(pd.ArrowDtype(pa.timestamp("ns")))
+        return col
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        return col
+    try:
+        array = pa.Array.from_pandas(col)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # e.g. object columns mixing ints and strings.
+        return col
+    return pd.Series(pd.arrays.ArrowExtensionArray(array), index=col.index, name=col.name)
+
+
+def arrow_types_mapper(arrow_type: pa.DataType):
+    """types_mapper for Table.to_pandas, keeps dictionaries as categoricals."""
+    if pa.types.is_dictionary(arrow_type):
+        return None
+    return pd.ArrowDtype(arrow_type)
+
+
+def to_arrow_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    return pd.DataFrame({col: to_arrow_dtype(df[col]) for col in df.columns}, index=df.index)
@@ -0,0 +1,79 @@
+"""Benchmark infer_date against the per element format="mixed" parser.
+
+showcase_data/3_show_date_format_support.csv is scaled to --rows rows. With
+--distinct the dates are shifted by a random number of days (keeping each
+column's layout), otherwise the file is repeated as is and to_datetime's own
+cache of repeated values flatters both parsers.
+
+    MINIO_URL=localhost:9000 python -m backend.common.benchmarks.date_formats --rows 2000000 --distinct
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from backend.common.data_processors import date_format_cache, infer_date, parse_mixed_dates
+
+
+SHOWCASE_FILE = (
+    Path(__file__).resolve().parents[3] / "showcase_data" / "3_show_date_format_support.csv"
+)
+COLUMN_LAYOUTS = {
+    "yyyy-mm-dd": "%Y-%m-%d",
+    "dd-mm-yyyy": "%m-%d-%Y",
+    "dd/mm/yy": "%m/%d/%y",
+    "dd-MM-yy": "%d-%b-%y",
+}
+
+
+def scale_showcase(rows: int, distinct: bool, seed: int = 0) -> pd.DataFrame:
+    df = pd.read_csv(SHOWCASE_FILE, dtype=str)
+    df = df.iloc[np.arange(rows) % len(df)].reset_index(drop=True)
+    if not distinct:
+        return df
+
+    rng = np.random.default_rng(seed)
+    dates = pd.to_datetime(df["yyyy-mm-dd"], errors="coerce", format="%Y-%m-%d")
+    dates = dates + pd.to_timedelta(rng.integers(-3650, 3650, rows), unit="D")
+    invalid = dates.isna()
+    for col, layout in COLUMN_LAYOUTS.items():
+        formatted = dates.dt.strftime(layout)
+        if layout == "%d-%b-%y":
+            formatted = formatted.str.upper()
+        # Keep the invalid rows of the file, like 2000-11-33.
+        df[col] = formatted.where(~invalid, df[col])
+    return df
+
+
+def timed(func, col: pd.Series) -> tuple[float, pd.Series]:
+    start = time.perf_counter()
+    result = func(col)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--distinct", action="store_true")
+    args = parser.parse_args()
+
+    df = scale_showcase(args.rows, args.distinct)
+    print(
+        f"{'column':<12} {'rows':>10} {'mixed s':>9} {'detect s':>9} {'cached s':>9} {'speedup':>8} same"
+    )
+    for col in df.columns:
+        date_format_cache.clear()
+        mixed_time, expected = timed(parse_mixed_dates, df[col])
+        detect_time, result = timed(infer_date, df[col])
+        cached_time, _ = timed(infer_date, df[col])
+        print(
+            f"{col:<12} {len(df):>10} {mixed_time:>9.3f} {detect_time:>9.3f} {cached_time:>9.3f}"
+            f" {mixed_time / cached_time:>7.1f}x {result.equals(expected)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+"""Time inference, every process operation and Parquet storage on synthetic data.
+
+Results are written as JSON, pass an earlier result file as --compare to see
+the ratio of every timing against it.
+
+    MINIO_URL=localhost:9000 python -m backend.common.benchmarks.suite --sizes 10000 1000000 --output after.json --compare before.json
+
+--storage also times the upload to and download from MinIO, which must be
+reachable, otherwise only the Parquet round trip in memory is timed.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+import uuid
+import warnings
+from io import BytesIO
+
+import pandas as pd
+import pyarrow as pa
+
+from backend.common.benchmarks.synthetic import SYNTHETIC_COLUMNS, make_frame
+from backend.common.compression import AUTO_CODECS, frame_codec, write_options
+from backend.common.data_processors import (
+    CANDIDATE_CONVERTERS,
+    infer_col,
+    infer_df,
+    infer_df_parallel,
+    process_operation_apply_script,
+    process_operation_cast_to,
+    process_operation_fill_null,
+)
+from backend.common.minio_client import (
+    PARQUET_ENGINE,
+    get_dataframe,
+    make_bucket_if_missing,
+    upload_dataframe,
+)
+from backend.common.processing_enum import OperationType
+
+
+SIZES = [10_000, 1_000_000, 10_000_000]
+REPEAT = 3
+
+# (column, script) pairs for apply_script, the column as inferred.
+APPLY_SCRIPTS = [
+    ("dirty_int", "x * 2 + 1"),
+    ("dirty_int", "math.sqrt(abs(x))"),
+    ("high_cardinality_strings", "x.upper()"),
+]
+CAST_OPERATIONS = [
+    "cast_to_numeric",
+    "cast_to_string",
+    "cast_to_datetime",
+    "cast_to_timedelta",
+    "cast_to_boolean",
+    "cast_to_category",
+]
+# The per row casts cast_to_string and cast_to_boolean replaced, timed
+# next to them on the uploaded, not yet inferred, columns.
+PER_ROW_CASTS = {
+    "cast_to_string": str,
+    "cast_to_boolean": bool,
+}
+# (column, value) pairs for fill_null, the column as inferred.
+FILL_NULL_VALUES = [
+    ("dirty_int", "0"),
+    ("mixed_dates", "2000-01-01"),
+    ("timedeltas", "1 days"),
+    ("high_cardinality_strings", "missing"),
+]
+# (column, strategy) pairs for fill_null with a computed value.
+FILL_NULL_STRATEGIES = [
+    ("dirty_int", "mean"),
+    ("dirty_int", "median"),
+    ("dirty_int", "mode"),
+    ("mixed_dates", "ffill"),
+    ("high_cardinality_strings", "bfill"),
+]
+
+
+def best_of(func, repeat: int, setup=None) -> float:
+    """Return the best wall time of func over repeat runs.
+
+    setup runs before every run, outside of the timing, and its result is
+    passed to func, e.g. a fresh copy of a frame func modifies in place.
+    """
+    timings = []
+    for _ in range(repeat):
+        args = () if setup is None else (setup(),)
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def best_of_or_none(func, repeat: int, setup=None) -> float | None:
+    """best_of, None when func raises, as some casts do on some dtypes."""
+    try:
+        return best_of(func, repeat, setup)
+    except Exception:  # noqa: BLE001
+        return None
+
+
+def bench_inference(df: pd.DataFrame, repeat: int):
+    for name in SYNTHETIC_COLUMNS:
+        yield "infer_col", name, best_of(lambda name=name: infer_col(df[name]), repeat)
+        for candidate, convert in CANDIDATE_CONVERTERS.items():
+            yield (
+                f"convert_{candidate}",
+                name,
+                best_of(lambda convert=convert, name=name: convert(df[name]), repeat),
+            )
+    yield "infer_df", "all", best_of(lambda: infer_df(df), repeat)
+    yield "infer_df_parallel", "all", best_of(lambda: infer_df_parallel(df), repeat)
+
+
+def bench_operations(inferred: pd.DataFrame, repeat: int):
+    def fresh():
+        return inferred.copy()
+
+    for col, script in APPLY_SCRIPTS:
+        yield (
+            OperationType.APPLY_SCRIPT.value,
+            f"{col}: {script}",
+            best_of_or_none(
+                lambda df, col=col, script=script: process_operation_apply_script(df, col, script),
+                repeat,
+                fresh,
+            ),
+        )
+    for operation in CAST_OPERATIONS:
+        for col in inferred.columns:
+            yield (
+                operation,
+                col,
+                best_of_or_none(
+                    lambda df, col=col, operation=operation: process_operation_cast_to(
+                        df, col, operation
+                    ),
+                    repeat,
+                    fresh,
+                ),
+            )
+    for col, value in FILL_NULL_VALUES:
+        yield (
+            OperationType.FILL_NULL.value,
+            col,
+            best_of_or_none(
+                lambda df, col=col, value=value: process_operation_fill_null(df, col, value),
+                repeat,
+                fresh,
+            ),
+        )
+    for col, strategy in FILL_NULL_STRATEGIES:
+        yield (
+            f"{OperationType.FILL_NULL.value}_{strategy}",
+            col,
+            best_of_or_none(
+                lambda df, col=col, strategy=strategy: process_operation_fill_null(
+                    df, col, strategy=strategy
+                ),
+                repeat,
+                fresh,
+            ),
+        )
+
+
+def bench_casts(df: pd.DataFrame, repeat: int):
+    def fresh():
+        return df.copy()
+
+    for operation, per_row in PER_ROW_CASTS.items():
+        for col in df.columns:
+            yield (
+                operation,
+                col,
+                best_of(
+                    lambda df, col=col, operation=operation: process_operation_cast_to(
+                        df, col, operation
+                    ),
+                    repeat,
+                    fresh,
+                ),
+            )
+            yield (
+                f"{operation}_per_row",
+                col,
+                best_of(lambda col=col, per_row=per_row: df[col].apply(per_row), repeat),
+            )
+
+
+def bench_storage(inferred: pd.DataFrame, repeat: int, minio: bool):
+    codec = frame_codec(inferred)
+    buffer = BytesIO()
+    inferred.to_parquet(buffer, engine=PARQUET_ENGINE, **write_options(codec))
+    yield "parquet_size_bytes", "all", buffer.tell()
+    yield (
+        "to_parquet",
+        "all",
+        best_of(
+            lambda: inferred.to_parquet(BytesIO(), engine=PARQUET_ENGINE, **write_options(codec)),
+            repeat,
+        ),
+    )
+    yield (
+        "read_parquet",
+        "all",
+        best_of(lambda: pd.read_parquet(BytesIO(buffer.getvalue()), engine=PARQUET_ENGINE), repeat),
+    )
+    # What auto weighs, for every codec it picks from.
+    for codec in AUTO_CODECS:
+        encoded = BytesIO()
+        inferred.to_parquet(encoded, engine=PARQUET_ENGINE, compression=codec)
+        yield "parquet_size_bytes", codec, encoded.tell()
+        yield (
+            "read_parquet",
+            codec,
+            best_of(
+                lambda encoded=encoded: pd.read_parquet(
+                    BytesIO(encoded.getvalue()), engine=PARQUET_ENGINE
+                ),
+                repeat,
+            ),
+        )
+    if not minio:
+        return
+
+    make_bucket_if_missing()
+    # Column objects are named after their content within a dataframe, a new
+    # dataframe every run uploads every column again.
+    dataframe_ids = []
+
+    def new_dataframe_id():
+        dataframe_ids.append(f"benchmark-{uuid.uuid4()}")
+        return dataframe_ids[-1]
+
+    version_id = str(uuid.uuid4())
+    yield (
+        "upload_dataframe",
+        "all",
+        best_of(
+            lambda dataframe_id: upload_dataframe(dataframe_id, version_id, inferred),
+            repeat,
+            new_dataframe_id,
+        ),
+    )
+    dataframe_id = dataframe_ids[-1]
+    yield (
+        "get_dataframe",
+        "all",
+        best_of(lambda: get_dataframe(dataframe_id, version_id), repeat),
+    )
+
+
+def run(sizes: list, repeat: int, minio: bool) -> list:
+    results = []
+    for rows in sizes:
+        df = make_frame(rows)
+        inferred = infer_df(df)
+        benchmarks = [
+            bench_inference(df, repeat),
+            bench_operations(inferred, repeat),
+            bench_casts(df, repeat),
+            bench_storage(inferred, repeat, minio),
+        ]
+        for benchmark in benchmarks:
+            for name, case, value in benchmark:
+                result = {"benchmark": name, "case": case, "rows": rows, "value": value}
+                shown = "failed" if value is None else f"{value:.4f}"
+                print(f"{rows:>10} {name:<24} {case:<40} {shown:>12}")
+                results.append(result)
+    return results
+
+
+def environment() -> dict:
+    try:
+        # A fixed command, only run by hand from a checkout.
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],  # noqa: S603, S607
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "pyarrow": pa.__version__,
+    }
+
+
+def compare(results: list, baseline_path: str):
+    with open(baseline_path) as baseline_file:
+        baseline = json.load(baseline_file)
+    previous = {(r["benchmark"], r["case"], r["rows"]): r["value"] for r in baseline["results"]}
+    print(f"\ncompared to {baseline['environment']['commit']} (ratio > 1 is slower)")
+    for r in results:
+        before = previous.get((r["benchmark"], r["case"], r["rows"]))
+        if before:
+            print(
+                f"{r['rows']:>10} {r['benchmark']:<24} {r['case']:<40} {r['value'] / before:>7.2f}x"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--storage", action="store_true", help="also time MinIO")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="an earlier --output file")
+    args = parser.parse_args()
+
+    # e.g. to_datetime falling back to dateutil, expected on dirty columns.
+    warnings.simplefilter("ignore")
+    results = run(args.sizes, args.repeat, args.storage)
+    with open(args.output, "w") as output:
+        json.dump({"environment": environment(), "results": results}, output, indent=2)
+    print(f"results written to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Synthetic columns shaped like showcase_data/*.csv, at any number of rows.
+
+Values are drawn from a pool of formatted strings, so generating 10M rows
+costs a take rather than 10M formatting calls. Pools are sized like the real
+thing: dates and timedeltas repeat, high cardinality strings mostly don't.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+DATE_LAYOUTS = ["%Y-%m-%d", "%m-%d-%Y", "%m/%d/%y", "%d-%b-%y"]
+INVALID_DATES = ["9999-99-99", "0000-00-00", "2000-11-33"]
+NULL_MARKERS = ["no value", "n/a", "unknown"]
+BOOL_VARIANTS = ["true", "false", "True", "FALSE", "yes", "no", "t", "f", "1", "0"]
+TIMEDELTA_UNITS = ["days", "hours", "minutes", "seconds"]
+GRADES = ["A", "B", "C", "D"]
+WORDS = ["mother", "red", "within", "teacher", "particular", "late", "spend", "important"]
+
+# Share of the rows replaced by dirt (a null marker or an invalid value),
+# kept under every NA threshold so the columns still infer to their type.
+DIRT_SHARE = 0.03
+
+
+def dirty_int(rows: int, rng: np.random.Generator) -> pd.Series:
+    """Ints, some with thousands separators, some quoted, some "no value"."""
+    values = pd.Series(rng.integers(-(10**6), 10**6, rows)).astype(str)
+    with_commas = rng.random(rows) < 0.1
+    values[with_commas] = (
+        pd.Series(rng.integers(1000, 10**6, int(with_commas.sum()))).map("{:,}".format).to_numpy()
+    )
+    quoted = rng.random(rows) < 0.05
+    values[quoted] = "'" + values[quoted] + "'"
+    return add_dirt(values, NULL_MARKERS, rng)
+
+
+def bool_variants(rows: int, rng: np.random.Generator) -> pd.Series:
+    return add_dirt(take(BOOL_VARIANTS, rows, rng), NULL_MARKERS, rng)
+
+
+def mixed_dates(rows: int, rng: np.random.Generator) -> pd.Series:
+    """One date layout per row, drawn from the layouts of the date showcase."""
+    days = pd.date_range("2000-01-01", "2023-12-31", freq="D")
+    pool = pd.concat(
+        [days.strftime(layout).to_series().str.upper() for layout in DATE_LAYOUTS],
+        ignore_index=True,
+    )
+    return add_dirt(take(pool, rows, rng), INVALID_DATES, rng)
+
+
+def timedeltas(rows: int, rng: np.random.Generator) -> pd.Series:
+    amounts = np.arange(1, 500)
+    pool = [f"{amount} {unit}" for amount in amounts for unit in TIMEDELTA_UNITS]
+    return add_dirt(take(pool, rows, rng), NULL_MARKERS, rng)
+
+
+def high_cardinality_strings(rows: int, rng: np.random.Generator) -> pd.Series:
+    words = take(WORDS, rows, rng)
+    return words + "-" + pd.Series(rng.integers(0, 10 * rows, rows)).astype(str)
+
+
+def low_cardinality_strings(rows: int, rng: np.random.Generator) -> pd.Series:
+    return take(GRADES, rows, rng)
+
+
+def take(pool, rows: int, rng: np.random.Generator) -> pd.Series:
+    pool = np.asarray(pool, dtype=object)
+    return pd.Series(pool[rng.integers(0, len(pool), rows)])
+
+
+def add_dirt(values: pd.Series, dirt: list, rng: np.random.Generator) -> pd.Series:
+    dirty = rng.random(len(values)) < DIRT_SHARE
+    values[dirty] = take(dirt, int(dirty.sum()), rng).to_numpy()
+    return values
+
+
+# {column: (generator, type infer_col is expected to settle on)}
+SYNTHETIC_COLUMNS = {
+    "dirty_int": (dirty_int, "int"),
+    "bool_variants": (bool_variants, "bool"),
+    "mixed_dates": (mixed_dates, "date"),
+    "timedeltas": (timedeltas, "timedelta"),
+    "high_cardinality_strings": (high_cardinality_strings, "string"),
+    "low_cardinality_strings": (low_cardinality_strings, "category"),
+}
+
+
+def make_column(name: str, rows: int, seed: int = 0) -> pd.Series:
+    generate, _ = SYNTHETIC_COLUMNS[name]
+    return generate(rows, np.random.default_rng(seed)).rename(name)
+
+
+def make_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    return pd.DataFrame({name: make_column(name, rows, seed) for name in SYNTHETIC_COLUMNS})
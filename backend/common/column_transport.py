@@ -0,0 +1,157 @@
+import hashlib
+import logging
+from multiprocessing import shared_memory
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from .arrow_dtypes import USE_ARROW_DTYPES, arrow_types_mapper
+
+
+logger = logging.getLogger(__name__)
+
+# Every column travels as a one column Arrow table under this field name, the
+# real column name is carried next to it so any hashable name survives.
+COLUMN_FIELD = "values"
+
+
+class SharedColumn(NamedTuple):
+    name: object
+    shm_name: str
+    size: int
+
+
+def share_column(col: pd.Series, name=None) -> SharedColumn | None:
+    """Write col as an Arrow IPC stream into a new shared memory block.
+
+    Return None when Arrow can't represent the column (e.g. an object column
+    mixing ints and strings) or wouldn't give it back as it is, the caller
+    should pickle it instead. The block belongs to whoever reads it last, see
+    read_shared_column.
+    """
+    try:
+        table = pa.Table.from_pandas(pd.DataFrame({COLUMN_FIELD: col}))
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+        logger.info("column %s can't be shared as arrow: %s", col.name, e)
+        return None
+    if col.dtype == object and not is_shared_exactly(col, table.schema.field(COLUMN_FIELD).type):
+        logger.info("column %s would change dtype as arrow, pickled", col.name)
+        return None
+
+    sink = pa.MockOutputStream()
+    write_table(sink, table)
+    size = sink.size()
+
+    shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    try:
+        write_table(pa.FixedSizeBufferWriter(pa.py_buffer(shm.buf)), table)
+    except BaseException:
+        shm.close()
+        shm.unlink()
+        raise
+    shm.close()
+    return SharedColumn(col.name if name is None else name, shm.name, size)
+
+
+def is_shared_exactly(col: pd.Series, arrow_type: pa.DataType) -> bool:
+    """Whether to_series gives the object column col back as it is.
+
+    Only strings do: object ints or bools come back as int64, float64 or bool
+    columns, and nulls other than NaN (None, pd.NA) come back as NaN.
+    """
+    if not (pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type)):
+        return False
+    return all(isinstance(value, float) for value in col[col.isna()])
+
+
+def write_table(sink, table: pa.Table):
+    # Kept in its own frame so no writer outlives the call: shm.close() fails
+    # while anything still points into the block.
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def open_shared_column(shared: SharedColumn) -> shared_memory.SharedMemory:
+    return shared_memory.SharedMemory(name=shared.shm_name)
+
+
+def read_shared_column(shared: SharedColumn, shm: shared_memory.SharedMemory) -> pd.Series:
+    """Return the column stored in shm without copying the Arrow buffers.
+
+    Numeric columns may keep pointing into shm, drop every reference to the
+    result before calling shm.close().
+    """
+    buffer = pa.py_buffer(shm.buf)[: shared.size]
+    return to_series(pa.ipc.open_stream(buffer).read_all(), shared.name)
+
+
+def take_shared_column(shared: SharedColumn) -> pd.Series:
+    """Read the column out of its shared memory block and free the block.
+
+    The Arrow buffers are read in place, converting them to NumPy backed
+    pandas is the only copy.
+    """
+    shm = open_shared_column(shared)
+    try:
+        if USE_ARROW_DTYPES:
+            # Arrow backed columns would keep pointing into shm.
+            buffer = pa.py_buffer(bytes(shm.buf[: shared.size]))
+            return to_series(pa.ipc.open_stream(buffer).read_all(), shared.name)
+        return read_shared_column(shared, shm)
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def to_series(table: pa.Table, name) -> pd.Series:
+    if USE_ARROW_DTYPES:
+        return table.to_pandas(types_mapper=arrow_types_mapper)[COLUMN_FIELD].rename(name)
+    col = table.to_pandas()[COLUMN_FIELD].rename(name)
+    if col.dtype == object:
+        # Arrow nulls come back as None, read_csv and friends use NaN.
+        col = col.where(col.notna(), np.nan)
+    return col
+
+
+def release_shared_column(shared: SharedColumn):
+    """Free a block that will not be read, e.g. after a worker failure."""
+    try:
+        shm = open_shared_column(shared)
+    except FileNotFoundError:
+        return
+    shm.close()
+    shm.unlink()
+
+
+def content_hash(col: pd.Series, salt: str = "") -> str:
+    """Return a hash of the values and dtype of col, not of its name.
+
+    The Arrow buffers of the column are hashed as they are, which is several
+    times faster than hashing every value, columns Arrow can't represent fall
+    back to pandas' per value hash.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{salt}:{col.dtype}:{len(col)}".encode())
+    try:
+        array = pa.array(col, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        array = None
+    if isinstance(array, pa.ChunkedArray):
+        array = array.combine_chunks()
+    if array is None or array.offset:
+        # A sliced array's buffers hold values outside of it.
+        hashed = pd.util.hash_pandas_object(col, index=False)
+        digest.update(hashed.to_numpy().tobytes())
+        return digest.hexdigest()
+
+    # The type tells apart e.g. ordered and unordered categoricals.
+    digest.update(str(array.type).encode())
+    buffers = array.buffers()
+    if isinstance(array, pa.DictionaryArray):
+        buffers += array.dictionary.buffers()
+    for buffer in buffers:
+        if buffer is not None:
+            digest.update(buffer)
+    return digest.hexdigest()
@@ -0,0 +1,102 @@
+import logging
+import os
+import time
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+logger = logging.getLogger(__name__)
+
+CODECS = ["zstd", "lz4", "snappy", "brotli", "gzip", "none"]
+AUTO_COMPRESSION = "auto"
+
+# Parquet codec of uploads, one of CODECS or "auto" to pick one of
+# AUTO_CODECS per column (per version for single file versions) from a
+# trial on a sample, see choose_codec. The level only applies to a set codec
+# that takes one.
+COMPRESSION = os.getenv("PARQUET_COMPRESSION", "brotli").lower()
+COMPRESSION_LEVEL = (
+    int(os.environ["PARQUET_COMPRESSION_LEVEL"]) if os.getenv("PARQUET_COMPRESSION_LEVEL") else None
+)
+
+
+def accepts_level(codec: str) -> bool:
+    """Whether the Parquet writer takes a compression level for codec."""
+    return codec in CODECS and codec != "none" and pa.Codec.supports_compression_level(codec)
+
+
+if COMPRESSION not in [*CODECS, AUTO_COMPRESSION]:
+    raise ValueError(
+        f"Unsupported PARQUET_COMPRESSION {COMPRESSION}, expected auto or one of {CODECS}"
+    )
+if COMPRESSION_LEVEL is not None and not accepts_level(COMPRESSION):
+    raise ValueError(f"PARQUET_COMPRESSION {COMPRESSION} doesn't take a compression level")
+
+AUTO_CODECS = [
+    codec for codec in ["zstd", "lz4", "snappy", "brotli"] if pa.Codec.is_available(codec)
+]
+# How much auto favours read time over size: 0 picks the smallest result, 1
+# the fastest to read, in between the lowest weighted sum of both relative to
+# the best codec for each.
+AUTO_READ_WEIGHT = float(os.getenv("PARQUET_AUTO_READ_WEIGHT", "0.5"))
+AUTO_SAMPLE_ROWS = 50_000
+
+# Every object was written with brotli before the codec was recorded.
+LEGACY_COMPRESSION = "brotli"
+
+
+def frame_codec(df: pd.DataFrame) -> str:
+    """Return the codec to write df with, see COMPRESSION."""
+    if COMPRESSION != AUTO_COMPRESSION:
+        return COMPRESSION
+    return choose_codec(df)
+
+
+def choose_codec(df: pd.DataFrame) -> str:
+    """Return the codec of AUTO_CODECS best for df by AUTO_READ_WEIGHT, from
+    writing and reading back rows spread over df.
+    """
+    if len(df) > AUTO_SAMPLE_ROWS:
+        df = df.iloc[np.linspace(0, len(df) - 1, AUTO_SAMPLE_ROWS).astype(np.int64)]
+    trials = {}
+    for codec in AUTO_CODECS:
+        buffer = BytesIO()
+        df.to_parquet(buffer, engine="pyarrow", compression=codec, index=False)
+        start_time = time.perf_counter()
+        pq.read_table(pa.BufferReader(buffer.getvalue()))
+        trials[codec] = (buffer.tell(), time.perf_counter() - start_time)
+
+    smallest = min(size for size, _ in trials.values())
+    fastest = max(min(seconds for _, seconds in trials.values()), 1e-9)
+
+    def cost(codec: str) -> float:
+        size, seconds = trials[codec]
+        return (1 - AUTO_READ_WEIGHT) * size / smallest + AUTO_READ_WEIGHT * seconds / fastest
+
+    codec = min(AUTO_CODECS, key=cost)
+    logger.debug("codec %s chosen from (bytes, seconds) %s", codec, trials)
+    return codec
+
+
+def write_options(codec: str) -> dict:
+    """Return the Parquet writer options for codec, with COMPRESSION_LEVEL if
+    codec is the configured one and takes a level.
+    """
+    return {
+        "compression": codec,
+        "compression_level": (
+            COMPRESSION_LEVEL if codec == COMPRESSION and accepts_level(codec) else None
+        ),
+    }
+
+
+def file_codec(metadata: pq.FileMetaData) -> str:
+    """Return the codec of the first column chunk of a Parquet file."""
+    if metadata.num_row_groups == 0 or metadata.num_columns == 0:
+        return "none"
+    codec = metadata.row_group(0).column(0).compression.lower()
+    return "none" if codec == "uncompressed" else codec
@@ -1,13 +1,41 @@
+import atexit
+import itertools
 import logging
-import math
+import os
+import re
 import time
-from multiprocessing import Pool
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from functools import partial
+from multiprocessing import Pool, resource_tracker
+from typing import NamedTuple
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 
+from .arrow_dtypes import (
+    USE_ARROW_DTYPES,
+    is_arrow_string,
+    to_arrow_dtype,
+    to_arrow_dtypes,
+)
+from .column_transport import (
+    SharedColumn,
+    open_shared_column,
+    read_shared_column,
+    release_shared_column,
+    share_column,
+    take_shared_column,
+)
+from .inference_cache import InferenceCache, column_key, inference_cache
 from .minio_client import upload_dataframe
-from .mongo_client import update_status
-from .processing_enum import OperationType, ProcessStatus
+from .mongo_client import update_status, update_version
+from .operation_planner import operation_columns, plan_operations
+from .processing_enum import FillStrategy, OperationType, ProcessStatus
+from .script_engine import compile_script
 
 
 logger = logging.getLogger(__name__)
@@ -22,8 +50,35 @@ CATEGORY_THRESHOLD = 0.4
 
 ACCEPTABLE_NA_THRESHOLD = 0.5
 
+# Columns longer than INFER_SAMPLE_SIZE are scored on a sample of that many
+# rows: a quarter from the head, a quarter from the tail, the rest at random.
+INFER_SAMPLE_SIZE = 10_000
+INFER_SAMPLE_SEED = 0
 
-def infer_col(col: pd.Series) -> pd.Series:
+# Columns with a unique ratio under DICTIONARY_ENCODE_THRESHOLD are converted
+# once per unique value and expanded back through the factorized codes. Only
+# homogeneous columns qualify: factorize treats True, 1 and 1.0 as one value.
+DICTIONARY_ENCODE_THRESHOLD = 0.5
+DICTIONARY_ENCODE_TYPES = ["string", "integer"]
+
+FILL_STRATEGIES = list(FillStrategy)
+DIRECTIONAL_FILL_STRATEGIES = [FillStrategy.FFILL, FillStrategy.BFILL]
+
+# infer_df_parallel keeps one pool per process, None means one worker per CPU.
+INFERENCE_POOL_SIZE = None
+INFERENCE_POOL_INFLIGHT = 2 * (os.cpu_count() or 1)
+inference_pool = None
+inference_pool_pid = None
+
+# An operation on several columns runs this many columns at a time in
+# threads, row by row scripts run in the inference pool instead.
+COLUMN_THREADS = os.cpu_count() or 1
+
+# Candidates are converted this many rows at a time so they can give up early.
+INFER_CHUNK_SIZE = 100_000
+
+
+def infer_col(col: pd.Series, sample_size: int | None = INFER_SAMPLE_SIZE) -> pd.Series:
     """
     *** This is not the ultimate solution as it still require a lot of refinement. ***
     Infer type
@@ -51,198 +106,821 @@ def infer_col(col: pd.Series) -> pd.Series:
 
     only if non of above satisfy conditions.
 
+    When the column is longer than sample_size, the candidates are scored on a
+    stratified sample and only the winner is converted on the full column. If
+    the full conversion breaks its NA threshold, every candidate is converted
+    on the full column instead. Pass sample_size=None to always do the latter.
+
+    Low cardinality columns are converted on their unique values only, see
+    DICTIONARY_ENCODE_THRESHOLD.
     """
 
     start_time = time.time()
     infer_type = pd.api.types.infer_dtype(col, skipna=True)
-    logger.info("infer type from pandas col %s is %d", col.name, infer_type)
+    logger.info("infer type from pandas col %s is %s", col.name, infer_type)
     if infer_type not in NEED_MORE_REFINEMENT:
         logging.info("pandas cast type to %s", infer_type)
         return col
 
-    try_to_date = pd.to_datetime(col, errors="coerce", format="mixed", dayfirst=True)
-    date_na_cnt = (pd.isna(try_to_date)).sum()
-    logger.info("date_na_cnt is %s", date_na_cnt)
-    try_to_int = infer_int(col)
-    int_na_cnt = (pd.isna(try_to_int)).sum()
-    logger.info("int_na_cnt is %s", int_na_cnt)
-    try_to_timedelta = pd.to_timedelta(col, errors='coerce')
-    timedelta_na_cnt = (pd.isna(try_to_timedelta)).sum()
-    try_to_boolean = infer_boolean(col)
-    boolean_na_cnt = (pd.isna(try_to_boolean)).sum()
-
-    if int_na_cnt / len(col) < INT_NA_THRESHOLD:
-        return try_to_int
-    if boolean_na_cnt / len(col) < BOOL_NA_THRESHOLD:
-        return try_to_boolean
-    if date_na_cnt / len(col) < DATE_NA_THRESHOLD:
-        return try_to_date
-    if timedelta_na_cnt / len(col) < TIMEDELTA_NA_THRESHOLD:
-        return try_to_timedelta
-
-    if len(col.unique()) / len(col) < CATEGORY_THRESHOLD:
-        return pd.Categorical(col)
+    factorized = factorize_col(col, infer_type)
+    inferred = None
+    if sample_size is not None and len(col) > sample_size:
+        sample = sample_rows(col, sample_size)
+        inferred = infer_col_from_sample(col, sample, factorized)
+        if inferred is None:
+            logger.info("sample inference rejected for %s, use full column", col.name)
+    if inferred is None:
+        inferred = infer_col_exhaustive(col, factorized)
 
-    all_possible = {
-        '1nt': {
-            'na_cnt' : int_na_cnt,
-            'series': try_to_int,
-        },
-        'date': {
-            'na_cnt': date_na_cnt,
-            'series': try_to_date,
-        },
-        'timedelta': {
-            'na_cnt': timedelta_na_cnt,
-            'series': try_to_timedelta,
-        },
-        'bool': {
-            'na_cnt': boolean_na_cnt,
-            'series': try_to_boolean,
-        },
-    }
-
-    sorted_all = sorted(all_possible.items(), key=lambda x: x[1]['na_cnt'])
-
-    _, na_cnt_series = sorted_all[0]
-    na_cnt = na_cnt_series['na_cnt']
-    most_not_na = na_cnt_series['series']
     end_time = time.time()
-    logger.info("col infer process for %s: %d", col.name, end_time - start_time)
-    if na_cnt / len(col) < ACCEPTABLE_NA_THRESHOLD:
-        return most_not_na
-    else:
-        return col
+    logger.info("col infer process for %s: %s", col.name, end_time - start_time)
+    return inferred
+
+
+def sample_rows(col: pd.Series, sample_size: int) -> pd.Series:
+    """Return a stratified sample of col: head, tail and random middle rows."""
+    edge_size = sample_size // 4
+    rng = np.random.default_rng(INFER_SAMPLE_SEED)
+    middle = rng.choice(
+        np.arange(edge_size, len(col) - edge_size),
+        size=sample_size - 2 * edge_size,
+        replace=False,
+    )
+    positions = np.concatenate(
+        [
+            np.arange(edge_size),
+            np.sort(middle),
+            np.arange(len(col) - edge_size, len(col)),
+        ]
+    )
+    return col.iloc[positions]
+
+
+class FactorizedCol(NamedTuple):
+    codes: np.ndarray
+    uniques: pd.Series
+    # Whether candidates should be converted on uniques instead of every row.
+    dictionary: bool
+
+
+def factorize_col(col: pd.Series, infer_type: str | None = None) -> FactorizedCol:
+    if infer_type is None:
+        infer_type = pd.api.types.infer_dtype(col, skipna=True)
+    codes, uniques = pd.factorize(col)
+    dictionary = (
+        infer_type in DICTIONARY_ENCODE_TYPES
+        and len(uniques) / len(col) < DICTIONARY_ENCODE_THRESHOLD
+    )
+    return FactorizedCol(codes, pd.Series(uniques), dictionary)
+
+
+class CandidateRun:
+    """Lazy conversion of a column by one candidate.
+
+    The column is converted INFER_CHUNK_SIZE rows at a time and advance stops
+    as soon as the running NA count reaches the given limit, so a candidate
+    that can no longer win is not converted any further. A stopped run resumes
+    where it left off when advanced again with a higher limit.
+
+    With a dictionary FactorizedCol the unique values are converted instead,
+    each weighted by its number of rows, and expanded back in result.
+    """
+
+    def __init__(self, col: pd.Series, convert, factorized: FactorizedCol | None = None):
+        self.col = col
+        self.convert = convert
+        self.factorized = factorized if factorized and factorized.dictionary else None
+        if self.factorized is None:
+            self.values = col
+            self.weights = None
+            self.na_cnt = 0
+        else:
+            codes = self.factorized.codes
+            self.values = self.factorized.uniques
+            self.weights = np.bincount(codes[codes >= 0], minlength=len(self.values))
+            # NA rows carry code -1, every candidate converts NA to NA.
+            self.na_cnt = int((codes == -1).sum())
+        self.chunks = []
+        self.position = 0
+
+    @property
+    def done(self) -> bool:
+        return self.position >= len(self.values)
 
+    def advance(self, max_na_cnt: float) -> bool:
+        """Convert until done or na_cnt reaches max_na_cnt, True if under it."""
+        while not self.done and self.na_cnt < max_na_cnt:
+            end = self.position + INFER_CHUNK_SIZE
+            converted = self.convert(self.values.iloc[self.position : end])
+            is_na = pd.isna(converted).to_numpy(dtype=bool)
+            if self.weights is None:
+                self.na_cnt += int(is_na.sum())
+            else:
+                self.na_cnt += int(self.weights[self.position : end][is_na].sum())
+            self.chunks.append(converted)
+            self.position = end
+        return self.done and self.na_cnt < max_na_cnt
 
-def infer_df(df: pd.DataFrame):
+    def result(self) -> pd.Series:
+        if not self.chunks:
+            self.chunks.append(self.convert(self.values))
+        converted = pd.concat(self.chunks) if len(self.chunks) > 1 else self.chunks[0]
+        if self.factorized is None:
+            return converted
+        converted = converted.array.take(self.factorized.codes, allow_fill=True)
+        return pd.Series(converted, index=self.col.index, name=self.col.name)
+
+
+def start_candidate_runs(col: pd.Series, factorized: FactorizedCol | None = None) -> dict:
+    """Return {name: CandidateRun}, nothing is converted until advanced."""
+    return {name: CandidateRun(col, convert, factorized) for name, convert, _ in INFER_CANDIDATES}
+
+
+def pick_candidate(runs: dict, col_size: int) -> str | None:
+    """Return the first candidate, in INFER_CANDIDATES order, under its threshold."""
+    for name, _, threshold in INFER_CANDIDATES:
+        accepted = runs[name].advance(threshold * col_size)
+        logger.info("%s na_cnt is at least %s", name, runs[name].na_cnt)
+        if accepted:
+            return name
+    return None
+
+
+def pick_fallback_candidate(runs: dict, col_size: int) -> str | None:
+    """Return the candidate with the fewest NAs if it is acceptable.
+
+    Each candidate only has to beat the best one so far, ties go to the
+    earlier one in FALLBACK_ORDER.
+    """
+    best = None
+    max_na_cnt = ACCEPTABLE_NA_THRESHOLD * col_size
+    for name in FALLBACK_ORDER:
+        if runs[name].advance(max_na_cnt):
+            best = name
+            max_na_cnt = runs[name].na_cnt
+    return best
+
+
+def is_category(factorized: FactorizedCol) -> bool:
+    # Same count as col.unique(), which keeps NA as one of the values.
+    unique_cnt = len(factorized.uniques) + int((factorized.codes == -1).any())
+    return unique_cnt / len(factorized.codes) < CATEGORY_THRESHOLD
+
+
+def infer_col_exhaustive(col: pd.Series, factorized: FactorizedCol | None = None) -> pd.Series:
+    if factorized is None:
+        factorized = factorize_col(col)
+    runs = start_candidate_runs(col, factorized)
+    name = pick_candidate(runs, len(col))
+    if name is not None:
+        return runs[name].result()
+
+    if is_category(factorized):
+        return pd.Categorical(col)
+
+    name = pick_fallback_candidate(runs, len(col))
+    if name is not None:
+        return runs[name].result()
+    return col
+
+
+def infer_col_from_sample(
+    col: pd.Series, sample: pd.Series, factorized: FactorizedCol | None = None
+) -> pd.Series | None:
+    """Pick the type on sample and convert col to it, None if col disagrees."""
+    if factorized is None:
+        factorized = factorize_col(col)
+    runs = start_candidate_runs(sample)
+    name = pick_candidate(runs, len(sample))
+    if name is not None:
+        return convert_candidate(col, name, CANDIDATE_THRESHOLDS[name], factorized)
+
+    # Repeated values are under represented in a sample, so cardinality is
+    # always checked on the full column.
+    if is_category(factorized):
+        return pd.Categorical(col)
+
+    name = pick_fallback_candidate(runs, len(sample))
+    if name is not None:
+        return convert_candidate(col, name, ACCEPTABLE_NA_THRESHOLD, factorized)
+    return col
+
+
+def convert_candidate(
+    col: pd.Series,
+    name: str,
+    threshold: float,
+    factorized: FactorizedCol | None = None,
+) -> pd.Series | None:
+    run = CandidateRun(col, CANDIDATE_CONVERTERS[name], factorized)
+    accepted = run.advance(threshold * len(col))
+    logger.info("full column %s na_cnt is at least %s", name, run.na_cnt)
+    if accepted:
+        return run.result()
+    return None
+
+
+def infer_df(df: pd.DataFrame, cache: InferenceCache | None = None):
+    """Infer every column of df.
+
+    With a cache, a column whose content was inferred before is converted
+    straight to the cached decision, see infer_col_with_decision.
+    """
     processed = pd.DataFrame()
     for col in df.columns:
-        processed[col] = infer_col(df[col])
+        if cache is None:
+            processed[col] = infer_col(df[col])
+            continue
+        key = column_key(df[col])
+        cached = cache.get(key)
+        processed[col], decision = infer_col_with_decision(df[col], cached)
+        if cached is None and decision is not None:
+            cache.put(key, decision)
     return processed
 
 
+def infer_col_with_decision(
+    col: pd.Series, decision: dict | None = None
+) -> tuple[pd.Series, dict | None]:
+    """infer_col, also returning the decision that replays it.
+
+    With a decision the candidate search is skipped and col is converted
+    straight to the decided type. The returned decision is None when the
+    result can't be replayed, i.e. when it shouldn't be cached.
+    """
+    if decision is not None:
+        return apply_decision(col, decision), decision
+    inferred = infer_col(col)
+    return inferred, make_decision(col, inferred)
+
+
+def make_decision(col: pd.Series, inferred) -> dict | None:
+    if inferred is col:
+        return {"kind": "keep"}
+    dtype = inferred.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        return {"kind": "category"}
+    if pd.api.types.is_bool_dtype(dtype):
+        return {"kind": "bool"}
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        formats = ()
+        if pd.api.types.infer_dtype(col, skipna=True) == "string":
+            formats = cached_date_formats(col)
+        return {"kind": "date", "date_formats": list(formats)}
+    if pd.api.types.is_timedelta64_dtype(dtype):
+        return {"kind": "timedelta"}
+    if pd.api.types.is_integer_dtype(dtype):
+        return {"kind": "int"}
+    return None
+
+
+def apply_decision(col: pd.Series, decision: dict):
+    kind = decision["kind"]
+    if kind == "keep":
+        return col
+    if kind == "category":
+        return pd.Categorical(col)
+    convert = CANDIDATE_CONVERTERS[kind]
+    if kind == "date":
+        convert = partial(infer_date, formats=tuple(decision["date_formats"]))
+    return CandidateRun(col, convert, factorize_col(col)).result()
+
+
 def infer_col_wrapper(args):
     col, df_col = args
     return col, infer_col(df_col)
 
 
-def infer_df_parallel(df: pd.DataFrame):
+def infer_shared_column(column, decision: dict | None = None):
+    """Pool task: infer a column shipped by infer_df_parallel.
+
+    A SharedColumn is read straight from shared memory and the result goes
+    back the same way, anything else is a pickled (name, Series) pair.
+    Return (column, decision), see infer_col_with_decision.
+    """
+    if not isinstance(column, SharedColumn):
+        name, col = column
+        inferred, decision = infer_col_with_decision(col, decision)
+        return pickle_or_share_column(name, inferred), decision
+
+    shm = open_shared_column(column)
+    try:
+        inferred = infer_column_in_shared_memory(column, shm, decision)
+    finally:
+        shm.close()
+    return inferred
+
+
+def infer_column_in_shared_memory(column: SharedColumn, shm, decision: dict | None):
+    # Its own frame, so the input column (which may point into shm) is
+    # released before the caller closes shm.
+    col = read_shared_column(column, shm)
+    inferred, decision = infer_col_with_decision(col, decision)
+    return pickle_or_share_column(column.name, inferred), decision
+
+
+def pickle_or_share_column(name, col):
+    shared = share_column(pd.Series(col), name)
+    if shared is None:
+        return name, col
+    return shared
+
+
+def get_inference_pool():
+    """Return the process wide inference pool, created on first use.
+
+    A pool is bound to the process that created it, so a forked child (e.g.
+    a create_dataframe_async job) gets its own.
+    """
+    global inference_pool, inference_pool_pid
+    if inference_pool is None or inference_pool_pid != os.getpid():
+        # Workers must share our resource tracker, otherwise each one starts
+        # its own and reports the shared memory blocks we freed as leaked.
+        resource_tracker.ensure_running()
+        inference_pool = Pool(INFERENCE_POOL_SIZE)
+        inference_pool_pid = os.getpid()
+    return inference_pool
+
+
+@atexit.register
+def close_inference_pool():
+    global inference_pool
+    if inference_pool is not None and inference_pool_pid == os.getpid():
+        inference_pool.close()
+        inference_pool.join()
+    inference_pool = None
+
+
+def infer_df_parallel(df: pd.DataFrame, cache: InferenceCache | None = None):
+    """Same as infer_df, with the columns inferred by the long lived pool.
+
+    Columns travel as Arrow buffers in shared memory, both ways, instead of
+    pickled Series. At most INFERENCE_POOL_INFLIGHT columns are in shared
+    memory at a time, which bounds the extra memory next to df and the result.
+    The cache is only used here, workers get the cached decision with the
+    column and send the new ones back.
+    """
+    pool = get_inference_pool()
     processed = pd.DataFrame()
-    with Pool() as pool:
-        args = [(col, df[col]) for col in df.columns]
-        results = pool.map(infer_col_wrapper, args)
-        for col, result in results:
-            processed[col] = result
+    inflight = deque()
+
+    def collect():
+        shared, key, cached, task = inflight.popleft()
+        try:
+            inferred, decision = task.get()
+        finally:
+            if shared is not None:
+                release_shared_column(shared)
+        if key is not None and cached is None and decision is not None:
+            cache.put(key, decision)
+        if isinstance(inferred, SharedColumn):
+            processed[inferred.name] = take_shared_column(inferred)
+        else:
+            name, result = inferred
+            processed[name] = result
+
+    try:
+        for col in df.columns:
+            if len(inflight) >= INFERENCE_POOL_INFLIGHT:
+                collect()
+            key = cached = None
+            if cache is not None:
+                key = column_key(df[col])
+                cached = cache.get(key)
+            shared = share_column(df[col], col)
+            task = pool.apply_async(
+                infer_shared_column,
+                ((col, df[col]) if shared is None else shared, cached),
+            )
+            inflight.append((shared, key, cached, task))
+        while inflight:
+            collect()
+    finally:
+        # Only reached with tasks left after a failure, free what they return.
+        for shared, _, _, task in inflight:
+            try:
+                inferred, _ = task.get()
+            except Exception:  # noqa: BLE001
+                inferred = None
+            if shared is not None:
+                release_shared_column(shared)
+            if isinstance(inferred, SharedColumn):
+                release_shared_column(inferred)
     return processed
 
 
+TRUE_VARIANTS = frozenset(["true", "yes", "t", "1"])
+FALSE_VARIANTS = frozenset(["false", "no", "f", "0"])
+
+
+def case_variants(words) -> pa.Array:
+    """Every upper and lower case spelling of words, to match them without
+    lowering the column first.
+    """
+    return pa.array(
+        sorted(
+            "".join(spelling)
+            for word in words
+            for spelling in itertools.product(*({c.lower(), c.upper()} for c in word))
+        )
+    )
+
+
+TRUE_SPELLINGS = case_variants(TRUE_VARIANTS)
+FALSE_SPELLINGS = case_variants(FALSE_VARIANTS)
+
+QUOTE_CHAR = "'"
+THOUSANDS_SEPARATOR = ","
+# Strings that int() accepts: surrounding whitespace, a sign and digit groups
+# joined by single underscores. ASCII_INT_PATTERN is the common subset that
+# arrow can cast in bulk, DIGIT_PATTERN finds the few rows left for int().
+INT_PATTERN = r"\s*[+-]?\d+(?:_\d+)*\s*"
+ASCII_INT_PATTERN = r"^-?[0-9]+$"
+DIGIT_PATTERN = r"\p{Nd}"
+
+
 def infer_boolean(col: pd.Series) -> pd.Series | None:
-    true_variants = ["true", "yes", "t", "1"]
-    false_variants = ["false", "no", "f", "0"]
-    def try_bool(data):
-        lower = str(data).lower()
-        if lower in true_variants:
-            return True
-        if lower in false_variants:
-            return False
-        return pd.NA
-
-    defer_bool = col.apply(try_bool).astype("boolean")
-    return defer_bool
+    """Map the string form of every value to True/False using TRUE_VARIANTS
+    and FALSE_VARIANTS (case insensitive), anything else becomes NA.
+    """
+    try:
+        strings = pa.array(col, type=pa.string(), from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Not only strings, match their string form.
+        strings = pa.array(col.astype(str), type=pa.string())
+    is_true = pc.is_in(strings, value_set=TRUE_SPELLINGS).to_numpy(zero_copy_only=False)
+    is_false = pc.is_in(strings, value_set=FALSE_SPELLINGS).to_numpy(zero_copy_only=False)
+    defer_bool = pd.arrays.BooleanArray(is_true, ~(is_true | is_false))
+    return pd.Series(defer_bool, index=col.index, name=col.name)
+
 
 def infer_int(col: pd.Series) -> pd.Series | None:
-    to_trip_chars = ["\"", "'"]
-    to_replace = ","
-    def try_int(data):
-        for to_trim_char in to_trip_chars:
-            trimed = str(data).lstrip(to_trim_char)
-            trimed = trimed.rstrip(to_trim_char)
-
-        trimed = trimed.replace(to_replace, "")
-        try:
-            int_val = int(trimed)
-            return int_val
-        except:
-            return pd.NA
-
-    defer_int = col.apply(try_int).astype(pd.Int64Dtype())
-    return defer_int
-
-SAFE_NAMESPACES = {
-    "math": math,
-    "abs": abs,
-    "round": round,
-    "min": min,
-    "max": max,
-    "str": str,
-    "int": int,
-    "float": float,
-    "len": len,
-    "pow": pow,
-    "split": str.split,
-}
+    """Parse the string form of every value as an int after trimming single
+    quotes and dropping thousands separators, anything else becomes NA.
+    """
+    if is_arrow_string(col):
+        # Already Arrow strings, NA stays null instead of becoming "<NA>".
+        trimmed = pa.array(col)
+    else:
+        trimmed = pa.array(col.astype(str).to_numpy(dtype=object), type=pa.string())
+    trimmed = pc.utf8_trim(trimmed, QUOTE_CHAR)
+    trimmed = pc.replace_substring(trimmed, THOUSANDS_SEPARATOR, "")
+
+    values = np.zeros(len(col), dtype=np.int64)
+    mask = np.ones(len(col), dtype=bool)
+
+    is_ascii_int = pc.match_substring_regex(trimmed, ASCII_INT_PATTERN)
+    is_ascii_int = pc.fill_null(is_ascii_int, False).to_numpy(zero_copy_only=False)
+    try:
+        parsed = pc.cast(trimmed.filter(is_ascii_int), pa.int64())
+    except pa.ArrowInvalid:
+        # Out of int64 range, let int() below decide like the scalar parser.
+        pass
+    else:
+        values[is_ascii_int] = parsed.to_numpy()
+        mask[is_ascii_int] = False
+
+    # Whitespace, signs, underscores or non ASCII digits are rare, leave them to
+    # int() so the result matches the scalar parser exactly.
+    has_digit = pc.match_substring_regex(trimmed, DIGIT_PATTERN)
+    has_digit = pc.fill_null(has_digit, False).to_numpy(zero_copy_only=False)
+    positions = np.flatnonzero(mask & has_digit)
+    for pos in positions:
+        data = trimmed[pos].as_py()
+        if re.fullmatch(INT_PATTERN, data):
+            values[pos] = int(data)
+            mask[pos] = False
+
+    defer_int = pd.arrays.IntegerArray(values, mask)
+    return pd.Series(defer_int, index=col.index, name=col.name)
+
+
+# Explicit formats tried by detect_date_formats, day first before month first
+# like the dayfirst=True of the mixed parser. Numeric dates with a four digit
+# year at the end (dd/mm/yyyy, mm-dd-yyyy, ...) are left out on purpose: the
+# mixed parser has its own fast path for them.
+DATE_FORMATS = [
+    "%Y-%m-%d",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y/%m/%d",
+    "%d/%m/%y",
+    "%d-%m-%y",
+    "%m/%d/%y",
+    "%m-%d-%y",
+    "%d-%b-%y",
+    "%d-%b-%Y",
+    "%d %b %Y",
+    "%d %B %Y",
+    "%b %d %Y",
+    "%B %d %Y",
+]
+DATE_FORMAT_SAMPLE_SIZE = 1_000
+DATE_FORMAT_MAX_COUNT = 3
+# A format is only kept if it parses this share of the sample on its own.
+DATE_FORMAT_MIN_SHARE = 0.05
+DATE_FORMAT_CACHE_SIZE = 256
+date_format_cache = OrderedDict()
+
+
+def infer_date(col: pd.Series, formats: tuple | None = None) -> pd.Series:
+    """Parse col as datetime, day first when ambiguous, anything else is NaT.
+
+    Formats detected on a sample (see detect_date_formats), or the given ones,
+    are parsed with the fixed format parser, only rows none of them match go
+    through the per element format="mixed" parser.
+    """
+    if formats is None:
+        formats = ()
+        if pd.api.types.infer_dtype(col, skipna=True) == "string":
+            formats = cached_date_formats(col)
+    if not formats:
+        return parse_mixed_dates(col)
+
+    values = col.to_numpy(dtype=object)
+    parsed = np.full(len(values), np.datetime64("NaT"), dtype="datetime64[ns]")
+    pending = ~pd.isna(values)
+    for date_format in formats:
+        positions = np.flatnonzero(pending)
+        if not len(positions):
+            break
+        converted = parse_formatted_dates(values[positions], date_format)
+        matched = ~np.isnat(converted)
+        parsed[positions[matched]] = converted[matched]
+        pending[positions[matched]] = False
+
+    positions = np.flatnonzero(pending)
+    if len(positions):
+        converted = parse_mixed_dates(pd.Series(values[positions]))
+        if converted.dtype != parsed.dtype:
+            # e.g. timezone aware strings, let the mixed parser decide it all.
+            return parse_mixed_dates(col)
+        parsed[positions] = converted.to_numpy()
+    return pd.Series(parsed, index=col.index, name=col.name)
+
+
+def parse_mixed_dates(col: pd.Series) -> pd.Series:
+    return pd.to_datetime(col, errors="coerce", format="mixed", dayfirst=True)
+
+
+def parse_formatted_dates(values: np.ndarray, date_format: str) -> np.ndarray:
+    parsed = pd.to_datetime(values, errors="coerce", format=date_format)
+    parsed = parsed.to_numpy(dtype="datetime64[ns]")
+    if "%y" in date_format:
+        parsed = pivot_two_digit_years(parsed)
+    return parsed
+
+
+def pivot_two_digit_years(parsed: np.ndarray) -> np.ndarray:
+    """Move %y years to the century dateutil (the mixed parser) would use:
+    within 50 years of today, where strptime always uses 1969-2068.
+    """
+    this_year = date.today().year
+    years = parsed.astype("datetime64[Y]").astype(np.int64) + 1970
+    pivoted = this_year // 100 * 100 + years % 100
+    pivoted[pivoted >= this_year + 50] -= 100
+    pivoted[pivoted < this_year - 50] += 100
+    shifted = np.flatnonzero((pivoted != years) & ~np.isnat(parsed))
+    if len(shifted):
+        parsed = parsed.copy()
+        parsed[shifted] = [
+            pd.Timestamp(parsed[pos]).replace(year=pivoted[pos]).to_datetime64() for pos in shifted
+        ]
+    return parsed
+
+
+def cached_date_formats(col: pd.Series) -> tuple:
+    """detect_date_formats on the head of col, cached by column signature.
+
+    The signature is the column name plus the shapes of the sampled values
+    (digits as 9, letters as a), so chunks of a column and re-uploads of the
+    same layout skip the detection.
+    """
+    sample = col.iloc[:DATE_FORMAT_SAMPLE_SIZE].dropna()
+    shapes = sample.str.replace(r"\d", "9", regex=True)
+    shapes = shapes.str.replace(r"[^\W\d_]", "a", regex=True)
+    signature = (col.name, tuple(sorted(shapes.unique())))
+    if signature in date_format_cache:
+        date_format_cache.move_to_end(signature)
+        return date_format_cache[signature]
+
+    formats = detect_date_formats(sample)
+    logger.info("date formats detected for %s: %s", col.name, formats)
+    date_format_cache[signature] = formats
+    if len(date_format_cache) > DATE_FORMAT_CACHE_SIZE:
+        date_format_cache.popitem(last=False)
+    return formats
+
+
+def detect_date_formats(sample: pd.Series) -> tuple:
+    """Greedily pick up to DATE_FORMAT_MAX_COUNT formats from DATE_FORMATS,
+    each time the one parsing most of the sample rows still unparsed.
+    """
+    values = sample.to_numpy(dtype=object)
+    pending = np.ones(len(values), dtype=bool)
+    formats = []
+    while len(formats) < DATE_FORMAT_MAX_COUNT and pending.any():
+        best_format, best_matched = None, None
+        for date_format in DATE_FORMATS:
+            if date_format in formats:
+                continue
+            parsed = pd.to_datetime(values, errors="coerce", format=date_format)
+            matched = pending & ~parsed.isna()
+            if best_matched is None or matched.sum() > best_matched.sum():
+                best_format, best_matched = date_format, matched
+        if best_matched.sum() < DATE_FORMAT_MIN_SHARE * len(values):
+            break
+        formats.append(best_format)
+        pending &= ~best_matched
+
+    # Ambiguous dates like 12/06/21 must go to the day first format, so a
+    # month first format always comes with its day first twin ahead of it.
+    for date_format in list(formats):
+        if date_format.startswith("%m"):
+            twin = date_format.replace("%m", "%M").replace("%d", "%m").replace("%M", "%d")
+            if twin not in formats:
+                formats.append(twin)
+    return tuple(sorted(formats, key=DATE_FORMATS.index))
+
+
+def infer_timedelta(col: pd.Series) -> pd.Series:
+    return pd.to_timedelta(col, errors="coerce")
+
+
+# Candidates in priority order: the first one under its NA threshold wins.
+INFER_CANDIDATES = [
+    ("int", infer_int, INT_NA_THRESHOLD),
+    ("bool", infer_boolean, BOOL_NA_THRESHOLD),
+    ("date", infer_date, DATE_NA_THRESHOLD),
+    ("timedelta", infer_timedelta, TIMEDELTA_NA_THRESHOLD),
+]
+CANDIDATE_CONVERTERS = {name: convert for name, convert, _ in INFER_CANDIDATES}
+CANDIDATE_THRESHOLDS = {name: threshold for name, _, threshold in INFER_CANDIDATES}
+# Tie break order when no candidate is under its threshold.
+FALLBACK_ORDER = ["int", "date", "timedelta", "bool"]
 
 
 def process_operation_apply_script(
-    prev_df: pd.DataFrame, col: str, raw_script: str
+    prev_df: pd.DataFrame, col: str, raw_script: str, stats: dict | None = None
 ) -> pd.DataFrame:
     """Return the data frame that processed by raw_script as lambda function.
     The support method is list in SAFE_NAMESPACES.
+    Numeric scripts are computed on the whole column and repetitive columns
+    once per distinct value, see CompiledScript. stats, when given, is filled
+    with the mode used and the evaluations saved.
     """
-    prev_df[col] = prev_df[col].apply(
-        lambda x: eval(raw_script, SAFE_NAMESPACES, {"x": x})
-    )
+    prev_df[col] = compile_script(raw_script).apply(prev_df[col], stats)
     return prev_df
 
 
-def process_operation_cast_to(
-    prev_df: pd.DataFrame, col: str, operation_type: str
-) -> pd.DataFrame:
+def process_operation_cast_to(prev_df: pd.DataFrame, col: str, operation_type: str) -> pd.DataFrame:
+    prev_df[col] = cast_column(prev_df[col], operation_type)
+    return prev_df
+
+
+def cast_column(col: pd.Series, operation_type: str) -> pd.Series:
     match operation_type:
         case "cast_to_numeric":
-            prev_df[col] = pd.to_numeric(prev_df[col], errors="coerce")
+            return pd.to_numeric(col, errors="coerce")
         case "cast_to_string":
-            prev_df[col] = prev_df[col].apply(str)
+            return cast_string(col)
         case "cast_to_datetime":
-            prev_df[col] = pd.to_datetime(prev_df[col], errors="coerce")
+            return pd.to_datetime(col, errors="coerce")
         case "cast_to_timedelta":
-            prev_df[col] = pd.to_timedelta(prev_df[col], errors="coerce")
+            return pd.to_timedelta(col, errors="coerce")
         case "cast_to_boolean":
-            prev_df[col] = prev_df[col].apply(bool)
+            return cast_boolean(col)
         case "cast_to_category":
-            prev_df[col] = pd.Categorical(prev_df[col])
-    return prev_df
+            return pd.Series(pd.Categorical(col), index=col.index, name=col.name)
+    return col
+
+
+def cast_string(col: pd.Series) -> pd.Series:
+    """Cast col to the nullable string dtype, nulls stay NA.
+
+    Dates and durations are written the way str() writes them, e.g.
+    "2020-01-01 00:00:00", astype("string") drops a midnight time part.
+    """
+    if pd.api.types.is_datetime64_any_dtype(col.dtype) or pd.api.types.is_timedelta64_dtype(
+        col.dtype
+    ):
+        return col.map(str, na_action="ignore").astype("string")
+    return col.astype("string")
+
+
+def cast_boolean(col: pd.Series) -> pd.Series:
+    """Cast col to the nullable boolean dtype.
+
+    Numbers are True unless 0, other values are mapped by infer_boolean and
+    anything outside its vocabulary becomes NA.
+    """
+    if pd.api.types.is_bool_dtype(col.dtype):
+        return col.astype("boolean")
+    if pd.api.types.is_numeric_dtype(col.dtype):
+        return col.astype("Float64").ne(0)
+    return infer_boolean(col)
 
 
 def process_operation_fill_null(
-    prev_df: pd.DataFrame, col: str, to_fill: str
+    prev_df: pd.DataFrame,
+    col: str | list,
+    to_fill: str | None = None,
+    strategy: str | None = None,
 ) -> pd.DataFrame:
-    col_dtype = prev_df[col].dtype
-    # Convert the 'to_fill' value to the type of the column
-    if col_dtype == "object":
-        to_fill_converted = str(to_fill)
-    elif col_dtype == "int":
-        to_fill_converted = int(to_fill)
-    elif col_dtype == "float":
-        to_fill_converted = float(to_fill)
-    elif col_dtype == "datetime64[ns]":
-        to_fill_converted = pd.to_datetime(to_fill)
-    elif col_dtype == "timedelta64[ns]":
-        to_fill_converted = pd.Timedelta(to_fill)
-    else:
-        raise TypeError("Unsupported column data type")
-    prev_df[col].fillna(to_fill_converted, inplace=True)
+    """Fill the nulls of col, a column or a list of them, in place.
+
+    strategy is one of FILL_STRATEGIES, constant by default: to_fill converted
+    to the dtype of each column. mean, median and mode fill a statistic of the
+    column, ffill and bfill the previous and next non null value.
+    """
+    strategy = strategy or FillStrategy.CONSTANT
+    if strategy not in FILL_STRATEGIES:
+        raise ValueError(f"Unsupported fill strategy {strategy}")
+    columns = operation_columns(col)
+
+    if strategy in DIRECTIONAL_FILL_STRATEGIES:
+        for name in columns:
+            prev_df[name] = getattr(prev_df[name], strategy)()
+        return prev_df
+
+    values = {}
+    for name in columns:
+        value = fill_value(prev_df[name], to_fill, strategy)
+        if value is None:
+            # Only nulls, there's no statistic to fill.
+            continue
+        if (
+            isinstance(prev_df[name].dtype, pd.CategoricalDtype)
+            and value not in prev_df[name].cat.categories
+        ):
+            prev_df[name] = prev_df[name].cat.add_categories([value])
+        values[name] = value
+    # One fillna on the frame writes the filled columns back, unlike fillna
+    # with inplace on a column selection.
+    prev_df.fillna(values, inplace=True)
     return prev_df
 
 
+def fill_value(col: pd.Series, to_fill: str | None, strategy: str):
+    """Return the value strategy fills col with, None when col is only nulls."""
+    if strategy == FillStrategy.CONSTANT:
+        if to_fill is None:
+            raise ValueError("The constant fill strategy needs a to_fill value")
+        return convert_fill_value(col.dtype, to_fill)
+    if strategy == FillStrategy.MODE:
+        modes = col.mode(dropna=True)
+        return None if modes.empty else modes.iloc[0]
+
+    dtype = col.dtype
+    if pd.api.types.is_bool_dtype(dtype) or not (
+        pd.api.types.is_numeric_dtype(dtype)
+        or pd.api.types.is_datetime64_any_dtype(dtype)
+        or pd.api.types.is_timedelta64_dtype(dtype)
+    ):
+        raise TypeError(f"The {strategy} of a {dtype} column isn't defined")
+    value = getattr(col, strategy)(skipna=True)
+    if pd.isna(value):
+        return None
+    if pd.api.types.is_integer_dtype(dtype):
+        # Integer columns stay integer, the statistic is rounded.
+        return round(value)
+    return value
+
+
+def convert_fill_value(dtype, to_fill: str):
+    """Convert to_fill, as sent by the client, to a value of dtype."""
+    if isinstance(dtype, pd.CategoricalDtype):
+        return convert_fill_value(dtype.categories.dtype, to_fill)
+    if isinstance(dtype, pd.ArrowDtype):
+        return pa.scalar(to_fill).cast(dtype.pyarrow_dtype).as_py()
+    if pd.api.types.is_bool_dtype(dtype):
+        value = cast_boolean(pd.Series([to_fill])).iloc[0]
+        if pd.isna(value):
+            raise ValueError(f"{to_fill} isn't a boolean")
+        return bool(value)
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return pd.to_datetime(to_fill)
+    if pd.api.types.is_timedelta64_dtype(dtype):
+        return pd.Timedelta(to_fill)
+    if pd.api.types.is_integer_dtype(dtype):
+        return int(to_fill)
+    if pd.api.types.is_float_dtype(dtype):
+        return float(to_fill)
+    if pd.api.types.is_string_dtype(dtype):
+        return str(to_fill)
+    raise TypeError("Unsupported column data type")
+
+
 def map_df_to_json(df: pd.DataFrame) -> str:
     return df.to_json(orient="table")
 
 
 def create_dataframe_async(df: pd.DataFrame, dataframe_id: str, version_id: str):
     try:
-        processed_data = infer_df_parallel(df)
+        processed_data = infer_df_parallel(df, inference_cache)
+        logger.info("inference cache stats %s", inference_cache.stats())
+        if USE_ARROW_DTYPES:
+            processed_data = to_arrow_dtypes(processed_data)
         upload_dataframe(dataframe_id, version_id, processed_data)
         update_status(dataframe_id, version_id, ProcessStatus.PROCESSED)
     except Exception as e:
@@ -250,6 +928,116 @@ def create_dataframe_async(df: pd.DataFrame, dataframe_id: str, version_id: str)
         update_status(dataframe_id, version_id, ProcessStatus.FAIL)
 
 
+def apply_operation(
+    df: pd.DataFrame,
+    operation_type: str,
+    column: str,
+    raw_script: str | None = None,
+    to_fill: str | None = None,
+    stats: dict | None = None,
+    strategy: str | None = None,
+    use_pool: bool = False,
+) -> pd.DataFrame:
+    """Apply one operation to column, stats is filled by apply_script.
+
+    column may be a list of columns, see process_operation_columns, strategy
+    is the fill_null strategy. use_pool is only for job processes, see
+    process_operation_columns.
+    """
+    if operation_type == OperationType.FILL_NULL:
+        processed_dataframe = process_operation_fill_null(df, column, to_fill, strategy)
+    elif isinstance(column, list):
+        processed_dataframe = process_operation_columns(
+            df, operation_type, column, raw_script, stats, use_pool
+        )
+    elif operation_type == OperationType.APPLY_SCRIPT:
+        processed_dataframe = process_operation_apply_script(df, column, raw_script, stats)
+    else:
+        processed_dataframe = process_operation_cast_to(df, column, operation_type)
+    if USE_ARROW_DTYPES:
+        for name in operation_columns(column):
+            processed_dataframe[name] = to_arrow_dtype(processed_dataframe[name])
+    return processed_dataframe
+
+
+def process_operation_columns(
+    prev_df: pd.DataFrame,
+    operation_type: str,
+    columns: list,
+    raw_script: str | None = None,
+    stats: dict | None = None,
+    use_pool: bool = False,
+) -> pd.DataFrame:
+    """Apply a cast or a script to every column of columns, concurrently.
+
+    Casts and NumPy computed scripts spend their time in pandas and Arrow
+    kernels that release the GIL, so columns run in threads. With use_pool,
+    scripts evaluated row by row hold it and run in the inference pool
+    instead, when there is more than one CPU to share them. Only job
+    processes pass it: the web process (previews, replays of read views)
+    must not fork the pool from its threads. stats, when given, is filled
+    with the apply_script stats per column.
+    """
+    stats = {} if stats is None else stats
+    if (
+        use_pool
+        and operation_type == OperationType.APPLY_SCRIPT
+        and not compile_script(raw_script).vectorizable
+        and COLUMN_THREADS > 1
+        and len(columns) > 1
+    ):
+        results = apply_script_parallel(prev_df, columns, raw_script)
+    else:
+
+        def transform(name):
+            col_stats = {}
+            if operation_type == OperationType.APPLY_SCRIPT:
+                col = compile_script(raw_script).apply(prev_df[name], col_stats)
+            else:
+                col = cast_column(prev_df[name], operation_type)
+            return col, col_stats
+
+        with ThreadPoolExecutor(min(COLUMN_THREADS, len(columns))) as executor:
+            results = dict(zip(columns, executor.map(transform, columns), strict=True))
+
+    for name, (col, col_stats) in results.items():
+        prev_df[name] = col
+        if col_stats:
+            stats[name] = col_stats
+    return prev_df
+
+
+def apply_script_to_column(col: pd.Series, raw_script: str) -> tuple:
+    """Pool task: return (raw_script applied to col, its stats)."""
+    stats = {}
+    return compile_script(raw_script).apply(col, stats), stats
+
+
+def apply_script_parallel(df: pd.DataFrame, columns: list, raw_script: str) -> dict:
+    """Return {column: (result, stats)} of raw_script on every column of
+    columns, applied by the inference pool.
+
+    Columns are pickled rather than shared as Arrow, which turns None into
+    NaN in object columns and a script can tell them apart. At most
+    INFERENCE_POOL_INFLIGHT columns are in flight at a time.
+    """
+    pool = get_inference_pool()
+    results = {}
+    inflight = deque()
+
+    def collect():
+        name, task = inflight.popleft()
+        results[name] = task.get()
+
+    for name in columns:
+        if len(inflight) >= INFERENCE_POOL_INFLIGHT:
+            collect()
+        inflight.append((name, pool.apply_async(apply_script_to_column, (df[name], raw_script))))
+    while inflight:
+        collect()
+    return results
+
+
 def process_dataframe_async(
     df: pd.DataFrame,
     dataframe_id: str,
@@ -258,16 +1046,136 @@ def process_dataframe_async(
     column: str,
     raw_script: str | None = None,
     to_fill: str | None = None,
+    checkpoint: bool = True,
+    strategy: str | None = None,
+    base_version_id: str | None = None,
 ):
+    """Apply one operation to df, the previous version.
+
+    Without checkpoint the result isn't uploaded, the version is replayed from
+    its parent when read (see version_store), and only how long the operation
+    took is recorded. An operation the planner finds has no effect, e.g. a
+    cast to the dtype the column has, isn't run and the version records why.
+    With base_version_id, df holds only some columns of the previous version,
+    see version_store.get_operation_input.
+    """
     try:
-        if operation_type == OperationType.APPLY_SCRIPT:
-            processed_dataframe = process_operation_apply_script(df, column, raw_script)
-        elif operation_type == OperationType.FILL_NULL:
-            processed_dataframe = process_operation_fill_null(df, column, to_fill)
-        else:
-            processed_dataframe = process_operation_cast_to(df, column, operation_type)
-        upload_dataframe(dataframe_id, updated_version_id, processed_dataframe)
+        script_stats = {}
+        start_time = time.time()
+        step = {
+            "operation": operation_type,
+            "column": column,
+            "script": raw_script,
+            "to_fill": to_fill,
+            "strategy": strategy,
+        }
+        plan = plan_operations([step], df.dtypes)
+        processed_dataframe = df
+        if plan.steps:
+            # Columns the operation has no effect on are left out of it.
+            column = plan.steps[0]["column"]
+            processed_dataframe = apply_operation(
+                df,
+                operation_type,
+                column,
+                raw_script,
+                to_fill,
+                script_stats,
+                strategy,
+                use_pool=True,
+            )
+        fields = save_version(
+            dataframe_id,
+            updated_version_id,
+            processed_dataframe,
+            start_time,
+            checkpoint,
+            base_version_id,
+        )
+        if script_stats:
+            fields["script_stats"] = script_stats
+        if plan.rewrites:
+            fields.update(plan=plan.steps, plan_rewrites=plan.rewrites)
+        update_version(dataframe_id, updated_version_id, fields)
         update_status(dataframe_id, updated_version_id, ProcessStatus.PROCESSED)
     except Exception as e:
         logger.error("exception during process_dataframe_async, %s", e)
         update_status(dataframe_id, updated_version_id, ProcessStatus.FAIL)
+
+
+def process_batch_async(
+    df: pd.DataFrame,
+    dataframe_id: str,
+    updated_version_id: str,
+    steps: list,
+    checkpoint: bool = True,
+    base_version_id: str | None = None,
+):
+    """Apply steps, in order, to df in memory and upload the result once.
+
+    Each step is a {"column", "operation", "script"?, "to_fill"?, "strategy"?}
+    dict as recorded in the batch version. The apply_script stats of every
+    step are written back to the version, and the index of the step that
+    failed, if any, as failed_step. checkpoint and base_version_id are the
+    same as for process_dataframe_async.
+
+    The steps are first rewritten by plan_operations; when that changes them
+    the steps run are recorded as plan, with the rewrites, and failed_step is
+    an index in plan.
+    """
+    failed_step = None
+    plan_fields = {}
+    try:
+        recorded_steps = []
+        start_time = time.time()
+        plan = plan_operations(steps, df.dtypes)
+        if plan.rewrites:
+            plan_fields = {"plan": plan.steps, "plan_rewrites": plan.rewrites}
+        for step_index, step in enumerate(plan.steps):
+            failed_step = step_index
+            script_stats = {}
+            df = apply_operation(
+                df,
+                step["operation"],
+                step["column"],
+                step.get("script"),
+                step.get("to_fill"),
+                script_stats,
+                step.get("strategy"),
+                use_pool=True,
+            )
+            recorded_steps.append(
+                {**step, **({"script_stats": script_stats} if script_stats else {})}
+            )
+        failed_step = None
+        fields = save_version(
+            dataframe_id, updated_version_id, df, start_time, checkpoint, base_version_id
+        )
+        if plan.rewrites:
+            fields.update(plan=recorded_steps, plan_rewrites=plan.rewrites)
+        else:
+            fields["steps"] = recorded_steps
+        update_version(dataframe_id, updated_version_id, fields)
+        update_status(dataframe_id, updated_version_id, ProcessStatus.PROCESSED)
+    except Exception as e:  # noqa: BLE001, any failure of the job is recorded as FAIL
+        logger.error("exception during process_batch_async at step %s, %s", failed_step, e)
+        if failed_step is not None:
+            update_version(
+                dataframe_id, updated_version_id, {"failed_step": failed_step, **plan_fields}
+            )
+        update_status(dataframe_id, updated_version_id, ProcessStatus.FAIL)
+
+
+def save_version(
+    dataframe_id: str,
+    version_id: str,
+    df: pd.DataFrame,
+    start_time: float,
+    checkpoint: bool,
+    base_version_id: str | None = None,
+) -> dict:
+    """Upload df if checkpoint, return the version fields to record."""
+    replay_seconds = time.time() - start_time
+    if checkpoint:
+        upload_dataframe(dataframe_id, version_id, df, base_version_id)
+    return {"materialized": checkpoint, "replay_seconds": replay_seconds}
@@ -0,0 +1,101 @@
+import logging
+from collections import OrderedDict
+
+import pandas as pd
+from pymongo.errors import PyMongoError
+
+from .column_transport import content_hash
+from .mongo_client import (
+    MONGO_URI,
+    create_inference_cache_indexes,
+    evict_inference_decisions,
+    find_inference_decision,
+    get_inference_cache_counters,
+    increment_inference_cache_counter,
+    save_inference_decision,
+)
+
+
+logger = logging.getLogger(__name__)
+
+INFERENCE_CACHE_SIZE = 10_000
+# Part of every key, bump it whenever a change to inference (a threshold, a
+# candidate, a parser) could change the decision for the same content.
+INFERENCE_CACHE_VERSION = 1
+
+
+def column_key(col: pd.Series) -> str:
+    """Return a content hash of col: its values and dtype, not its name."""
+    return content_hash(col, salt=str(INFERENCE_CACHE_VERSION))
+
+
+class InferenceCache:
+    """LRU cache of inference decisions, keyed by column_key.
+
+    Decisions are kept in memory and, when persistent, written through to
+    Mongo so they survive the process (uploads are inferred in a short lived
+    child process). The persistent store is evicted by last use too. Mongo
+    errors are logged and treated as misses, the cache never fails inference.
+    """
+
+    def __init__(self, max_size: int = INFERENCE_CACHE_SIZE, persistent: bool = False):
+        self.max_size = max_size
+        self.persistent = persistent
+        self.decisions = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.indexed = False
+
+    def get(self, key: str) -> dict | None:
+        decision = self.decisions.get(key)
+        if decision is not None:
+            self.decisions.move_to_end(key)
+        elif self.persistent:
+            decision = self.call_store(find_inference_decision, key)
+            if decision is not None:
+                self.remember(key, decision)
+
+        counter = "misses" if decision is None else "hits"
+        setattr(self, counter, getattr(self, counter) + 1)
+        if self.persistent:
+            self.call_store(increment_inference_cache_counter, counter)
+        return decision
+
+    def put(self, key: str, decision: dict):
+        self.remember(key, decision)
+        if self.persistent:
+            self.call_store(save_inference_decision, key, decision)
+            self.call_store(evict_inference_decisions, self.max_size)
+
+    def remember(self, key: str, decision: dict):
+        self.decisions[key] = decision
+        self.decisions.move_to_end(key)
+        if len(self.decisions) > self.max_size:
+            self.decisions.popitem(last=False)
+
+    def stats(self) -> dict:
+        """Hit and miss counters, across processes when persistent."""
+        if self.persistent:
+            counters = self.call_store(get_inference_cache_counters)
+            if counters is not None:
+                return counters
+        return {"hits": self.hits, "misses": self.misses}
+
+    def clear(self):
+        self.decisions.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def call_store(self, func, *args):
+        try:
+            if not self.indexed:
+                create_inference_cache_indexes()
+                self.indexed = True
+            return func(*args)
+        except PyMongoError as e:
+            logger.warning("inference cache store unavailable: %s", e)
+            return None
+
+
+# Persistent only where Mongo is configured, e.g. not when running the tests.
+inference_cache = InferenceCache(persistent=MONGO_URI is not None)
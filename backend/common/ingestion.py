@@ -0,0 +1,157 @@
+import logging
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .compression import frame_codec, write_options
+from .data_processors import (
+    DATE_NA_THRESHOLD,
+    INT_NA_THRESHOLD,
+    infer_date,
+    infer_int,
+)
+from .minio_client import upload_parquet_file
+from .mongo_client import update_status
+from .processing_enum import ProcessStatus
+
+
+logger = logging.getLogger(__name__)
+
+INGESTION_CHUNK_SIZE = 100_000
+FLOAT_NA_THRESHOLD = INT_NA_THRESHOLD
+
+# Promotion order of a streamed column, a column only ever moves up.
+TYPE_LATTICE = ["int", "float", "datetime", "string"]
+LATTICE_NA_THRESHOLDS = {
+    "int": INT_NA_THRESHOLD,
+    "float": FLOAT_NA_THRESHOLD,
+    "datetime": DATE_NA_THRESHOLD,
+}
+LATTICE_ARROW_TYPES = {
+    "int": pa.int64(),
+    "float": pa.float64(),
+    "datetime": pa.timestamp("ns"),
+    "string": pa.string(),
+}
+
+
+def parse_float(col: pd.Series) -> pd.Series:
+    return pd.to_numeric(col, errors="coerce")
+
+
+LATTICE_PARSERS = {
+    "int": infer_int,
+    "float": parse_float,
+    "datetime": infer_date,
+}
+
+
+class ColumnEvidence:
+    """Type evidence of one column, updated a chunk at a time.
+
+    For every lattice level from the current one up, count the non null values
+    that level fails to parse. The column is promoted as soon as the failure
+    share of its current level reaches the level's NA threshold, levels below
+    the current one are never parsed again.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.level = 0
+        self.row_cnt = 0
+        self.failures = {level: 0 for level in LATTICE_PARSERS}
+
+    @property
+    def col_type(self) -> str:
+        return TYPE_LATTICE[self.level]
+
+    def update(self, col: pd.Series):
+        self.row_cnt += len(col)
+        present = col.notna()
+        for level in TYPE_LATTICE[self.level :]:
+            if level not in LATTICE_PARSERS:
+                continue
+            parsed = LATTICE_PARSERS[level](col)
+            self.failures[level] += int((present & parsed.isna()).sum())
+        while self.col_type in LATTICE_PARSERS and (
+            self.failures[self.col_type] / self.row_cnt >= LATTICE_NA_THRESHOLDS[self.col_type]
+        ):
+            self.level += 1
+            logger.info("column %s promoted to %s", self.name, self.col_type)
+
+
+def convert_chunk(col: pd.Series, col_type: str) -> pd.Series:
+    if col_type == "string":
+        return col
+    return LATTICE_PARSERS[col_type](col)
+
+
+def read_csv_chunks(path: str, chunksize: int):
+    # Everything is read as text, the lattice decides the types.
+    return pd.read_csv(path, dtype=str, chunksize=chunksize)
+
+
+def scan_csv_types(path: str, chunksize: int = INGESTION_CHUNK_SIZE) -> dict:
+    """First pass: return {column: lattice type} from the whole file."""
+    evidence = {}
+    with read_csv_chunks(path, chunksize) as reader:
+        for chunk in reader:
+            for col in chunk.columns:
+                if col not in evidence:
+                    evidence[col] = ColumnEvidence(col)
+                evidence[col].update(chunk[col])
+    return {col: col_evidence.col_type for col, col_evidence in evidence.items()}
+
+
+def stream_csv_to_parquet(
+    path: str, destination: str, chunksize: int = INGESTION_CHUNK_SIZE
+) -> dict:
+    """Convert the CSV at path into a Parquet file with one row group per chunk.
+
+    The file is read twice, once to settle the column types and once to write
+    them, so memory is bounded by chunksize whatever the file size.
+    Return {column: lattice type}.
+    """
+    col_types = scan_csv_types(path, chunksize)
+    schema = pa.schema([pa.field(str(col), LATTICE_ARROW_TYPES[t]) for col, t in col_types.items()])
+    writer = None
+    try:
+        with read_csv_chunks(path, chunksize) as reader:
+            for chunk in reader:
+                typed = pd.DataFrame(
+                    {str(col): convert_chunk(chunk[col], t) for col, t in col_types.items()}
+                )
+                if writer is None:
+                    # The codec of the file is chosen on its first chunk.
+                    writer = pq.ParquetWriter(
+                        destination, schema, **write_options(frame_codec(typed))
+                    )
+                writer.write_table(pa.Table.from_pandas(typed, schema=schema, preserve_index=False))
+        if writer is None:
+            empty = schema.empty_table().to_pandas()
+            writer = pq.ParquetWriter(destination, schema, **write_options(frame_codec(empty)))
+    finally:
+        if writer is not None:
+            writer.close()
+    return col_types
+
+
+def create_dataframe_streaming_async(path: str, dataframe_id: str, version_id: str):
+    """Same as create_dataframe_async for a CSV saved at path, streamed in
+    chunks instead of loaded in memory. path is removed once done.
+    """
+    destination = f"{path}.parquet"
+    try:
+        col_types = stream_csv_to_parquet(path, destination)
+        logger.info("streamed %s with types %s", dataframe_id, col_types)
+        upload_parquet_file(dataframe_id, version_id, destination)
+        update_status(dataframe_id, version_id, ProcessStatus.PROCESSED)
+    except Exception as e:  # noqa: BLE001, any failure of the job is recorded as FAIL
+        logger.error("exception during create_dataframe_streaming_async, %s", e)
+        update_status(dataframe_id, version_id, ProcessStatus.FAIL)
+    finally:
+        for leftover in (path, destination):
+            if os.path.exists(leftover):
+                os.remove(leftover)
@@ -1,9 +1,25 @@
+import io
+import json
 import logging
 import os
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 from io import BytesIO
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 from minio import Minio
+from minio.error import S3Error
+
+from .arrow_dtypes import ARROW_READ_OPTIONS, USE_ARROW_DTYPES
+from .column_transport import COLUMN_FIELD, content_hash
+from .compression import LEGACY_COMPRESSION, file_codec, frame_codec, write_options
+from .row_filters import filter_clauses, filter_columns, matching_positions
 
 
 MINIO_URL = os.getenv("MINIO_URL")
@@ -14,40 +30,688 @@ logger = logging.getLogger(__name__)
 # This isn't not secure, just for sake of setup and prototype.
 client = Minio(MINIO_URL, secure=False, cert_check=False)
 dataframe_bucket_name = "dataframes"
+# Whether the bucket is known to exist, see ensure_bucket.
+bucket_ready = False
+bucket_lock = threading.Lock()
 
 
 PARQUET_ENGINE = "pyarrow"
+# Kept from when every object was brotli, the codec is in the Parquet footer
+# and in the object metadata, see compression.
 STORAGE_FILE_EXTENSION = "br"
-COMPRESSION = "brotli"
 
+# Rows per Parquet row group, the first rows of a version are read by
+# decoding its first row groups only, see get_dataframe_head.
+ROW_GROUP_SIZE = 100_000
 
-def upload_dataframe(dataframe_id: str, version_id: str, df: pd.DataFrame):
-    buffer = BytesIO()
-    df.to_parquet(buffer, engine=PARQUET_ENGINE, compression=COMPRESSION)
-    buffer.seek(0)
+# Version of the manifest layout, see upload_dataframe.
+MANIFEST_FORMAT = 1
+COLUMN_DOWNLOAD_THREADS = 8
 
-    destination_file = f"{dataframe_id}_{version_id}.{STORAGE_FILE_EXTENSION}"
-    found = client.bucket_exists(dataframe_bucket_name)
-    if not found:
-        client.make_bucket(dataframe_bucket_name)
-        logger.info("Created bucket", dataframe_bucket_name)
+# User metadata of objects naming their codec, read back as x-amz-meta-codec.
+CODEC_METADATA = "x-amz-meta-codec"
+
+# Objects are uploaded in parts of UPLOAD_PART_SIZE, UPLOAD_THREADS at a time,
+# see put_parquet. S3 parts are at least 5 MiB.
+UPLOAD_PART_SIZE = 10 * 1024 * 1024
+UPLOAD_THREADS = 4
+
+# Objects are read by HTTP range requests of whole blocks, see ObjectFile.
+READ_BLOCK_SIZE = 1024 * 1024
+READ_AHEAD_BLOCKS = 4
+CACHED_BLOCKS = 16
+
+
+class ObjectFile(io.RawIOBase):
+    """A read only, seekable file over an object, read by range requests.
+
+    pyarrow seeks to the footer then reads only the column chunks it needs,
+    so the whole object is never downloaded nor held at once. Reads are
+    rounded to READ_BLOCK_SIZE blocks; a read missing blocks fetches from
+    the first missing one to READ_AHEAD_BLOCKS past the last, in one
+    request. The last CACHED_BLOCKS blocks are kept, the footer is read
+    several times.
+    """
+
+    def __init__(self, object_name: str):
+        super().__init__()
+        self.object_name = object_name
+        self.size = client.stat_object(dataframe_bucket_name, object_name).size
+        self.position = 0
+        self.blocks = OrderedDict()
+        # pyarrow may read from several threads.
+        self.lock = threading.Lock()
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError(f"negative seek position {offset}")
+        self.position = offset
+        return self.position
+
+    def close(self):
+        self.blocks.clear()
+        super().close()
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = self.size - self.position
+        data = self.read_range(self.position, size)
+        self.position += len(data)
+        return data
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+    def read_range(self, start: int, length: int) -> bytes:
+        end = min(start + length, self.size)
+        if start >= end:
+            return b""
+        first, last = start // READ_BLOCK_SIZE, (end - 1) // READ_BLOCK_SIZE
+        with self.lock:
+            blocks = {i: self.blocks[i] for i in range(first, last + 1) if i in self.blocks}
+            missing = [i for i in range(first, last + 1) if i not in blocks]
+            if missing:
+                fetched = self.fetch(missing[0], missing[-1] + READ_AHEAD_BLOCKS)
+                blocks.update(fetched)
+                self.blocks.update(fetched)
+            for i in range(first, last + 1):
+                self.blocks.move_to_end(i)
+            while len(self.blocks) > CACHED_BLOCKS:
+                self.blocks.popitem(last=False)
+        data = b"".join(blocks[i] for i in range(first, last + 1))
+        offset = first * READ_BLOCK_SIZE
+        return data[start - offset : end - offset]
+
+    def fetch(self, first: int, last: int) -> dict:
+        """Download blocks first to last, as far as the object goes."""
+        offset = first * READ_BLOCK_SIZE
+        length = min((last + 1) * READ_BLOCK_SIZE, self.size) - offset
+        response = client.get_object(
+            dataframe_bucket_name, self.object_name, offset=offset, length=length
+        )
+        try:
+            data = response.read()
+        finally:
+            response.close()
+            response.release_conn()
+        logger.debug("read %s bytes of %s at %s", len(data), self.object_name, offset)
+        return {
+            first + i: data[i * READ_BLOCK_SIZE : (i + 1) * READ_BLOCK_SIZE]
+            for i in range((len(data) + READ_BLOCK_SIZE - 1) // READ_BLOCK_SIZE)
+        }
+
+
+class PartPipe:
+    """A file Parquet is written to by one thread and read by another.
+
+    At most max_bytes written are waiting to be read, write blocks until
+    the reader catches up. The writer closes the pipe, with the error it
+    failed on if any, which the reader then raises instead of reading an
+    incomplete file.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.chunks = deque()
+        self.waiting_bytes = 0
+        self.written_bytes = 0
+        self.closed = False
+        self.aborted = False
+        self.error = None
+        self.condition = threading.Condition()
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.written_bytes
+
+    def flush(self):
+        pass
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        with self.condition:
+            while self.waiting_bytes >= self.max_bytes and not self.aborted:
+                self.condition.wait()
+            if self.aborted:
+                raise OSError("upload aborted")
+            self.chunks.append(data)
+            self.waiting_bytes += len(data)
+            self.written_bytes += len(data)
+            self.condition.notify_all()
+        return len(data)
+
+    def close(self, error: BaseException | None = None):
+        with self.condition:
+            self.closed = True
+            self.error = error
+            self.condition.notify_all()
+
+    def abort(self):
+        with self.condition:
+            self.aborted = True
+            self.condition.notify_all()
+
+    def read(self, size: int = -1) -> bytes:
+        """Return size bytes, fewer only at the end, the rest if size < 0."""
+        parts = []
+        remaining = size if size >= 0 else float("inf")
+        with self.condition:
+            while remaining > 0:
+                while not self.chunks and not self.closed:
+                    self.condition.wait()
+                if self.error is not None:
+                    raise OSError("encoding failed") from self.error
+                if not self.chunks:
+                    break
+                chunk = self.chunks.popleft()
+                if len(chunk) > remaining:
+                    self.chunks.appendleft(chunk[remaining:])
+                    chunk = chunk[:remaining]
+                parts.append(chunk)
+                self.waiting_bytes -= len(chunk)
+                remaining -= len(chunk)
+                self.condition.notify_all()
+        return b"".join(parts)
+
+
+def upload_dataframe(
+    dataframe_id: str, version_id: str, df: pd.DataFrame, base_version_id: str | None = None
+):
+    """Upload df as one object per column plus a manifest listing them.
+
+    Column objects are named after their content, so a column left unchanged
+    since an earlier version is already stored and isn't uploaded again.
+    Frames with a MultiIndex, or with labels the JSON manifest can't hold
+    (e.g. dates from Excel headers), are stored as a single file instead.
+
+    With base_version_id, a version stored with a manifest, df may hold only
+    the columns that changed since it: the other columns, the rows and the
+    index are listed as they are in its manifest.
+    """
+    if (
+        isinstance(df.columns, pd.MultiIndex)
+        or isinstance(df.index, pd.MultiIndex)
+        or not all(is_json_label(label) for label in [*df.columns, df.index.name])
+    ):
+        upload_dataframe_file(dataframe_id, version_id, df)
+        return
+
+    ensure_bucket()
+    columns = []
+    uploaded_cnt = 0
+    for position, name in enumerate(df.columns):
+        object_name, codec, uploaded = upload_column(dataframe_id, df.iloc[:, position])
+        columns.append({"name": name, "object": object_name, "codec": codec})
+        uploaded_cnt += uploaded
+
+    if base_version_id is None:
+        rows = len(df)
+        index = index_manifest(dataframe_id, df.index)
     else:
-        logger.info("Bucket ", dataframe_bucket_name, " already exists")
+        base = get_manifest(dataframe_id, base_version_id)
+        changed = {entry["name"]: entry for entry in columns}
+        columns = [changed.get(entry["name"], entry) for entry in base["columns"]]
+        rows = base["rows"]
+        index = base["index"]
 
+    manifest = {
+        "format": MANIFEST_FORMAT,
+        "rows": rows,
+        "columns": columns,
+        "index": index,
+    }
+    data = json.dumps(manifest).encode()
     client.put_object(
-        dataframe_bucket_name, destination_file, buffer, -1, part_size=10 * 1024 * 1024
+        dataframe_bucket_name, manifest_name(dataframe_id, version_id), BytesIO(data), len(data)
+    )
+    logger.info(
+        "DataFrame with id %s uploaded %s of %s columns",
+        dataframe_id,
+        uploaded_cnt,
+        len(columns),
     )
+
+
+def is_json_label(label) -> bool:
+    """Whether a column or index label keeps its type through the manifest."""
+    return label is None or isinstance(label, str | int | float | bool)
+
+
+def upload_column(dataframe_id: str, col: pd.Series) -> tuple[str, str, bool]:
+    """Return (object name, codec, whether it had to be uploaded) of col.
+
+    A column already stored keeps the codec it was written with.
+    """
+    object_name = f"{dataframe_id}/columns/{content_hash(col)}.{STORAGE_FILE_EXTENSION}"
+    codec = stored_codec(object_name)
+    if codec is not None:
+        return object_name, codec, False
+
+    df = pd.DataFrame({COLUMN_FIELD: col.reset_index(drop=True)})
+    codec = frame_codec(df)
+    put_parquet(object_name, df, codec, index=False)
+    return object_name, codec, True
+
+
+def index_manifest(dataframe_id: str, index: pd.Index) -> dict:
+    if isinstance(index, pd.RangeIndex):
+        return {
+            "start": index.start,
+            "stop": index.stop,
+            "step": index.step,
+            "name": index.name,
+        }
+    object_name, codec, _ = upload_column(dataframe_id, index.to_series())
+    return {"object": object_name, "codec": codec, "name": index.name}
+
+
+def stored_codec(object_name: str) -> str | None:
+    """Return the codec an object was written with, None if it doesn't exist."""
+    try:
+        stat = client.stat_object(dataframe_bucket_name, object_name)
+    except S3Error as e:
+        if e.code == "NoSuchKey":
+            return None
+        raise
+    return (stat.metadata or {}).get(CODEC_METADATA, LEGACY_COMPRESSION)
+
+
+def manifest_name(dataframe_id: str, version_id: str) -> str:
+    return f"{dataframe_id}_{version_id}.manifest.json"
+
+
+def upload_dataframe_file(dataframe_id: str, version_id: str, df: pd.DataFrame):
+    """Upload df as a single Parquet file, the layout before manifests."""
+    put_parquet(file_name(dataframe_id, version_id), df, frame_codec(df))
     logger.info("DataFrame with id %s successfully uploaded as object", dataframe_id)
 
 
-def get_dataframe(dataframe_id: str, version_id: str) -> pd.DataFrame:
-    raw_byte = client.get_object(
-        dataframe_bucket_name, f"{dataframe_id}_{version_id}.{STORAGE_FILE_EXTENSION}"
+def upload_parquet_file(dataframe_id: str, version_id: str, path: str):
+    """Upload a Parquet file already written to disk, part by part."""
+    ensure_bucket()
+    client.fput_object(
+        dataframe_bucket_name,
+        file_name(dataframe_id, version_id),
+        path,
+        metadata={CODEC_METADATA: file_codec(pq.ParquetFile(path).metadata)},
+        part_size=UPLOAD_PART_SIZE,
+        num_parallel_uploads=UPLOAD_THREADS,
     )
-    buffer = BytesIO()
-    for d in raw_byte.stream(32 * 1024):
-        buffer.write(d)
-    buffer.seek(0)
+    logger.info("DataFrame with id %s successfully uploaded from file", dataframe_id)
+
+
+def put_parquet(object_name: str, df: pd.DataFrame, codec: str, **parquet_options):
+    """Upload df as a Parquet object written with codec, streamed to a
+    multipart upload while it is encoded.
 
-    df = pd.read_parquet(buffer, engine=PARQUET_ENGINE)
+    A thread encodes df row group by row group into a PartPipe, which
+    put_object reads parts of and uploads UPLOAD_THREADS at a time, so the
+    encoded file is never held whole.
+    """
+    ensure_bucket()
+    pipe = PartPipe(UPLOAD_PART_SIZE)
+
+    def encode():
+        try:
+            df.to_parquet(
+                pipe,
+                engine=PARQUET_ENGINE,
+                row_group_size=ROW_GROUP_SIZE,
+                **write_options(codec),
+                **parquet_options,
+            )
+        except Exception as e:  # noqa: BLE001, raised by put_parquet
+            pipe.close(e)
+        else:
+            pipe.close()
+        finally:
+            # Anything else, e.g. SystemExit, passes through but fails the upload.
+            if not pipe.closed:
+                pipe.close(OSError("encoding interrupted"))
+
+    encoder = threading.Thread(target=encode)
+    encoder.start()
+    try:
+        client.put_object(
+            dataframe_bucket_name,
+            object_name,
+            pipe,
+            -1,
+            metadata={CODEC_METADATA: codec},
+            part_size=UPLOAD_PART_SIZE,
+            num_parallel_uploads=UPLOAD_THREADS,
+        )
+    except OSError:
+        # Raised as the error encoding failed on, rather than as the upload's.
+        if pipe.error is not None:
+            raise pipe.error from None
+        raise
+    finally:
+        # Unblocks the encoder if the upload failed first.
+        pipe.abort()
+        encoder.join()
+
+
+def ensure_bucket():
+    """Create the bucket if missing, checked on the first upload of a process."""
+    global bucket_ready
+    with bucket_lock:
+        if not bucket_ready:
+            make_bucket_if_missing()
+            bucket_ready = True
+
+
+def make_bucket_if_missing():
+    if client.bucket_exists(dataframe_bucket_name):
+        logger.info("Bucket %s already exists", dataframe_bucket_name)
+    else:
+        client.make_bucket(dataframe_bucket_name)
+        logger.info("Created bucket %s", dataframe_bucket_name)
+
+
+def get_dataframe(
+    dataframe_id: str,
+    version_id: str,
+    columns: list | None = None,
+    filters: list | None = None,
+) -> pd.DataFrame:
+    """Return a stored version, only its given columns and its rows matching
+    filters (see row_filters) if any.
+
+    Only the columns asked for are decoded. With filters, the filter columns
+    are decoded first, in the row groups whose statistics don't rule the
+    filters out, then the other columns only in the row groups holding a
+    matching row. Rows keep their index labels.
+    """
+    manifest = get_manifest(dataframe_id, version_id)
+    if manifest is None:
+        return read_file(file_name(dataframe_id, version_id), columns, filters)
+    if filters is None:
+        return frame_from_manifest(manifest, columns, read_column)
+
+    objects = {entry["name"]: entry["object"] for entry in manifest["columns"]}
+    missing = [column for column in filter_columns(filters) if column not in objects]
+    if missing:
+        raise KeyError(f"filter columns {missing} not found")
+    with ExitStack() as stack:
+        sources = {
+            objects[column]: stack.enter_context(open_source(objects[column]))
+            for column in filter_columns(filters)
+        }
+        positions = matching_rows(
+            {
+                column: (sources[objects[column]], COLUMN_FIELD)
+                for column in filter_columns(filters)
+            },
+            filters,
+            manifest["rows"],
+        )
+
+        def read_source(source: pa.PythonFile) -> pd.Series:
+            parquet_file = pq.ParquetFile(source)
+            table = read_rows(parquet_file, positions, [COLUMN_FIELD])
+            return table_to_frame(parquet_file, table, positions)[COLUMN_FIELD]
+
+        def read_matching(object_name: str) -> pd.Series:
+            # Filter columns are downloaded once.
+            if object_name in sources:
+                return read_source(sources[object_name])
+            with open_source(object_name) as source:
+                return read_source(source)
+
+        return frame_from_manifest(manifest, columns, read_matching, positions)
+
+
+def read_file(object_name: str, columns: list | None, filters: list | None) -> pd.DataFrame:
+    """Read a single file version, see get_dataframe."""
+    if columns is None and filters is None:
+        return read_object(object_name)
+    with open_source(object_name) as source:
+        parquet_file = pq.ParquetFile(source)
+        if filters is None:
+            table = parquet_file.read(columns, use_pandas_metadata=True)
+            return table_to_frame(parquet_file, table)
+
+        missing = [c for c in filter_columns(filters) if c not in parquet_file.schema_arrow.names]
+        if missing:
+            raise KeyError(f"filter columns {missing} not found")
+        positions = matching_rows(
+            {column: (source, column) for column in filter_columns(filters)},
+            filters,
+            parquet_file.metadata.num_rows,
+        )
+        table = read_rows(parquet_file, positions, columns)
+        return table_to_frame(parquet_file, table, positions)
+
+
+def matching_rows(fields: dict, filters: list, row_cnt: int) -> np.ndarray:
+    """Return the positions of the rows matching filters, fields mapping each
+    filter column to (source, field name) of the Parquet file storing it.
+
+    Row groups are skipped by the statistics of each predicate, only the rows
+    of the row groups left are decoded to evaluate the filters.
+    """
+    candidates = np.zeros(row_cnt, dtype=bool)
+    for clause in filter_clauses(filters):
+        clause_candidates = np.ones(row_cnt, dtype=bool)
+        for column, op, value in clause:
+            source, field = fields[column]
+            clause_candidates &= row_group_mask(source, (field, op, value), row_cnt)
+        candidates |= clause_candidates
+    positions = np.flatnonzero(candidates)
+
+    table = pa.table(
+        {
+            column: read_rows(pq.ParquetFile(source), positions, [field]).column(field)
+            for column, (source, field) in fields.items()
+        }
+    )
+    matches = matching_positions(table, filters, positions)
+    logger.info(
+        "filters %s matched %s of %s rows, %s decoded",
+        filters,
+        len(matches),
+        row_cnt,
+        len(positions),
+    )
+    return matches
+
+
+def row_group_mask(source, predicate: tuple, row_cnt: int) -> np.ndarray:
+    """Return which rows are in a row group of source whose statistics don't
+    rule predicate out.
+    """
+    fragment = ds.ParquetFileFormat().make_fragment(source)
+    offsets = row_group_offsets(fragment.metadata)
+    mask = np.zeros(row_cnt, dtype=bool)
+    for kept in fragment.split_by_row_group(filter=pq.filters_to_expression([predicate])):
+        row_group = kept.row_groups[0].id
+        mask[offsets[row_group] : offsets[row_group + 1]] = True
+    return mask
+
+
+def row_group_offsets(metadata) -> np.ndarray:
+    """Return the position of the first row of each row group, then the
+    number of rows.
+    """
+    sizes = [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)]
+    return np.concatenate([[0], np.cumsum(sizes, dtype=np.int64)])
+
+
+def read_rows(
+    parquet_file: pq.ParquetFile, positions: np.ndarray, columns: list | None
+) -> pa.Table:
+    """Return the rows at positions, sorted, of parquet_file, decoding only
+    the row groups holding them.
+    """
+    if parquet_file.metadata.num_row_groups == 0:
+        return parquet_file.read(columns, use_pandas_metadata=True)
+    offsets = row_group_offsets(parquet_file.metadata)
+    row_groups = np.searchsorted(offsets, positions, side="right") - 1
+    # At least one, an empty list of row groups loses the pandas metadata.
+    read_groups = np.unique(row_groups) if len(positions) else np.array([0])
+    # Position of the first row of each read row group in the table read.
+    sizes = np.diff(offsets)[read_groups]
+    starts = np.zeros(len(offsets), dtype=np.int64)
+    starts[read_groups] = np.cumsum(sizes) - sizes
+    table = parquet_file.read_row_groups(
+        read_groups.tolist(), columns=columns, use_pandas_metadata=True
+    )
+    return table.take(pa.array(positions - offsets[row_groups] + starts[row_groups], pa.int64()))
+
+
+def get_dataframe_head(dataframe_id: str, version_id: str, rows: int) -> tuple[pd.DataFrame, int]:
+    """Return the first rows of a stored version and its number of rows.
+
+    Only the row groups holding those rows are decoded, the number of rows
+    comes from the manifest or the Parquet footer.
+    """
+    manifest = get_manifest(dataframe_id, version_id)
+    if manifest is None:
+        with open_source(file_name(dataframe_id, version_id)) as source:
+            parquet_file = pq.ParquetFile(source)
+            return read_head(parquet_file, rows), parquet_file.metadata.num_rows
+
+    def read_column_head(object_name: str) -> pd.Series:
+        with open_source(object_name) as source:
+            return read_head(pq.ParquetFile(source), rows)[COLUMN_FIELD]
+
+    return frame_from_manifest(manifest, None, read_column_head, slice(rows)), manifest["rows"]
+
+
+def get_empty_dataframe(dataframe_id: str, version_id: str) -> pd.DataFrame:
+    """Return a stored version without its rows, for its columns and dtypes.
+
+    Only the Parquet footers are read.
+    """
+
+    def read_empty(source: pa.PythonFile) -> pd.DataFrame:
+        parquet_file = pq.ParquetFile(source)
+        return table_to_frame(parquet_file, parquet_file.schema_arrow.empty_table())
+
+    manifest = get_manifest(dataframe_id, version_id)
+    if manifest is None:
+        with open_source(file_name(dataframe_id, version_id)) as source:
+            return read_empty(source)
+
+    def read_empty_column(object_name: str) -> pd.Series:
+        with open_source(object_name) as source:
+            return read_empty(source)[COLUMN_FIELD]
+
+    return frame_from_manifest(manifest, None, read_empty_column, slice(0))
+
+
+def frame_from_manifest(
+    manifest: dict, columns: list | None, read, rows: slice | np.ndarray | None = None
+) -> pd.DataFrame:
+    """Build a version from its manifest, read(object name) returning every
+    value of a column, or only its given rows (a slice or positions).
+    """
+    entries = manifest["columns"]
+    if columns is not None:
+        missing = [column for column in columns if column not in {e["name"] for e in entries}]
+        if missing:
+            raise KeyError(f"columns {missing} not found")
+        # In the order asked for, like df[columns].
+        entries = [entry for column in columns for entry in entries if entry["name"] == column]
+    with ThreadPoolExecutor(COLUMN_DOWNLOAD_THREADS) as executor:
+        cols = list(executor.map(lambda entry: read(entry["object"]), entries))
+
+    index = manifest["index"]
+    if "object" in index:
+        index = pd.Index(read(index["object"]), name=index["name"])
+    else:
+        index = pd.RangeIndex(index["start"], index["stop"], index["step"], name=index["name"])
+        if rows is not None:
+            index = index[rows]
+    # Keyed by position, names may repeat.
+    df = pd.DataFrame({position: col.array for position, col in enumerate(cols)}, index=index)
+    df.columns = [entry["name"] for entry in entries]
+    return df
+
+
+def get_manifest(dataframe_id: str, version_id: str) -> dict | None:
+    try:
+        response = client.get_object(dataframe_bucket_name, manifest_name(dataframe_id, version_id))
+    except S3Error as e:
+        if e.code == "NoSuchKey":
+            return None
+        raise
+    try:
+        return json.loads(response.read())
+    finally:
+        response.close()
+        response.release_conn()
+
+
+def read_column(object_name: str) -> pd.Series:
+    return read_object(object_name)[COLUMN_FIELD]
+
+
+def file_name(dataframe_id: str, version_id: str) -> str:
+    return f"{dataframe_id}_{version_id}.{STORAGE_FILE_EXTENSION}"
+
+
+def open_source(object_name: str) -> pa.PythonFile:
+    """Open an object as a Parquet file or dataset fragment source, read by
+    range requests, see ObjectFile. Closing it closes the ObjectFile.
+    """
+    return pa.PythonFile(ObjectFile(object_name), mode="r")
+
+
+def read_head(parquet_file: pq.ParquetFile, rows: int) -> pd.DataFrame:
+    """Decode the row groups holding the first rows of parquet_file, the same
+    way pd.read_parquet would decode the whole file.
+    """
+    metadata = parquet_file.metadata
+    row_groups = []
+    row_cnt = 0
+    # At least one, an empty list of row groups loses the pandas metadata.
+    while len(row_groups) < metadata.num_row_groups and (row_cnt < rows or not row_groups):
+        row_cnt += metadata.row_group(len(row_groups)).num_rows
+        row_groups.append(len(row_groups))
+    table = parquet_file.read_row_groups(row_groups, use_pandas_metadata=True)
+    return table_to_frame(parquet_file, table.slice(0, rows))
+
+
+def table_to_frame(
+    parquet_file: pq.ParquetFile, table: pa.Table, positions: np.ndarray | None = None
+) -> pd.DataFrame:
+    """Convert table, the rows of parquet_file at positions (its first rows
+    by default), the same way pd.read_parquet would convert the whole file.
+    """
+    if USE_ARROW_DTYPES:
+        df = table.to_pandas(types_mapper=pd.ArrowDtype)
+    else:
+        df = table.to_pandas()
+
+    # A RangeIndex is only described in the metadata, and pyarrow leaves it
+    # out when not every row is read.
+    index_columns = (parquet_file.schema_arrow.pandas_metadata or {}).get("index_columns", [])
+    if len(index_columns) == 1 and isinstance(index_columns[0], dict):
+        index = index_columns[0]
+        index = pd.RangeIndex(index["start"], index["stop"], index["step"], name=index["name"])
+        df.index = index[: len(df)] if positions is None else index[positions]
     return df
+
+
+def read_object(object_name: str) -> pd.DataFrame:
+    with ObjectFile(object_name) as source:
+        return pd.read_parquet(source, engine=PARQUET_ENGINE, **ARROW_READ_OPTIONS)
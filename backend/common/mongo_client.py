@@ -10,6 +10,8 @@ MONGO_URI = os.getenv("MONGO_URL")
 client = pymongo.MongoClient(MONGO_URI)
 db = client["dataframe_cleaner"]
 collection = db["dataframe_metadata"]
+inference_cache_collection = db["inference_cache"]
+inference_cache_stats_collection = db["inference_cache_stats"]
 
 
 def save_to_mongo(data):
@@ -25,9 +27,7 @@ def update_dataframe(dataframe_id, update):
 
 
 def insert_version(dataframe_id, version_data):
-    collection.update_one(
-        {"dataframe_id": dataframe_id}, {"$push": {"versions": version_data}}
-    )
+    collection.update_one({"dataframe_id": dataframe_id}, {"$push": {"versions": version_data}})
 
 
 def update_status(dataframe_id: str, version_id: str, status: str):
@@ -35,3 +35,51 @@ def update_status(dataframe_id: str, version_id: str, status: str):
         {"dataframe_id": dataframe_id, "versions.version_id": version_id},
         {"$set": {"versions.$.status": status}},
     )
+
+
+def update_version(dataframe_id: str, version_id: str, fields: dict):
+    collection.update_one(
+        {"dataframe_id": dataframe_id, "versions.version_id": version_id},
+        {"$set": {f"versions.$.{key}": value for key, value in fields.items()}},
+    )
+
+
+def create_inference_cache_indexes():
+    inference_cache_collection.create_index("key", unique=True)
+    inference_cache_collection.create_index("used_at")
+
+
+def find_inference_decision(key: str):
+    document = inference_cache_collection.find_one_and_update(
+        {"key": key}, {"$currentDate": {"used_at": True}}, {"_id": False}
+    )
+    return None if document is None else document["decision"]
+
+
+def save_inference_decision(key: str, decision: dict):
+    inference_cache_collection.update_one(
+        {"key": key},
+        {"$set": {"decision": decision}, "$currentDate": {"used_at": True}},
+        upsert=True,
+    )
+
+
+def evict_inference_decisions(max_size: int):
+    """Delete the least recently used decisions beyond max_size."""
+    excess = inference_cache_collection.estimated_document_count() - max_size
+    if excess <= 0:
+        return
+    oldest = inference_cache_collection.find({}, {"_id": True}).sort("used_at", 1)
+    ids = [document["_id"] for document in oldest.limit(excess)]
+    inference_cache_collection.delete_many({"_id": {"$in": ids}})
+
+
+def increment_inference_cache_counter(counter: str):
+    inference_cache_stats_collection.update_one(
+        {"_id": "counters"}, {"$inc": {counter: 1}}, upsert=True
+    )
+
+
+def get_inference_cache_counters():
+    counters = inference_cache_stats_collection.find_one({"_id": "counters"}, {"_id": False})
+    return {"hits": 0, "misses": 0, **(counters or {})}
@@ -0,0 +1,153 @@
+import ast
+import logging
+from typing import NamedTuple
+
+import pandas as pd
+
+from .processing_enum import FillStrategy, OperationType
+from .script_engine import SCRIPT_VARIABLE, compile_script
+
+
+logger = logging.getLogger(__name__)
+
+# Casts that leave a column of a matching dtype exactly as it is.
+NOOP_CASTS = {
+    "cast_to_numeric": pd.api.types.is_numeric_dtype,
+    "cast_to_string": lambda dtype: dtype == pd.StringDtype(),
+    "cast_to_datetime": pd.api.types.is_datetime64_any_dtype,
+    "cast_to_timedelta": pd.api.types.is_timedelta64_dtype,
+    "cast_to_boolean": lambda dtype: isinstance(dtype, pd.BooleanDtype),
+    "cast_to_category": lambda dtype: isinstance(dtype, pd.CategoricalDtype),
+}
+
+
+class Plan(NamedTuple):
+    steps: list
+    # What was changed from the requested steps, to record with the version.
+    rewrites: list
+
+
+def operation_columns(column: str | list) -> list:
+    """Return the columns of an operation, fill_null may be given several."""
+    return list(column) if isinstance(column, list) else [column]
+
+
+def plan_operations(steps: list, dtypes: pd.Series) -> Plan:
+    """Return the steps to run for steps, on columns of the given dtypes.
+
+    Steps are {"column", "operation", "script"?, "to_fill"?, "strategy"?}
+    dicts, as recorded in a version. Rewrites keep the result the same:
+    - casts to the dtype a column already has are dropped,
+    - a cast repeated on a column is only run once,
+    - fill_null on a column a constant already filled is dropped,
+    - a script right after another on the same column is merged with it into
+      one expression when both are computed with NumPy, see merge_scripts.
+    Different casts in a row are all kept, casting through a string or a
+    date doesn't give the same values as the last cast alone.
+    """
+    planned = []
+    rewrites = []
+    # Per column: its dtype while known, the last step that changed it and
+    # whether it has no nulls left since a constant fill.
+    known_dtypes = dict(dtypes.items())
+    last_steps = {}
+    filled = set()
+
+    for position, step in enumerate(steps):
+        step = {key: value for key, value in step.items() if value is not None}
+        operation = step["operation"]
+        columns = operation_columns(step["column"])
+
+        if operation in NOOP_CASTS:
+            cast_columns = []
+            for column in columns:
+                dtype = known_dtypes.get(column)
+                previous = last_steps.get(column)
+                if dtype is not None and NOOP_CASTS[operation](dtype):
+                    rewrites.append(
+                        f"step {position}: {operation} dropped on {column}, it is already {dtype}"
+                    )
+                elif previous is not None and previous["operation"] == operation:
+                    rewrites.append(
+                        f"step {position}: {operation} dropped on {column}, it was just cast"
+                    )
+                else:
+                    cast_columns.append(column)
+            if not cast_columns:
+                continue
+            if len(cast_columns) < len(columns):
+                step["column"] = cast_columns
+            columns = cast_columns
+
+        elif operation == OperationType.FILL_NULL:
+            unfilled = [column for column in columns if column not in filled]
+            if not unfilled:
+                rewrites.append(
+                    f"step {position}: fill_null dropped, {step['column']} has no nulls left"
+                )
+                continue
+            if len(unfilled) < len(columns):
+                rewrites.append(
+                    f"step {position}: fill_null only on {unfilled}, the others have no nulls left"
+                )
+                step["column"] = unfilled
+            if step.get("strategy", FillStrategy.CONSTANT) == FillStrategy.CONSTANT:
+                filled.update(unfilled)
+            for column in unfilled:
+                last_steps[column] = step
+            planned.append(step)
+            continue
+
+        elif operation == OperationType.APPLY_SCRIPT and not isinstance(step["column"], list):
+            previous = last_steps.get(step["column"])
+            if (
+                previous is not None
+                and previous["operation"] == operation
+                and previous["column"] == step["column"]
+            ):
+                merged = merge_scripts(previous["script"], step["script"])
+                if merged is not None:
+                    rewrites.append(
+                        f"step {position}: script merged into the previous one as {merged!r}"
+                    )
+                    previous["script"] = merged
+                    continue
+
+        for column in columns:
+            # The dtype a cast or script leaves isn't known before running it.
+            known_dtypes[column] = None
+            filled.discard(column)
+            last_steps[column] = step
+        planned.append(step)
+
+    if rewrites:
+        logger.info("%s steps planned as %s: %s", len(steps), len(planned), rewrites)
+    return Plan(planned, rewrites)
+
+
+def merge_scripts(first: str, second: str) -> str | None:
+    """Return second applied to the result of first as one script, None if
+    the merged script could compute other values than running both.
+
+    Only scripts NumPy computes are merged: the values the second script sees
+    of anything else depend on how pandas stores the first script's results.
+    The second script must use x once, so first isn't computed twice.
+    """
+    if not (compile_script(first).vectorizable and compile_script(second).vectorizable):
+        return None
+    first_tree = ast.parse(first, mode="eval")
+    second_tree = ast.parse(second, mode="eval")
+    uses = [
+        node
+        for node in ast.walk(second_tree)
+        if isinstance(node, ast.Name) and node.id == SCRIPT_VARIABLE
+    ]
+    if len(uses) != 1:
+        return None
+
+    class SubstituteVariable(ast.NodeTransformer):
+        def visit_Name(self, node):  # noqa: N802
+            return first_tree.body if node.id == SCRIPT_VARIABLE else node
+
+    merged = ast.fix_missing_locations(SubstituteVariable().visit(second_tree))
+    return ast.unparse(merged)
@@ -0,0 +1,124 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from .data_processors import apply_operation
+from .operation_planner import operation_columns
+from .version_store import get_dataframe
+
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_ROWS = 100
+PREVIEW_MAX_ROWS = 10_000
+PREVIEW_SEED = 0
+# Columns of versions kept in memory for previews, by their size in bytes.
+PREVIEW_CACHE_BYTES = 512 * 1024 * 1024
+
+
+class VersionCache:
+    """LRU cache of the columns of versions, read for previews.
+
+    A version never changes once processed, so entries are only evicted to
+    stay under max_bytes. Shared by the request threads of the server.
+    """
+
+    def __init__(self, max_bytes: int = PREVIEW_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.frames = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, dataframe_id: str, version_id: str, columns: list) -> pd.DataFrame:
+        key = (dataframe_id, version_id, tuple(columns))
+        with self.lock:
+            entry = self.frames.get(key)
+            if entry is not None:
+                self.frames.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        # Downloaded outside of the lock, a concurrent miss downloads twice.
+        df = get_dataframe(dataframe_id, version_id, columns)
+        df_size = int(df.memory_usage(deep=True).sum())
+        with self.lock:
+            if key not in self.frames and df_size <= self.max_bytes:
+                self.frames[key] = (df, df_size)
+                self.size += df_size
+                while self.size > self.max_bytes:
+                    _, (_, evicted_size) = self.frames.popitem(last=False)
+                    self.size -= evicted_size
+        return df
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self.frames),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+version_cache = VersionCache()
+
+
+def sample_rows(
+    df: pd.DataFrame, rows: int, random: bool, seed: int = PREVIEW_SEED
+) -> pd.DataFrame:
+    """Return the first rows of df or, if random, rows picked with seed in
+    their original order. Raise ValueError if rows isn't positive.
+    """
+    if rows < 1:
+        raise ValueError(f"rows must be at least 1, got {rows}")
+    if not random or rows >= len(df):
+        return df.head(rows)
+    positions = np.random.default_rng(seed).choice(len(df), rows, replace=False)
+    return df.iloc[np.sort(positions)]
+
+
+def preview_operation(
+    dataframe_id: str,
+    version_id: str,
+    operation_type: str,
+    column: str | list,
+    raw_script: str | None = None,
+    to_fill: str | None = None,
+    strategy: str | None = None,
+    rows: int = PREVIEW_ROWS,
+    random: bool = False,
+    seed: int = PREVIEW_SEED,
+) -> dict:
+    """Apply an operation to a sample of a version and return the sample
+    before and after, without creating a version.
+
+    Only the columns of the operation are downloaded, once, see VersionCache.
+    A statistic of fill_null is one of the sample, not of the whole column.
+    """
+    columns = operation_columns(column)
+    before = sample_rows(
+        version_cache.get(dataframe_id, version_id, columns),
+        min(rows, PREVIEW_MAX_ROWS),
+        random,
+        seed,
+    )
+
+    script_stats = {}
+    start_time = time.perf_counter()
+    after = apply_operation(
+        before.copy(), operation_type, column, raw_script, to_fill, script_stats, strategy
+    )
+    elapsed = time.perf_counter() - start_time
+    logger.info("preview of %s on %s rows took %.4fs", operation_type, len(before), elapsed)
+    return {
+        "before": before,
+        "after": after,
+        "script_stats": script_stats,
+        "seconds": elapsed,
+    }
@@ -2,12 +2,22 @@ from enum import StrEnum
 
 
 class ProcessStatus(StrEnum):
-    PROCESSING = 'processing',
-    PROCESSED = 'processed',
-    FAIL = 'failed',
+    PROCESSING = ("processing",)
+    PROCESSED = ("processed",)
+    FAIL = ("failed",)
 
 
 class OperationType(StrEnum):
-    INITIALIZE = 'initialize',
-    APPLY_SCRIPT = 'apply_script',
-    FILL_NULL = 'fill_null',
+    INITIALIZE = ("initialize",)
+    APPLY_SCRIPT = ("apply_script",)
+    FILL_NULL = ("fill_null",)
+    BATCH = ("batch",)
+
+
+class FillStrategy(StrEnum):
+    CONSTANT = ("constant",)
+    MEAN = ("mean",)
+    MEDIAN = ("median",)
+    MODE = ("mode",)
+    FFILL = ("ffill",)
+    BFILL = ("bfill",)
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+# Filters select rows the way pyarrow.parquet does: a list of
+# (column, op, value) predicates that must all hold, or a list of such lists
+# of which one must. op is one of FILTER_OPERATORS.
+FILTER_OPERATORS = ["=", "==", "!=", "<", ">", "<=", ">=", "in", "not in"]
+
+POSITION_FIELD = "__position"
+
+
+def is_predicate(predicate) -> bool:
+    # Predicates parsed from JSON are lists, not tuples.
+    return (
+        isinstance(predicate, list | tuple)
+        and len(predicate) == 3
+        and isinstance(predicate[1], str)
+        and not isinstance(predicate[0], list | tuple)
+    )
+
+
+def filter_clauses(filters: list) -> list:
+    """Return filters as a list of lists of predicates, one of which must
+    hold. Raise ValueError if filters aren't in the form above.
+    """
+    if not isinstance(filters, list) or not filters:
+        raise ValueError("filters must be a non empty list")
+    clauses = [filters] if all(is_predicate(p) for p in filters) else filters
+    for clause in clauses:
+        if not isinstance(clause, list) or not clause or not all(is_predicate(p) for p in clause):
+            raise ValueError(f"invalid filter {clause}, expected [column, op, value] predicates")
+        for _, op, _ in clause:
+            if op not in FILTER_OPERATORS:
+                raise ValueError(f"unsupported filter operator {op}")
+    return [[tuple(predicate) for predicate in clause] for clause in clauses]
+
+
+def filter_columns(filters: list) -> list:
+    """Return the columns filters refer to, in order."""
+    return list(
+        dict.fromkeys(column for clause in filter_clauses(filters) for column, _, _ in clause)
+    )
+
+
+def filter_expression(filters: list):
+    return pq.filters_to_expression(filter_clauses(filters))
+
+
+def matching_positions(
+    table: pa.Table, filters: list, positions: np.ndarray | None = None
+) -> np.ndarray:
+    """Return the positions of the rows of table matching filters.
+
+    table holds the filter columns, positions numbers its rows (0, 1, ... by
+    default). A null compared to anything doesn't match.
+    """
+    if positions is None:
+        positions = np.arange(table.num_rows)
+    matches = table.append_column(POSITION_FIELD, pa.array(positions, pa.int64())).filter(
+        filter_expression(filters)
+    )
+    return matches.column(POSITION_FIELD).to_numpy()
+
+
+def filter_dataframe(df: pd.DataFrame, filters: list) -> pd.DataFrame:
+    """Return the rows of df matching filters, as reading them filtered would."""
+    missing = [column for column in filter_columns(filters) if column not in df.columns]
+    if missing:
+        raise KeyError(f"filter columns {missing} not found")
+    table = pa.Table.from_pandas(df[filter_columns(filters)], preserve_index=False)
+    return df.iloc[matching_positions(table, filters)]
@@ -0,0 +1,379 @@
+import ast
+import logging
+import math
+import operator
+from functools import lru_cache, reduce
+
+import numpy as np
+import pandas as pd
+
+
+logger = logging.getLogger(__name__)
+
+SAFE_NAMESPACES = {
+    "math": math,
+    "abs": abs,
+    "round": round,
+    "min": min,
+    "max": max,
+    "str": str,
+    "int": int,
+    "float": float,
+    "len": len,
+    "pow": pow,
+    "split": str.split,
+}
+
+SCRIPT_CACHE_SIZE = 128
+# Scripts are evaluated once per distinct value when the column has fewer
+# distinct values than this share of its rows.
+MEMOIZE_DISTINCT_RATIO = 0.5
+SCRIPT_VARIABLE = "x"
+
+# Python ints never overflow, int64 silently wraps: an int result whose float
+# twin gets this big is computed row by row instead.
+INT_SAFE_BOUND = 2.0**62
+# Python divides ints exactly, NumPy converts them to float first, which only
+# agrees while both are exactly representable.
+INT_EXACT_DIVISION_BOUND = 2.0**53
+
+BINARY_OPERATORS = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.true_divide,
+    ast.FloorDiv: np.floor_divide,
+    ast.Mod: np.remainder,
+    ast.Pow: np.power,
+}
+UNARY_OPERATORS = {
+    ast.USub: np.negative,
+    ast.UAdd: np.positive,
+}
+COMPARE_OPERATORS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+}
+MATH_FUNCTIONS = {
+    "sqrt": np.sqrt,
+    "exp": np.exp,
+    "log10": np.log10,
+    "log2": np.log2,
+    "sin": np.sin,
+    "cos": np.cos,
+    "tan": np.tan,
+    "fabs": np.fabs,
+}
+# math functions that return an int in Python, and their float twin.
+MATH_INT_FUNCTIONS = {
+    "floor": np.floor,
+    "ceil": np.ceil,
+    "trunc": np.trunc,
+}
+MATH_CALLABLES = {*MATH_FUNCTIONS, *MATH_INT_FUNCTIONS, "log", "pow"}
+MATH_CONSTANTS = {"pi": math.pi, "e": math.e, "tau": math.tau}
+BUILTIN_FUNCTIONS = {"abs", "round", "min", "max", "pow"}
+# Besides names, attributes, calls and constants, which are checked one by one.
+VECTORIZABLE_NODES = (
+    ast.BinOp,
+    ast.UnaryOp,
+    ast.Compare,
+    ast.Load,
+    *BINARY_OPERATORS,
+    *UNARY_OPERATORS,
+    *COMPARE_OPERATORS,
+)
+
+
+class NotVectorizableError(Exception):
+    """The script can't be computed on the whole column with eval semantics."""
+
+
+class CompiledScript:
+    """A user script, compiled once and applied to whole columns.
+
+    Scripts made only of arithmetic, comparisons, abs, round, min, max, pow
+    and math functions of x are computed with NumPy on the whole column.
+    Everything else, and any column or value NumPy would compute differently
+    from eval (missing values, non numeric columns, int overflow, errors), is
+    evaluated row by row with the compiled code, the same as before.
+    """
+
+    def __init__(self, raw_script: str):
+        self.raw_script = raw_script
+        self.code = compile(raw_script, "<script>", "eval")
+        self.tree = ast.parse(raw_script, mode="eval")
+        self.vectorizable = is_vectorizable(self.tree)
+
+    def apply(self, col: pd.Series, stats: dict | None = None) -> pd.Series:
+        """Return the script applied to every value of col.
+
+        stats, when given, is filled with the mode used and, when evaluated
+        with eval, the number of evaluations done and saved.
+        """
+        stats = {} if stats is None else stats
+        if self.vectorizable:
+            try:
+                result = self.apply_vectorized(col)
+                stats.update(mode="vectorized")
+                return result
+            except (NotVectorizableError, ArithmeticError, ValueError, TypeError) as e:
+                logger.info("script %r applied row by row: %s", self.raw_script, e)
+        return self.apply_per_row(col, stats)
+
+    def apply_per_row(self, col: pd.Series, stats: dict | None = None) -> pd.Series:
+        """eval the script on every row, or on every distinct value when col is
+        repetitive enough, see can_memoize.
+        """
+        stats = {} if stats is None else stats
+        code = self.code
+
+        def evaluate_row(x):
+            return eval(code, SAFE_NAMESPACES, {SCRIPT_VARIABLE: x})
+
+        if can_memoize(col):
+            codes, uniques = pd.factorize(col)
+            # NA rows keep code -1 and are evaluated once per kind of NA below.
+            if (len(uniques) + 1) / max(len(col), 1) < MEMOIZE_DISTINCT_RATIO:
+                result, evaluations = apply_memoized(col, codes, len(uniques), evaluate_row)
+                stats.update(
+                    mode="memoized",
+                    evaluations=evaluations,
+                    saved_evaluations=len(col) - evaluations,
+                )
+                logger.info(
+                    "script %r evaluated %s times for %s rows",
+                    self.raw_script,
+                    evaluations,
+                    len(col),
+                )
+                return result
+
+        stats.update(mode="per_row", evaluations=len(col), saved_evaluations=0)
+        return col.apply(evaluate_row)
+
+    def apply_vectorized(self, col: pd.Series) -> pd.Series:
+        values = numeric_values(col)
+        with np.errstate(all="raise"):
+            result = evaluate(self.tree.body, values)
+        return pd.Series(result, index=col.index, name=col.name)
+
+
+def can_memoize(col: pd.Series) -> bool:
+    """Whether rows with equal values can share one evaluation.
+
+    Scripts only reach SAFE_NAMESPACES, so they are pure, but factorize
+    groups values that compare equal while a script may tell them apart: 1,
+    1.0 and True in an object column, or 0.0 and -0.0.
+    """
+    dtype = col.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        # Series.apply already maps the categories only.
+        return False
+    if dtype == object:
+        return pd.api.types.infer_dtype(col, skipna=True) == "string"
+    if pd.api.types.is_float_dtype(dtype):
+        values = col.to_numpy(dtype=np.float64, na_value=np.nan)
+        return not (np.signbit(values) & (values == 0)).any()
+    return True
+
+
+def apply_memoized(col: pd.Series, codes: np.ndarray, unique_cnt: int, func) -> tuple:
+    """Return (col.apply(func), evaluations) with func called once per value.
+
+    The first row of every distinct value, and of every kind of NA (None, NaN
+    and pd.NA don't behave the same), is applied to with Series.apply, so the
+    values func sees and the result dtype are exactly those of a full apply.
+    """
+    na_positions = np.flatnonzero(codes < 0)
+    if col.dtype == object:
+        na_kinds = [type(value) for value in col.to_numpy()[na_positions]]
+    else:
+        na_kinds = [0] * len(na_positions)
+    na_codes, na_uniques = pd.factorize(pd.Series(na_kinds, dtype=object))
+
+    codes = codes.copy()
+    codes[na_positions] = unique_cnt + na_codes
+    first = first_positions(codes)
+    distinct = col.iloc[first].reset_index(drop=True)
+    result = distinct.apply(func).take(codes)
+    return pd.Series(result.array, index=col.index, name=col.name), len(first)
+
+
+def first_positions(codes: np.ndarray) -> np.ndarray:
+    """Return the position of the first row of each code, by code, codes
+    being every code in 0..n-1.
+    """
+    _, first = np.unique(codes, return_index=True)
+    return first
+
+
+@lru_cache(maxsize=SCRIPT_CACHE_SIZE)
+def compile_script(raw_script: str) -> CompiledScript:
+    return CompiledScript(raw_script)
+
+
+def numeric_values(col: pd.Series) -> np.ndarray:
+    """Return col as int64 or float64 values, the types eval would see."""
+    dtype = col.dtype
+    if pd.api.types.is_bool_dtype(dtype) or not pd.api.types.is_numeric_dtype(dtype):
+        raise NotVectorizableError(f"column dtype is {dtype}")
+    if col.hasnans:
+        raise NotVectorizableError("column has missing values")
+    if pd.api.types.is_integer_dtype(dtype):
+        if (
+            pd.api.types.is_unsigned_integer_dtype(dtype)
+            and len(col)
+            and col.max() > np.iinfo(np.int64).max
+        ):
+            raise NotVectorizableError("column overflows int64")
+        return col.to_numpy(dtype=np.int64)
+    if pd.api.types.is_float_dtype(dtype):
+        return col.to_numpy(dtype=np.float64)
+    raise NotVectorizableError(f"column dtype is {dtype}")
+
+
+def is_vectorizable(tree: ast.Expression) -> bool:
+    uses_variable = False
+    for node in ast.walk(tree.body):
+        if isinstance(node, ast.Name):
+            uses_variable |= node.id == SCRIPT_VARIABLE
+            if node.id not in BUILTIN_FUNCTIONS | {SCRIPT_VARIABLE, "math"}:
+                return False
+        elif isinstance(node, ast.Attribute):
+            if not (
+                isinstance(node.value, ast.Name)
+                and node.value.id == "math"
+                and (node.attr in MATH_CALLABLES or node.attr in MATH_CONSTANTS)
+            ):
+                return False
+        elif isinstance(node, ast.Call):
+            if node.keywords or not is_known_function(node.func):
+                return False
+        elif isinstance(node, ast.Constant):
+            if isinstance(node.value, bool) or not isinstance(node.value, int | float):
+                return False
+        elif not isinstance(node, VECTORIZABLE_NODES):
+            return False
+    # A script without x is the same value on every row, leave it to eval.
+    return uses_variable
+
+
+def is_known_function(func: ast.expr) -> bool:
+    if isinstance(func, ast.Name):
+        return func.id in BUILTIN_FUNCTIONS
+    return (
+        isinstance(func, ast.Attribute)
+        and isinstance(func.value, ast.Name)
+        and func.value.id == "math"
+        and func.attr in MATH_CALLABLES
+    )
+
+
+def evaluate(node: ast.expr, x: np.ndarray):
+    """Compute node on the column values x, raise NotVectorizableError if unsure."""
+    match node:
+        case ast.Name(id=name) if name == SCRIPT_VARIABLE:
+            return x
+        case ast.Constant(value=value):
+            if isinstance(value, int) and abs(value) >= INT_SAFE_BOUND:
+                raise NotVectorizableError(f"constant {value} overflows int64")
+            return value
+        case ast.Attribute(attr=attr) if attr in MATH_CONSTANTS:
+            return MATH_CONSTANTS[attr]
+        case ast.UnaryOp(op=op, operand=operand):
+            value = evaluate(operand, x)
+            return checked_int(UNARY_OPERATORS[type(op)], value)
+        case ast.BinOp(left=left, op=op, right=right):
+            return binary(type(op), evaluate(left, x), evaluate(right, x))
+        case ast.Compare(left=left, ops=ops, comparators=comparators):
+            # Chained, a < b < c is a < b and b < c.
+            result = None
+            left = evaluate(left, x)
+            for op, comparator in zip(ops, comparators, strict=True):
+                right = evaluate(comparator, x)
+                compared = np.asarray(COMPARE_OPERATORS[type(op)](left, right))
+                result = compared if result is None else result & compared
+                left = right
+            return result
+        case ast.Call(func=ast.Name(id=name), args=args):
+            return call_builtin(name, [evaluate(arg, x) for arg in args])
+        case ast.Call(func=ast.Attribute(attr=attr), args=args):
+            return call_math(attr, [evaluate(arg, x) for arg in args])
+    raise NotVectorizableError(ast.dump(node))
+
+
+def binary(op: type, left, right):
+    if op is ast.Div and is_int(left) and is_int(right):
+        if max_abs(left) >= INT_EXACT_DIVISION_BOUND or max_abs(right) >= INT_EXACT_DIVISION_BOUND:
+            raise NotVectorizableError("int division beyond float precision")
+    return checked_int(BINARY_OPERATORS[op], left, right)
+
+
+def call_builtin(name: str, args: list):
+    match name, len(args):
+        case "abs", 1:
+            return checked_int(np.abs, *args)
+        case "pow", 2:
+            return checked_int(np.power, *args)
+        case "round", 1:
+            return round_to_int(np.round(args[0]) if not is_int(args[0]) else args[0])
+        case "round", 2 if is_int(args[0]) and is_int(args[1]) and np.all(np.asarray(args[1]) >= 0):
+            # Rounding an int to a positive number of digits keeps it as is.
+            return args[0]
+        case "min", n if n >= 2:
+            return reduce(np.minimum, args)
+        case "max", n if n >= 2:
+            return reduce(np.maximum, args)
+    raise NotVectorizableError(f"{name} with {len(args)} arguments")
+
+
+def call_math(name: str, args: list):
+    if name in MATH_FUNCTIONS and len(args) == 1:
+        return MATH_FUNCTIONS[name](to_float(args[0]))
+    if name in MATH_INT_FUNCTIONS and len(args) == 1:
+        if is_int(args[0]):
+            return args[0]
+        return round_to_int(MATH_INT_FUNCTIONS[name](args[0]))
+    if name == "log" and len(args) == 1:
+        return np.log(to_float(args[0]))
+    if name == "log" and len(args) == 2:
+        return np.log(to_float(args[0])) / np.log(to_float(args[1]))
+    if name == "pow" and len(args) == 2:
+        return np.power(to_float(args[0]), to_float(args[1]))
+    raise NotVectorizableError(f"math.{name} with {len(args)} arguments")
+
+
+def checked_int(func, *args):
+    """func(*args), refused when it would overflow int64 on int arguments."""
+    if all(is_int(arg) for arg in args):
+        twin = func(*(to_float(arg) for arg in args))
+        if max_abs(twin) >= INT_SAFE_BOUND:
+            raise NotVectorizableError("int result overflows int64")
+    return func(*args)
+
+
+def round_to_int(values):
+    """Float values rounded by the caller, as the ints Python would return."""
+    if not np.all(np.isfinite(values)) or max_abs(values) >= INT_SAFE_BOUND:
+        raise NotVectorizableError("rounded value isn't a valid int64")
+    return np.asarray(values).astype(np.int64)
+
+
+def is_int(value) -> bool:
+    if isinstance(value, np.ndarray):
+        return value.dtype.kind == "i"
+    return isinstance(value, int | np.integer)
+
+
+def to_float(value):
+    return np.asarray(value, dtype=np.float64)
+
+
+def max_abs(value) -> float:
+    value = to_float(value)
+    return float(np.max(np.abs(value))) if value.size else 0.0
@@ -0,0 +1,72 @@
+import io
+import unittest
+
+import pandas as pd
+import pyarrow as pa
+
+from backend.common.arrow_dtypes import to_arrow_dtype, to_arrow_dtypes
+from backend.common.data_processors import infer_df, infer_int, process_operation_fill_null
+from backend.common.tests.test_data_processors import read_showcase_csvs
+
+
+def to_python(col):
+    return col.astype(object).where(col.notna(), None).tolist()
+
+
+class TestArrowDtypes(unittest.TestCase):
+    def test_inference_on_arrow_strings_matches_numpy_path(self):
+        numpy_dfs = read_showcase_csvs()
+        arrow_dfs = read_showcase_csvs(engine="pyarrow", dtype_backend="pyarrow")
+        for name, numpy_df in numpy_dfs.items():
+            expected = infer_df(numpy_df)
+            result = to_arrow_dtypes(infer_df(arrow_dfs[name]))
+            for col in expected.columns:
+                with self.subTest(file=name, column=col):
+                    self.assertEqual(to_python(result[col]), to_python(expected[col]))
+
+    def test_infer_int_keeps_arrow_nulls(self):
+        ser = pd.Series(["1", " 2", "'3'", None, "1,000", "x"], dtype=pd.ArrowDtype(pa.string()))
+
+        self.assertEqual(to_python(infer_int(ser)), [1, 2, 3, None, 1000, None])
+
+    def test_to_arrow_dtype(self):
+        self.assertEqual(
+            to_arrow_dtype(pd.Series([1, None], dtype="Int64")).dtype, pd.ArrowDtype(pa.int64())
+        )
+        self.assertEqual(
+            to_arrow_dtype(pd.Series(["a", "b"], dtype="category")).dtype.name, "category"
+        )
+        # Arrow can't hold a mix of ints and strings, the column is left as is.
+        self.assertEqual(to_arrow_dtype(pd.Series([1, "a"])).dtype, object)
+        dates = pd.Series([pd.Timestamp("2021-06-13").date()], dtype=pd.ArrowDtype(pa.date32()))
+        self.assertEqual(to_arrow_dtype(dates).dtype, pd.ArrowDtype(pa.timestamp("ns")))
+
+    def test_fill_null_on_arrow_column(self):
+        df = pd.DataFrame({"number": pd.Series([1, None, 3], dtype=pd.ArrowDtype(pa.int64()))})
+
+        result = process_operation_fill_null(df, "number", "2")
+
+        self.assertEqual(result["number"].tolist(), [1, 2, 3])
+        self.assertEqual(result["number"].dtype, pd.ArrowDtype(pa.int64()))
+
+    def test_parquet_round_trip_keeps_arrow_dtypes(self):
+        df = to_arrow_dtypes(
+            pd.DataFrame(
+                {
+                    "number": pd.Series([1, None], dtype="Int64"),
+                    "text": pd.Series(["a", None], dtype="string"),
+                    "flag": pd.Series([True, None], dtype="boolean"),
+                }
+            )
+        )
+        buffer = io.BytesIO()
+        df.to_parquet(buffer)
+        buffer.seek(0)
+
+        result = pd.read_parquet(buffer, dtype_backend="pyarrow")
+
+        pd.testing.assert_frame_equal(result, df)
+
+
+if __name__ == "__main__":
+    unittest.main()
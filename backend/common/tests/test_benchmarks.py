@@ -0,0 +1,31 @@
+import unittest
+
+import pandas as pd
+
+from backend.common.benchmarks.synthetic import SYNTHETIC_COLUMNS, make_frame
+from backend.common.data_processors import infer_df
+
+
+EXPECTED_DTYPES = {
+    "int": pd.Int64Dtype(),
+    "bool": pd.BooleanDtype(),
+    "date": "datetime64[ns]",
+    "timedelta": "timedelta64[ns]",
+    "string": object,
+    "category": "category",
+}
+
+
+class TestSyntheticData(unittest.TestCase):
+    def test_synthetic_columns_infer_to_their_type(self):
+        inferred = infer_df(make_frame(10_000))
+        for name, (_, col_type) in SYNTHETIC_COLUMNS.items():
+            with self.subTest(column=name):
+                self.assertEqual(inferred[name].dtype, EXPECTED_DTYPES[col_type])
+
+    def test_frame_is_reproducible(self):
+        pd.testing.assert_frame_equal(make_frame(1_000, seed=1), make_frame(1_000, seed=1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+from io import BytesIO
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from backend.common import compression
+from backend.common.compression import AUTO_CODECS, choose_codec, frame_codec, write_options
+
+
+class TestCompression(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.df = pd.DataFrame(
+            {
+                "repeated": rng.choice(["north", "south", "east", "west"], 100_000),
+                "ratio": rng.random(100_000),
+            }
+        )
+
+    def test_auto_picks_the_smallest_codec_when_only_size_counts(self):
+        sizes = {}
+        for codec in AUTO_CODECS:
+            buffer = BytesIO()
+            self.df.to_parquet(buffer, compression=codec, index=False)
+            sizes[codec] = buffer.tell()
+
+        with mock.patch.object(compression, "COMPRESSION", "auto"), mock.patch.object(
+            compression, "AUTO_READ_WEIGHT", 0.0
+        ), mock.patch.object(compression, "AUTO_SAMPLE_ROWS", len(self.df)):
+            self.assertEqual(frame_codec(self.df), min(sizes, key=sizes.get))
+
+    def test_auto_trial_runs_on_a_sample(self):
+        with mock.patch.object(compression, "AUTO_SAMPLE_ROWS", 1_000), mock.patch.object(
+            pd.DataFrame, "to_parquet", autospec=True, side_effect=pd.DataFrame.to_parquet
+        ) as to_parquet:
+            self.assertIn(choose_codec(self.df), AUTO_CODECS)
+        self.assertTrue(all(len(call.args[0]) == 1_000 for call in to_parquet.call_args_list))
+
+    def test_level_only_applies_to_the_configured_codec(self):
+        with mock.patch.object(compression, "COMPRESSION", "zstd"), mock.patch.object(
+            compression, "COMPRESSION_LEVEL", 9
+        ):
+            self.assertEqual(frame_codec(self.df), "zstd")
+            self.assertEqual(write_options("zstd"), {"compression": "zstd", "compression_level": 9})
+            self.assertIsNone(write_options("lz4")["compression_level"])
+
+    def test_level_is_not_passed_to_codecs_without_levels(self):
+        with mock.patch.object(compression, "COMPRESSION", "snappy"), mock.patch.object(
+            compression, "COMPRESSION_LEVEL", 9
+        ):
+            options = write_options("snappy")
+            self.assertIsNone(options["compression_level"])
+            self.df.to_parquet(BytesIO(), engine="pyarrow", **options)
+
+
+if __name__ == "__main__":
+    unittest.main()
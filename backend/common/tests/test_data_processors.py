@@ -1,113 +1,644 @@
 import unittest
+from pathlib import Path
+from unittest import mock
 
 import pandas as pd
 
-from backend.common.data_processors import infer_col, infer_df, process_operation_apply_script
+from backend.common import data_processors
+from backend.common.data_processors import (
+    CandidateRun,
+    apply_operation,
+    detect_date_formats,
+    factorize_col,
+    infer_boolean,
+    infer_col,
+    infer_col_exhaustive,
+    infer_col_from_sample,
+    infer_date,
+    infer_df,
+    infer_df_parallel,
+    infer_int,
+    parse_mixed_dates,
+    pick_candidate,
+    process_batch_async,
+    process_operation_apply_script,
+    process_operation_cast_to,
+    process_operation_fill_null,
+    start_candidate_runs,
+)
+from backend.common.processing_enum import ProcessStatus
 
 
-class TestDataTypes(unittest.TestCase):
+SHOWCASE_DATA_DIR = Path(__file__).resolve().parents[3] / "showcase_data"
+
+
+def read_showcase_csvs(**kwargs):
+    return {
+        path.name: pd.read_csv(path, **kwargs) for path in sorted(SHOWCASE_DATA_DIR.glob("*.csv"))
+    }
+
+
+def legacy_infer_boolean(col):
+    true_variants = ["true", "yes", "t", "1"]
+    false_variants = ["false", "no", "f", "0"]
+
+    def try_bool(data):
+        lower = str(data).lower()
+        if lower in true_variants:
+            return True
+        if lower in false_variants:
+            return False
+        return pd.NA
+
+    return col.apply(try_bool).astype("boolean")
+
+
+def legacy_infer_int(col):
+    to_trip_chars = ['"', "'"]
+    to_replace = ","
+
+    def try_int(data):
+        for to_trim_char in to_trip_chars:
+            trimed = str(data).lstrip(to_trim_char)
+            trimed = trimed.rstrip(to_trim_char)
+
+        trimed = trimed.replace(to_replace, "")
+        try:
+            int_val = int(trimed)
+            return int_val
+        except (ValueError, TypeError):
+            return pd.NA
 
+    return col.apply(try_int).astype(pd.Int64Dtype())
+
+
+class TestDataTypes(unittest.TestCase):
     def test_defer_boolean(self):
-        data = ['true', 'false', 'true', 'false', 'false']
+        data = ["true", "false", "true", "false", "false"]
         ser = pd.Series(data)
 
         result = infer_col(ser)
-        self.assertEqual(result.dtype, 'bool')
+        self.assertEqual(result.dtype, "bool")
 
     def test_defer_boolean_non_clean(self):
-        data = ['true', 'false', 'true', 'false', 'false', 'false', 'false', 'true', 'false', 'N/A']
+        data = ["true", "false", "true", "false", "false", "false", "false", "true", "false", "N/A"]
         expected_bool = [True, False, True, False, False, False, False, True, False, False]
         ser = pd.Series(data)
 
         result = infer_col(ser)
-        self.assertEqual(result.dtype, 'bool')
+        self.assertEqual(result.dtype, "bool")
         self.assertSequenceEqual(result.to_list(), expected_bool)
 
     def test_defer_date_ddmmyy(self):
-        data = ['10/11/12', '10/11/13', '10/11/14', '10/12/15', '30/12/15']
-        expected_dates = ['2012-11-10', '2013-11-10', '2014-11-10', '2015-12-10', '2015-12-30']
+        data = ["10/11/12", "10/11/13", "10/11/14", "10/12/15", "30/12/15"]
+        expected_dates = ["2012-11-10", "2013-11-10", "2014-11-10", "2015-12-10", "2015-12-30"]
         ser = pd.Series(data)
 
         result = infer_col(ser)
-        self.assertEqual(result.dtype, 'datetime64[ns]')
+        self.assertEqual(result.dtype, "datetime64[ns]")
         for i, date in enumerate(result):
-            self.assertEqual(date.strftime('%Y-%m-%d'), expected_dates[i])
+            self.assertEqual(date.strftime("%Y-%m-%d"), expected_dates[i])
 
     def test_defer_date_yyyymmdd(self):
-        data = ['2011-02-01', '2011-03-01', '2011-04-01', '2015-01-01', '2019-01-14']
-        expected_dates = ['2011-02-01', '2011-03-01', '2011-04-01', '2015-01-01', '2019-01-14']
+        data = ["2011-02-01", "2011-03-01", "2011-04-01", "2015-01-01", "2019-01-14"]
+        expected_dates = ["2011-02-01", "2011-03-01", "2011-04-01", "2015-01-01", "2019-01-14"]
         ser = pd.Series(data)
 
         result = infer_col(ser)
-        self.assertEqual(result.dtype, 'datetime64[ns]')
+        self.assertEqual(result.dtype, "datetime64[ns]")
         for i, date in enumerate(result):
-            self.assertEqual(date.strftime('%Y-%m-%d'), expected_dates[i])
+            self.assertEqual(date.strftime("%Y-%m-%d"), expected_dates[i])
 
     def test_defer_category(self):
         # all 60 values, with 4 unique value. So the theshold is 4/60 = 0.06
-        data = ['A', 'B', 'D', 'D', 'C', 'A', 'B', 'D', 'C', 'A', 'B', 'D', 'D', 'C', 'A', 'A','D', 'D', 'A', 'A',
-            'A', 'B', 'D', 'D', 'C', 'A', 'B', 'D', 'C', 'A', 'B', 'D', 'D', 'C', 'A', 'A','D', 'D', 'A', 'A',
-            'A', 'B', 'D', 'D', 'C', 'A', 'B', 'D', 'C', 'A', 'B', 'D', 'D', 'C', 'A', 'A','D', 'D', 'A', 'A']
+        data = [
+            "A",
+            "B",
+            "D",
+            "D",
+            "C",
+            "A",
+            "B",
+            "D",
+            "C",
+            "A",
+            "B",
+            "D",
+            "D",
+            "C",
+            "A",
+            "A",
+            "D",
+            "D",
+            "A",
+            "A",
+            "A",
+            "B",
+            "D",
+            "D",
+            "C",
+            "A",
+            "B",
+            "D",
+            "C",
+            "A",
+            "B",
+            "D",
+            "D",
+            "C",
+            "A",
+            "A",
+            "D",
+            "D",
+            "A",
+            "A",
+            "A",
+            "B",
+            "D",
+            "D",
+            "C",
+            "A",
+            "B",
+            "D",
+            "C",
+            "A",
+            "B",
+            "D",
+            "D",
+            "C",
+            "A",
+            "A",
+            "D",
+            "D",
+            "A",
+            "A",
+        ]
         ser = pd.Series(data)
 
         result = infer_col(ser)
-        self.assertEqual(result.dtype, 'category')
+        self.assertEqual(result.dtype, "category")
 
     def test_defer_string(self):
         # all 60 values, with 4 unique value. So the theshold is 4/60 = 0.06
-        data = ['Hello', 'World', 'I am', 'Software', 'Engineer']
+        data = ["Hello", "World", "I am", "Software", "Engineer"]
         ser = pd.Series(data)
 
         result = infer_col(ser)
-        self.assertEqual(result.dtype, 'object')
+        self.assertEqual(result.dtype, "object")
 
     def test_data_type_inference_dataframe(self):
         # Create a sample DataFrame for testing
         data = {
-            'A': ['2022-01-01', '2022-02-01', '2022-03-01', '2022-03-05', '2022-03-07', '2022-03-05', '2022-03-07'],
-            'B': ['1', '2', '3', '7', '8', '9', '10'],
-            'C': ['a', 'b', 'c', 'a', 'a', 'b', 'c'],
-            'D': [True, False, True, False, True, False, False],
-            'E': ['Hello', 'its', 'me', 'klur', 'world', 'happy', 'coding']
+            "A": [
+                "2022-01-01",
+                "2022-02-01",
+                "2022-03-01",
+                "2022-03-05",
+                "2022-03-07",
+                "2022-03-05",
+                "2022-03-07",
+            ],
+            "B": ["1", "2", "3", "7", "8", "9", "10"],
+            "C": ["a", "b", "c", "a", "a", "b", "c"],
+            "D": [True, False, True, False, True, False, False],
+            "E": ["Hello", "its", "me", "klur", "world", "happy", "coding"],
         }
         sample_df = pd.DataFrame(data)
 
         result_df = infer_df(sample_df)
-        self.assertEqual(result_df['A'].dtype, 'datetime64[ns]')
-        self.assertEqual(result_df['B'].dtype, 'int64')
-        self.assertEqual(result_df['C'].dtype, 'object')
-        self.assertEqual(result_df['D'].dtype, 'bool')
-        self.assertEqual(result_df['E'].dtype, 'object')
+        self.assertEqual(result_df["A"].dtype, "datetime64[ns]")
+        self.assertEqual(result_df["B"].dtype, "int64")
+        self.assertEqual(result_df["C"].dtype, "object")
+        self.assertEqual(result_df["D"].dtype, "bool")
+        self.assertEqual(result_df["E"].dtype, "object")
 
     def test_handling_of_bad_data_cases(self):
         data = {
-            'A': ['2022-01-01', '2022-02-01', 'bad data', '2022-03-05', '2022-03-07', '2022-03-05', '2022-03-07'],
-            'B': ['1', '2', '3', '7', '8', 'bad data', '10'],
-            'C': ['a', 'b', 'b', 'bad data', 'a', 'b', 'b'],
-            'D': ['True', 'False', 'True', 'False', 'True', 'bad data', 'False'],
-            'E': ['Hello', 'its', 'bad data', 'klur', 'world', 'happy', 'coding']
+            "A": [
+                "2022-01-01",
+                "2022-02-01",
+                "bad data",
+                "2022-03-05",
+                "2022-03-07",
+                "2022-03-05",
+                "2022-03-07",
+            ],
+            "B": ["1", "2", "3", "7", "8", "bad data", "10"],
+            "C": ["a", "b", "b", "bad data", "a", "b", "b"],
+            "D": ["True", "False", "True", "False", "True", "bad data", "False"],
+            "E": ["Hello", "its", "bad data", "klur", "world", "happy", "coding"],
         }
         sample_df = pd.DataFrame(data)
 
         result_df = infer_df(sample_df)
-        self.assertEqual(result_df['A'].dtype, 'datetime64[ns]')
-        self.assertEqual(result_df['B'].dtype, 'float64')
-        self.assertEqual(result_df['C'].dtype, 'object') # Because the ratio of unique and len isn't low enough
-        self.assertEqual(result_df['D'].dtype, 'bool')
-        self.assertEqual(result_df['E'].dtype, 'object')
+        self.assertEqual(result_df["A"].dtype, "datetime64[ns]")
+        self.assertEqual(result_df["B"].dtype, "float64")
+        self.assertEqual(
+            result_df["C"].dtype, "object"
+        )  # Because the ratio of unique and len isn't low enough
+        self.assertEqual(result_df["D"].dtype, "bool")
+        self.assertEqual(result_df["E"].dtype, "object")
 
     def test_process_operation_apply_script(self):
-        col = 'email'
+        col = "email"
         data = {
-            col: [ 'bguzman@example.org',
-                    'melendezmary@example.com',]
+            col: [
+                "bguzman@example.org",
+                "melendezmary@example.com",
+            ]
         }
         sample_df = pd.DataFrame(data)
         result = process_operation_apply_script(sample_df, col, "x.split('@')[0]")
 
-        self.assertEqual(result[col][0], 'bguzman')
-        self.assertEqual(result[col][1], 'melendezmary')
+        self.assertEqual(result[col][0], "bguzman")
+        self.assertEqual(result[col][1], "melendezmary")
+
+
+class TestVectorizedInference(unittest.TestCase):
+    def test_infer_boolean_matches_legacy_on_showcase_data(self):
+        for dtype in [None, str]:
+            for name, df in read_showcase_csvs(dtype=dtype).items():
+                for col in df.columns:
+                    with self.subTest(file=name, column=col, dtype=dtype):
+                        pd.testing.assert_series_equal(
+                            infer_boolean(df[col]), legacy_infer_boolean(df[col])
+                        )
+
+    def test_infer_int_matches_legacy_on_showcase_data(self):
+        for dtype in [None, str]:
+            for name, df in read_showcase_csvs(dtype=dtype).items():
+                for col in df.columns:
+                    with self.subTest(file=name, column=col, dtype=dtype):
+                        pd.testing.assert_series_equal(
+                            infer_int(df[col]), legacy_infer_int(df[col])
+                        )
+
+    def test_infer_int_matches_legacy_on_edge_values(self):
+        data = [
+            "1,234",
+            "'42'",
+            '"7"',
+            " 12 ",
+            "+5",
+            "-3",
+            "1_000",
+            "\u0663",
+            "1.5",
+            "",
+            None,
+            3,
+            4.0,
+            True,
+        ]
+        ser = pd.Series(data, name="edge", index=range(10, 10 + len(data)))
+
+        pd.testing.assert_series_equal(infer_int(ser), legacy_infer_int(ser))
+
+    def test_infer_boolean_matches_legacy_on_edge_values(self):
+        data = ["TRUE", "No", "t", "F", "1", 0, True, False, None, float("nan"), " yes", "maybe"]
+        ser = pd.Series(data, name="edge", index=range(10, 10 + len(data)))
+
+        pd.testing.assert_series_equal(infer_boolean(ser), legacy_infer_boolean(ser))
+
+
+class TestSampleInference(unittest.TestCase):
+    def test_sample_inference_matches_full_inference(self):
+        for name, df in read_showcase_csvs().items():
+            tall_df = pd.concat([df] * 20, ignore_index=True)
+            for col in tall_df.columns:
+                with self.subTest(file=name, column=col):
+                    sampled = infer_col(tall_df[col], sample_size=500)
+                    exhaustive = infer_col(tall_df[col], sample_size=None)
+                    pd.testing.assert_series_equal(pd.Series(sampled), pd.Series(exhaustive))
+
+    def test_sample_inference_rejected_when_full_column_disagrees(self):
+        ser = pd.Series(["1"] * 80 + ["x"] * 20)
+
+        self.assertIsNone(infer_col_from_sample(ser, ser.iloc[:10]))
+
+
+class TestDictionaryInference(unittest.TestCase):
+    def test_dictionary_inference_matches_row_inference(self):
+        for name, df in read_showcase_csvs(dtype=str).items():
+            tall_df = pd.concat([df] * 5, ignore_index=True)
+            for col in tall_df.columns:
+                with self.subTest(file=name, column=col):
+                    factorized = factorize_col(tall_df[col])
+                    by_unique = infer_col_exhaustive(
+                        tall_df[col], factorized._replace(dictionary=True)
+                    )
+                    by_row = infer_col_exhaustive(
+                        tall_df[col], factorized._replace(dictionary=False)
+                    )
+                    pd.testing.assert_series_equal(pd.Series(by_unique), pd.Series(by_row))
+
+    def test_dictionary_encoding_picked_by_unique_ratio(self):
+        self.assertTrue(factorize_col(pd.Series(["a", "b", None] * 10)).dictionary)
+        self.assertFalse(factorize_col(pd.Series([str(i) for i in range(30)])).dictionary)
+        self.assertFalse(factorize_col(pd.Series([1, "1", True] * 10)).dictionary)
+
+
+class TestLazyCandidates(unittest.TestCase):
+    def test_first_accepted_candidate_stops_the_pipeline(self):
+        runs = start_candidate_runs(pd.Series(["1", "2", "3", "4"]))
+
+        self.assertEqual(pick_candidate(runs, 4), "int")
+        self.assertEqual(runs["bool"].position, 0)
+        self.assertEqual(runs["date"].position, 0)
+
+    @mock.patch.object(data_processors, "INFER_CHUNK_SIZE", 10)
+    def test_candidate_gives_up_once_over_threshold(self):
+        run = CandidateRun(pd.Series(["x"] * 100), infer_int)
+
+        self.assertFalse(run.advance(5))
+        self.assertEqual(run.position, 10)
+        self.assertTrue(run.advance(101))
+        self.assertEqual(len(run.result()), 100)
+
+    @mock.patch.object(data_processors, "INFER_CHUNK_SIZE", 7)
+    def test_chunked_inference_matches_single_chunk(self):
+        for name, df in read_showcase_csvs().items():
+            for col in df.columns:
+                with self.subTest(file=name, column=col):
+                    chunked = infer_col(df[col], sample_size=None)
+                    with mock.patch.object(data_processors, "INFER_CHUNK_SIZE", len(df)):
+                        single = infer_col(df[col], sample_size=None)
+                    pd.testing.assert_series_equal(pd.Series(chunked), pd.Series(single))
+
+
+class TestParallelInference(unittest.TestCase):
+    def test_parallel_inference_matches_sequential(self):
+        for name, df in read_showcase_csvs().items():
+            df["mixed"] = [i if i % 2 else "a" for i in range(len(df))]
+            with self.subTest(file=name):
+                pd.testing.assert_frame_equal(infer_df_parallel(df), infer_df(df))
+
+    def test_parallel_inference_keeps_object_columns_with_none(self):
+        df = pd.DataFrame(
+            {
+                "ints": pd.Series([1, None, 3, 4], dtype=object),
+                "bools": pd.Series([True, False, None, True], dtype=object),
+                "mixed": pd.Series([1, "a", None, 2.5], dtype=object),
+                "strings": pd.Series(["1", None, "3", "4"], dtype=object),
+            }
+        )
+        pd.testing.assert_frame_equal(infer_df_parallel(df), infer_df(df))
+
+
+class TestMultiColumnOperations(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame(
+            {
+                "first": ["2021-06-13", None, "2021-06-15"],
+                "second": ["1.5", "x", "3"],
+                "third": ["a-1", "b-2", "c-3"],
+            },
+            index=[10, 20, 30],
+        )
+
+    def apply_one_by_one(self, operation_type, columns, raw_script=None):
+        df = self.df.copy()
+        for col in columns:
+            df = apply_operation(df, operation_type, col, raw_script)
+        return df
+
+    def test_casts_match_one_column_at_a_time(self):
+        columns = ["first", "second"]
+        for operation_type in ["cast_to_datetime", "cast_to_numeric", "cast_to_category"]:
+            with self.subTest(operation=operation_type):
+                pd.testing.assert_frame_equal(
+                    apply_operation(self.df.copy(), operation_type, columns),
+                    self.apply_one_by_one(operation_type, columns),
+                )
+
+    def test_row_by_row_scripts_run_in_the_pool(self):
+        columns = list(self.df.columns)
+        stats = {}
+        with mock.patch.object(data_processors, "COLUMN_THREADS", 2), mock.patch.object(
+            data_processors, "apply_script_parallel", wraps=data_processors.apply_script_parallel
+        ) as parallel:
+            result = apply_operation(
+                self.df.copy(),
+                "apply_script",
+                columns,
+                "str(x).upper()",
+                stats=stats,
+                use_pool=True,
+            )
+
+        parallel.assert_called_once()
+        pd.testing.assert_frame_equal(
+            result, self.apply_one_by_one("apply_script", columns, "str(x).upper()")
+        )
+        self.assertEqual(set(stats), set(columns))
+        self.assertEqual(stats["third"]["mode"], "per_row")
+
+    def test_pool_is_left_alone_outside_jobs(self):
+        columns = list(self.df.columns)
+        with mock.patch.object(data_processors, "COLUMN_THREADS", 2), mock.patch.object(
+            data_processors, "get_inference_pool"
+        ) as get_pool:
+            result = apply_operation(self.df.copy(), "apply_script", columns, "str(x).upper()")
+
+        get_pool.assert_not_called()
+        pd.testing.assert_frame_equal(
+            result, self.apply_one_by_one("apply_script", columns, "str(x).upper()")
+        )
+
+
+class TestDateFormatDetection(unittest.TestCase):
+    def test_infer_date_matches_mixed_parser_on_showcase_data(self):
+        for name, df in read_showcase_csvs(dtype=str).items():
+            # Parsed relative to the clock, so they differ between two calls.
+            df = df.replace(["now", "today"], None)
+            for col in df.columns:
+                with self.subTest(file=name, column=col):
+                    pd.testing.assert_series_equal(infer_date(df[col]), parse_mixed_dates(df[col]))
+
+    def test_infer_date_matches_mixed_parser_on_edge_values(self):
+        data = [
+            "01/01/70",
+            "01/01/77",
+            "29/02/72",
+            "12/06/21",
+            "13-JUN-21",
+            "2021-06-05 10:11:12",
+            "5 June 2021",
+            "2021-02-30",
+            None,
+            "x",
+        ] * 3
+        ser = pd.Series(data, name="edge")
+
+        pd.testing.assert_series_equal(infer_date(ser), parse_mixed_dates(ser))
+
+    def test_month_first_format_comes_with_day_first_twin(self):
+        formats = detect_date_formats(pd.Series(["06/13/21", "12/17/21", "07/28/20"]))
+
+        self.assertEqual(formats, ("%d/%m/%y", "%m/%d/%y"))
+
+    def test_detected_formats_are_cached_by_signature(self):
+        ser = pd.Series(["2021-06-13", "2021-12-06"], name="cached")
+        infer_date(ser)
+        with mock.patch.object(data_processors, "detect_date_formats") as detect:
+            infer_date(pd.Series(["2022-01-13", "2023-12-06"], name="cached"))
+        detect.assert_not_called()
+
+
+class TestBatchProcessing(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame(
+            {
+                "number": ["1", "2", None],
+                "email": ["a@x.org", "b@y.com", "c@z.net"],
+            }
+        )
+        patches = {
+            name: mock.patch.object(data_processors, name)
+            for name in ["upload_dataframe", "update_status", "update_version"]
+        }
+        self.mocks = {name: patch.start() for name, patch in patches.items()}
+        for patch in patches.values():
+            self.addCleanup(patch.stop)
+
+    def test_steps_are_applied_in_order_and_uploaded_once(self):
+        steps = [
+            {"operation": "cast_to_numeric", "column": "number"},
+            {"operation": "fill_null", "to_fill": "0", "column": "number"},
+            {"operation": "apply_script", "script": "x * 10", "column": "number"},
+            {"operation": "apply_script", "script": "x.split('@')[0]", "column": "email"},
+        ]
+
+        process_batch_async(self.df, "df", "v2", steps)
+
+        self.mocks["upload_dataframe"].assert_called_once()
+        uploaded = self.mocks["upload_dataframe"].call_args.args[2]
+        self.assertEqual(uploaded["number"].tolist(), [10.0, 20.0, 0.0])
+        self.assertEqual(uploaded["email"].tolist(), ["a", "b", "c"])
+        self.mocks["update_status"].assert_called_once_with("df", "v2", ProcessStatus.PROCESSED)
+        recorded = self.mocks["update_version"].call_args.args[2]["steps"]
+        self.assertEqual(
+            [step["operation"] for step in recorded], [step["operation"] for step in steps]
+        )
+        self.assertEqual(recorded[2]["script_stats"], {"mode": "vectorized"})
+
+    def test_version_without_checkpoint_is_not_uploaded(self):
+        steps = [{"operation": "cast_to_numeric", "column": "number"}]
+
+        process_batch_async(self.df, "df", "v2", steps, checkpoint=False)
+
+        self.mocks["upload_dataframe"].assert_not_called()
+        self.assertFalse(self.mocks["update_version"].call_args.args[2]["materialized"])
+        self.mocks["update_status"].assert_called_once_with("df", "v2", ProcessStatus.PROCESSED)
+
+    def test_rewritten_steps_are_recorded_as_plan(self):
+        steps = [
+            {"operation": "cast_to_numeric", "column": "number"},
+            {"operation": "cast_to_numeric", "column": "number"},
+            {"operation": "apply_script", "script": "x * 10", "column": "number"},
+        ]
+
+        process_batch_async(self.df, "df", "v2", steps)
+
+        fields = self.mocks["update_version"].call_args.args[2]
+        self.assertNotIn("steps", fields)
+        self.assertEqual(
+            [step["operation"] for step in fields["plan"]], ["cast_to_numeric", "apply_script"]
+        )
+        self.assertEqual(len(fields["plan_rewrites"]), 1)
+
+    def test_failed_step_is_recorded_and_nothing_uploaded(self):
+        steps = [
+            {"operation": "cast_to_numeric", "column": "number"},
+            {"operation": "apply_script", "script": "1 / 0", "column": "number"},
+        ]
+
+        process_batch_async(self.df, "df", "v2", steps)
+
+        self.mocks["upload_dataframe"].assert_not_called()
+        self.mocks["update_version"].assert_called_once_with("df", "v2", {"failed_step": 1})
+        self.mocks["update_status"].assert_called_once_with("df", "v2", ProcessStatus.FAIL)
+
+
+class TestCastOperations(unittest.TestCase):
+    def test_cast_to_string_keeps_nulls(self):
+        df = pd.DataFrame({"number": [1.5, None, 3.0]})
+
+        result = process_operation_cast_to(df, "number", "cast_to_string")
+
+        self.assertEqual(result["number"].dtype, "string")
+        self.assertEqual(result["number"].tolist(), ["1.5", pd.NA, "3.0"])
+
+    def test_cast_to_string_writes_dates_in_full(self):
+        df = pd.DataFrame(
+            {
+                "date": pd.to_datetime(["2020-01-01", None]),
+                "duration": pd.to_timedelta(["1 day", None]),
+            }
+        )
+
+        for col, expected in [("date", "2020-01-01 00:00:00"), ("duration", "1 days 00:00:00")]:
+            result = process_operation_cast_to(df, col, "cast_to_string")
+            self.assertEqual(result[col].tolist(), [expected, pd.NA])
+
+    def test_cast_to_boolean_reads_the_boolean_vocabulary(self):
+        df = pd.DataFrame(
+            {
+                "text": ["false", "YES", "maybe", None],
+                "number": [0, 2, None, 1],
+            }
+        )
+
+        for col, expected in [
+            ("text", [False, True, pd.NA, pd.NA]),
+            ("number", [False, True, pd.NA, True]),
+        ]:
+            with self.subTest(column=col):
+                result = process_operation_cast_to(df, col, "cast_to_boolean")
+                self.assertEqual(result[col].dtype, "boolean")
+                self.assertEqual(result[col].tolist(), expected)
+
+
+class TestFillNull(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame(
+            {
+                "count": pd.array([1, None, 4], dtype="Int64"),
+                "ratio": [1.0, None, 2.0],
+                "flag": pd.array([True, None, True], dtype="boolean"),
+                "kind": pd.Categorical(["a", None, "a"]),
+                "date": pd.to_datetime(["2020-01-01", None, "2020-01-03"]),
+            }
+        )
+
+    def test_statistics_keep_the_column_dtype(self):
+        cases = [
+            ("mean", ["count", "ratio", "date"], [2, 1.5, pd.Timestamp("2020-01-02")]),
+            ("median", ["count", "ratio"], [2, 1.5]),
+            ("mode", ["count", "flag", "kind"], [1, True, "a"]),
+            ("ffill", list(self.df.columns), [1, 1.0, True, "a", pd.Timestamp("2020-01-01")]),
+            ("bfill", ["count", "date"], [4, pd.Timestamp("2020-01-03")]),
+        ]
+        for strategy, columns, expected in cases:
+            with self.subTest(strategy=strategy):
+                result = process_operation_fill_null(self.df.copy(), columns, strategy=strategy)
+                self.assertEqual(result.loc[1, columns].tolist(), expected)
+                pd.testing.assert_series_equal(result.dtypes, self.df.dtypes)
+
+    def test_constant_is_converted_to_each_dtype(self):
+        result = process_operation_fill_null(self.df, ["count", "flag"], "0")
+        self.assertIs(result, self.df)
+        self.assertEqual(self.df.loc[1, ["count", "flag"]].tolist(), [0, False])
+
+        process_operation_fill_null(self.df, "kind", "b")
+        self.assertEqual(self.df["kind"].tolist(), ["a", "b", "a"])
+
+    def test_statistic_of_unordered_values_is_rejected(self):
+        with self.assertRaises(TypeError):
+            process_operation_fill_null(self.df, "flag", strategy="mean")
+        with self.assertRaises(ValueError):
+            process_operation_fill_null(self.df, "ratio", strategy="interpolate")
 
 
-if __name__ == '__main__':
+if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from backend.common import data_processors
+from backend.common.data_processors import infer_df, infer_df_parallel
+from backend.common.inference_cache import InferenceCache, column_key
+from backend.common.tests.test_data_processors import read_showcase_csvs
+
+
+class TestInferenceCache(unittest.TestCase):
+    def test_column_key_depends_on_content_only(self):
+        col = pd.Series(["1", "2", None], name="a")
+
+        self.assertEqual(column_key(col), column_key(col.rename("b")))
+        self.assertNotEqual(column_key(col), column_key(pd.Series(["1", "3", None])))
+        self.assertNotEqual(column_key(col), column_key(col.astype("string")))
+
+    def test_least_recently_used_decision_is_evicted(self):
+        cache = InferenceCache(max_size=2)
+        cache.put("a", {"kind": "int"})
+        cache.put("b", {"kind": "bool"})
+        cache.get("a")
+        cache.put("c", {"kind": "date", "date_formats": []})
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), {"kind": "int"})
+        self.assertEqual(cache.stats(), {"hits": 2, "misses": 1})
+
+    def test_cached_inference_matches_uncached(self):
+        cache = InferenceCache()
+        for name, df in read_showcase_csvs().items():
+            with self.subTest(file=name):
+                expected = infer_df(df)
+                pd.testing.assert_frame_equal(infer_df(df, cache), expected)
+                with mock.patch.object(data_processors, "pick_candidate") as pick:
+                    pd.testing.assert_frame_equal(infer_df(df, cache), expected)
+                pick.assert_not_called()
+
+    def test_parallel_inference_fills_and_uses_the_cache(self):
+        cache = InferenceCache()
+        df = read_showcase_csvs()["1_good_data_show_table_overall.csv"]
+
+        expected = infer_df_parallel(df, cache)
+        self.assertEqual(cache.stats(), {"hits": 0, "misses": len(df.columns)})
+        pd.testing.assert_frame_equal(infer_df_parallel(df, cache), expected)
+        self.assertEqual(cache.stats(), {"hits": len(df.columns), "misses": len(df.columns)})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from backend.common.ingestion import ColumnEvidence, stream_csv_to_parquet
+
+
+class TestStreamingIngestion(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.csv_path = str(Path(self.tmp_dir.name) / "upload.csv")
+        self.parquet_path = str(Path(self.tmp_dir.name) / "upload.parquet")
+
+    def test_column_is_promoted_along_the_lattice(self):
+        evidence = ColumnEvidence("col")
+
+        evidence.update(pd.Series(["1", "2", "3", None]))
+        self.assertEqual(evidence.col_type, "int")
+        evidence.update(pd.Series(["1.5", "2.5", "3.5", "4.5"]))
+        self.assertEqual(evidence.col_type, "float")
+        evidence.update(pd.Series(["hello", "world", "foo", "bar"] * 3))
+        self.assertEqual(evidence.col_type, "string")
+
+    def test_stream_csv_to_parquet_writes_a_row_group_per_chunk(self):
+        pd.DataFrame(
+            {
+                "number": [str(i) for i in range(30)],
+                "ratio": [str(i) for i in range(20)] + ["0.5"] * 10,
+                "date": ["2021-06-13"] * 30,
+                "text": ["a", "b", "c"] * 10,
+            }
+        ).to_csv(self.csv_path, index=False)
+
+        col_types = stream_csv_to_parquet(self.csv_path, self.parquet_path, chunksize=10)
+
+        self.assertEqual(
+            col_types, {"number": "int", "ratio": "float", "date": "datetime", "text": "string"}
+        )
+        parquet_file = pq.ParquetFile(self.parquet_path)
+        self.assertEqual(parquet_file.metadata.num_row_groups, 3)
+        result = parquet_file.read().to_pandas()
+        self.assertEqual(result["number"].tolist(), list(range(30)))
+        self.assertEqual(result["ratio"].iloc[-1], 0.5)
+        self.assertEqual(str(result["date"].dtype), "datetime64[ns]")
+
+
+if __name__ == "__main__":
+    unittest.main()
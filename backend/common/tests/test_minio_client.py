@@ -0,0 +1,346 @@
+import threading
+import unittest
+from datetime import datetime
+from io import BytesIO
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from minio.error import S3Error
+
+from backend.common import compression, minio_client
+from backend.common.minio_client import (
+    get_dataframe,
+    get_dataframe_head,
+    get_empty_dataframe,
+    upload_dataframe,
+    upload_dataframe_file,
+)
+
+
+class FakeResponse(BytesIO):
+    def release_conn(self):
+        self.released = True
+
+
+class FakeMinio:
+    """The calls of the Minio client used by minio_client, kept in memory."""
+
+    def __init__(self):
+        self.objects = {}
+        self.metadata = {}
+        self.put_names = []
+        # (object name, offset, length) of every get_object.
+        self.reads = []
+        self.responses = []
+
+    def bucket_exists(self, bucket_name):
+        return True
+
+    def put_object(
+        self,
+        bucket_name,
+        object_name,
+        data,
+        length,
+        metadata=None,
+        part_size=0,
+        num_parallel_uploads=3,
+    ):
+        self.objects[object_name] = data.read()
+        self.metadata[object_name] = metadata or {}
+        self.put_names.append(object_name)
+
+    def stat_object(self, bucket_name, object_name):
+        self.missing(object_name)
+        return SimpleNamespace(
+            size=len(self.objects[object_name]), metadata=self.metadata.get(object_name, {})
+        )
+
+    def get_object(self, bucket_name, object_name, offset=0, length=0):
+        self.missing(object_name)
+        data = self.objects[object_name]
+        self.reads.append((object_name, offset, length))
+        response = FakeResponse(data[offset : offset + length] if length else data[offset:])
+        self.responses.append(response)
+        return response
+
+    def missing(self, object_name):
+        if object_name not in self.objects:
+            raise S3Error(None, "NoSuchKey", "missing", object_name, "", "")
+
+
+class TestColumnStorage(unittest.TestCase):
+    def setUp(self):
+        self.client = FakeMinio()
+        patch = mock.patch.object(minio_client, "client", self.client)
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.df = pd.DataFrame(
+            {
+                "number": pd.array([1, None, 3], dtype="Int64"),
+                "date": pd.to_datetime(["2021-06-13", None, "2021-06-15"]),
+                "text": pd.Categorical(["a", "b", "a"]),
+            }
+        )
+
+    def test_round_trip_keeps_dtypes_and_index(self):
+        upload_dataframe("df", "v0", self.df)
+        pd.testing.assert_frame_equal(get_dataframe("df", "v0"), self.df)
+
+        indexed = self.df.set_index(pd.Index([10, 20, 30], name="id"))
+        upload_dataframe("df", "v1", indexed)
+        pd.testing.assert_frame_equal(get_dataframe("df", "v1"), indexed)
+
+    def test_labels_json_cant_hold_are_stored_as_a_single_file(self):
+        dated = pd.DataFrame({datetime(2021, 1, 1): [1, 2], datetime(2021, 2, 1): [3, 4]})
+        upload_dataframe("df", "v0", dated)
+
+        self.assertEqual(list(self.client.objects), [minio_client.file_name("df", "v0")])
+        pd.testing.assert_frame_equal(get_dataframe("df", "v0"), dated)
+
+    def test_unchanged_columns_are_not_uploaded_again(self):
+        upload_dataframe("df", "v0", self.df)
+        self.client.put_names.clear()
+
+        changed = self.df.assign(number=self.df["number"] * 2)
+        upload_dataframe("df", "v1", changed)
+
+        column_puts = [name for name in self.client.put_names if "/columns/" in name]
+        self.assertEqual(len(column_puts), 1)
+        pd.testing.assert_frame_equal(get_dataframe("df", "v1"), changed)
+
+    def test_only_given_columns_are_downloaded(self):
+        upload_dataframe("df", "v0", self.df)
+
+        with mock.patch.object(minio_client, "read_column", wraps=minio_client.read_column) as read:
+            result = get_dataframe("df", "v0", ["text"])
+
+        self.assertEqual(read.call_count, 1)
+        pd.testing.assert_frame_equal(result, self.df[["text"]])
+
+    def test_versions_without_manifest_are_read_whole(self):
+        upload_dataframe_file("df", "v0", self.df)
+
+        pd.testing.assert_frame_equal(get_dataframe("df", "v0"), self.df)
+        pd.testing.assert_frame_equal(get_dataframe("df", "v0", ["date"]), self.df[["date"]])
+
+    def test_head_reads_only_the_first_row_groups(self):
+        df = pd.concat([self.df] * 4, ignore_index=True)
+        read_row_groups = minio_client.pq.ParquetFile.read_row_groups
+        with mock.patch.object(minio_client, "ROW_GROUP_SIZE", 5):
+            upload_dataframe("df", "v0", df)
+            upload_dataframe_file("df", "v1", df.set_index(df.index + 100))
+
+        for version_id, expected in [("v0", df), ("v1", df.set_index(df.index + 100))]:
+            with self.subTest(version=version_id), mock.patch.object(
+                minio_client.pq.ParquetFile,
+                "read_row_groups",
+                autospec=True,
+                side_effect=read_row_groups,
+            ) as read:
+                head, row_cnt = get_dataframe_head("df", version_id, 7)
+                self.assertEqual(row_cnt, 12)
+                pd.testing.assert_frame_equal(head, expected.iloc[:7])
+                # 7 rows are in the first two row groups of 5 rows.
+                self.assertTrue(all(call.args[1] == [0, 1] for call in read.call_args_list))
+
+    def test_empty_dataframe_has_the_columns_and_dtypes(self):
+        upload_dataframe("df", "v0", self.df)
+        upload_dataframe_file("df", "v1", self.df.set_index(self.df.index + 100))
+
+        for version_id in ["v0", "v1"]:
+            with self.subTest(version=version_id):
+                empty = get_empty_dataframe("df", version_id)
+                self.assertEqual(len(empty), 0)
+                self.assertEqual(list(empty.columns), list(self.df.columns))
+                self.assertEqual(list(empty.dtypes.astype(str)), list(self.df.dtypes.astype(str)))
+
+    def test_filters_skip_row_groups_and_keep_index_labels(self):
+        df = pd.DataFrame(
+            {
+                "number": pd.array(range(20), dtype="Int64"),
+                "text": pd.Categorical(list("ab") * 10),
+            }
+        )
+        read_row_groups = minio_client.pq.ParquetFile.read_row_groups
+        with mock.patch.object(minio_client, "ROW_GROUP_SIZE", 5):
+            upload_dataframe("df", "v0", df)
+            upload_dataframe_file("df", "v1", df.set_index(df.index + 100))
+
+        for version_id, expected in [("v0", df), ("v1", df.set_index(df.index + 100))]:
+            with self.subTest(version=version_id), mock.patch.object(
+                minio_client.pq.ParquetFile,
+                "read_row_groups",
+                autospec=True,
+                side_effect=read_row_groups,
+            ) as read:
+                result = get_dataframe(
+                    "df", version_id, ["text"], [("number", ">=", 6), ("number", "<", 8)]
+                )
+                pd.testing.assert_frame_equal(result, expected[["text"]].iloc[6:8])
+                # Rows 6 and 7 are both in the second row group of 5 rows.
+                self.assertTrue(all(call.args[1] == [1] for call in read.call_args_list))
+
+                # One of the clauses holds.
+                filters = [[("number", "<", 1)], [("text", "==", "b"), ("number", ">", 16)]]
+                result = get_dataframe("df", version_id, None, filters)
+                pd.testing.assert_frame_equal(result, expected.iloc[[0, 17, 19]])
+
+    def test_every_object_read_is_closed(self):
+        upload_dataframe("df", "v0", self.df)
+        upload_dataframe_file("df", "v1", self.df)
+        opened = []
+
+        class RecordedObjectFile(minio_client.ObjectFile):
+            def __init__(self, object_name):
+                super().__init__(object_name)
+                opened.append(self)
+
+        reads = {
+            "whole": lambda version_id: get_dataframe("df", version_id),
+            "columns": lambda version_id: get_dataframe("df", version_id, ["text"]),
+            "filtered": lambda version_id: get_dataframe(
+                "df", version_id, ["text"], [("number", ">", 1)]
+            ),
+            "head": lambda version_id: get_dataframe_head("df", version_id, 2),
+        }
+        with mock.patch.object(minio_client, "ObjectFile", RecordedObjectFile):
+            for version_id in ["v0", "v1"]:
+                for name, read in reads.items():
+                    with self.subTest(version=version_id, read=name):
+                        opened.clear()
+                        read(version_id)
+                        self.assertTrue(opened)
+                        self.assertTrue(all(source.closed for source in opened))
+
+    def test_unchanged_columns_are_listed_from_the_base_version(self):
+        indexed = self.df.set_index(pd.Index([10, 20, 30], name="id"))
+        upload_dataframe("df", "v0", indexed)
+        self.client.put_names.clear()
+
+        changed = indexed[["number"]] * 2
+        upload_dataframe("df", "v1", changed, base_version_id="v0")
+
+        self.assertEqual(len([name for name in self.client.put_names if "/columns/" in name]), 1)
+        pd.testing.assert_frame_equal(
+            get_dataframe("df", "v1"), indexed.assign(number=changed["number"])
+        )
+
+    def test_columns_keep_the_codec_they_were_written_with(self):
+        with mock.patch.object(compression, "COMPRESSION", "zstd"):
+            upload_dataframe("df", "v0", self.df)
+        with mock.patch.object(compression, "COMPRESSION", "lz4"):
+            upload_dataframe("df", "v1", self.df.assign(number=self.df["number"] * 2))
+
+        manifest = minio_client.get_manifest("df", "v1")
+        self.assertEqual([entry["codec"] for entry in manifest["columns"]], ["lz4", "zstd", "zstd"])
+        for entry in manifest["columns"]:
+            metadata = pq.ParquetFile(BytesIO(self.client.objects[entry["object"]])).metadata
+            self.assertEqual(metadata.row_group(0).column(0).compression, entry["codec"].upper())
+        pd.testing.assert_frame_equal(
+            get_dataframe("df", "v1"), self.df.assign(number=self.df["number"] * 2)
+        )
+
+    def test_bucket_is_created_on_the_first_upload(self):
+        with mock.patch.object(minio_client, "bucket_ready", False), mock.patch.object(
+            self.client, "bucket_exists", return_value=False
+        ), mock.patch.object(self.client, "make_bucket", create=True) as make_bucket:
+            upload_dataframe("df", "v0", self.df)
+            upload_dataframe_file("df", "v1", self.df)
+        make_bucket.assert_called_once_with(minio_client.dataframe_bucket_name)
+
+
+class TestObjectFile(unittest.TestCase):
+    def setUp(self):
+        self.client = FakeMinio()
+        self.client.objects["object"] = bytes(range(256)) * 40
+        for name, value in [
+            ("client", self.client),
+            ("READ_BLOCK_SIZE", 1000),
+            ("READ_AHEAD_BLOCKS", 1),
+            ("CACHED_BLOCKS", 4),
+        ]:
+            patch = mock.patch.object(minio_client, name, value)
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_reads_are_fetched_by_blocks_with_read_ahead(self):
+        data = self.client.objects["object"]
+        file = minio_client.ObjectFile("object")
+
+        file.seek(-100, 2)
+        self.assertEqual(file.read(), data[-100:])
+        file.seek(1500)
+        self.assertEqual(file.read(100), data[1500:1600])
+        self.assertEqual(file.read(2000), data[1600:3600])
+
+        # The last block, then blocks 1 and 2 read ahead, then block 3.
+        self.assertEqual(
+            self.client.reads,
+            [
+                ("object", 10000, 240),
+                ("object", 1000, 2000),
+                ("object", 3000, 2000),
+            ],
+        )
+        for response in self.client.responses:
+            self.assertTrue(response.closed and response.released)
+
+    def test_head_downloads_only_the_footer_and_first_row_groups(self):
+        df = pd.DataFrame({"value": np.random.default_rng(0).random(200_000)})
+        with mock.patch.object(minio_client, "ROW_GROUP_SIZE", 10_000):
+            upload_dataframe_file("df", "v0", df)
+        self.client.reads.clear()
+
+        head, _ = get_dataframe_head("df", "v0", 10)
+
+        pd.testing.assert_frame_equal(head, df.iloc[:10])
+        read_bytes = sum(length for _, _, length in self.client.reads)
+        self.assertLess(read_bytes, len(self.client.objects["df_v0.br"]) / 4)
+
+
+class TestPutParquet(unittest.TestCase):
+    def test_pipe_holds_at_most_a_part_written_ahead(self):
+        pipe = minio_client.PartPipe(10)
+        waiting = []
+
+        def write():
+            for _ in range(20):
+                pipe.write(b"abcdef")
+                waiting.append(pipe.waiting_bytes)
+            pipe.close()
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        data = b""
+        while chunk := pipe.read(4):
+            data += chunk
+        writer.join()
+
+        self.assertEqual(data, b"abcdef" * 20)
+        # A write waits until fewer than 10 bytes are left to read.
+        self.assertLess(max(waiting), 10 + 6)
+
+    def test_encoding_error_is_raised_and_nothing_is_stored(self):
+        client = FakeMinio()
+        with mock.patch.object(minio_client, "client", client), self.assertRaises(
+            pa.ArrowException
+        ):
+            minio_client.put_parquet("object", pd.DataFrame({"mixed": [object(), 1]}), "zstd")
+        self.assertEqual(client.objects, {})
+
+    def test_interrupted_encoding_fails_the_upload(self):
+        client = FakeMinio()
+        with mock.patch.object(minio_client, "client", client), mock.patch.object(
+            pd.DataFrame, "to_parquet", side_effect=SystemExit
+        ), mock.patch.object(threading, "excepthook"), self.assertRaises(OSError):
+            minio_client.put_parquet("object", pd.DataFrame({"number": [1]}), "zstd")
+        self.assertEqual(client.objects, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
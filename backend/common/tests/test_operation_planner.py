@@ -0,0 +1,91 @@
+import unittest
+
+import pandas as pd
+
+from backend.common.data_processors import apply_operation
+from backend.common.operation_planner import merge_scripts, plan_operations
+
+
+def run(df, steps):
+    df = df.copy()
+    for step in steps:
+        df = apply_operation(
+            df,
+            step["operation"],
+            step["column"],
+            step.get("script"),
+            step.get("to_fill"),
+            strategy=step.get("strategy"),
+        )
+    return df
+
+
+class TestOperationPlanner(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame(
+            {
+                "ratio": [1.5, None, 4.0],
+                "number": ["1", None, "3"],
+                "name": pd.array(["a", "B", "c"], dtype="string"),
+            }
+        )
+
+    def assertPlanKeepsResult(self, steps, planned_cnt):
+        plan = plan_operations(steps, self.df.dtypes)
+        self.assertEqual(len(plan.steps), planned_cnt, plan.rewrites)
+        pd.testing.assert_frame_equal(run(self.df, plan.steps), run(self.df, steps))
+        return plan
+
+    def test_casts_to_the_current_dtype_and_repeated_casts_are_dropped(self):
+        self.assertPlanKeepsResult(
+            [
+                {"operation": "cast_to_numeric", "column": "ratio"},
+                {"operation": "cast_to_string", "column": "name"},
+                {"operation": "cast_to_numeric", "column": "number"},
+                {"operation": "cast_to_numeric", "column": "number"},
+                {"operation": "cast_to_string", "column": "number"},
+            ],
+            2,
+        )
+
+    def test_fills_of_filled_columns_are_dropped(self):
+        plan = self.assertPlanKeepsResult(
+            [
+                {"operation": "fill_null", "column": "ratio", "to_fill": "0"},
+                {"operation": "fill_null", "column": ["ratio", "number"], "strategy": "mode"},
+                {"operation": "fill_null", "column": "number", "to_fill": "x"},
+            ],
+            3,
+        )
+        self.assertEqual(plan.steps[1]["column"], ["number"])
+
+        self.assertPlanKeepsResult(
+            [
+                {"operation": "fill_null", "column": "ratio", "to_fill": "0"},
+                {"operation": "fill_null", "column": "ratio", "strategy": "mean"},
+            ],
+            1,
+        )
+
+    def test_numeric_scripts_on_a_column_are_merged(self):
+        plan = self.assertPlanKeepsResult(
+            [
+                {"operation": "fill_null", "column": "ratio", "to_fill": "0"},
+                {"operation": "apply_script", "column": "ratio", "script": "x * 2"},
+                {"operation": "apply_script", "column": "name", "script": "x.upper()"},
+                {"operation": "apply_script", "column": "ratio", "script": "math.sqrt(x) + 1"},
+                {"operation": "apply_script", "column": "name", "script": "x.lower()"},
+            ],
+            4,
+        )
+        self.assertEqual(plan.steps[1]["script"], "math.sqrt(x * 2) + 1")
+
+    def test_scripts_are_merged_only_when_equivalent(self):
+        self.assertEqual(merge_scripts("x + 1", "-x / 2"), "-(x + 1) / 2")
+        # String methods, and a variable used twice, aren't merged.
+        self.assertIsNone(merge_scripts("x + 1", "x.upper()"))
+        self.assertIsNone(merge_scripts("x + 1", "x * x"))
+
+
+if __name__ == "__main__":
+    unittest.main()
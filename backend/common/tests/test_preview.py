@@ -0,0 +1,69 @@
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from backend.common import preview
+from backend.common.preview import VersionCache, preview_operation, sample_rows
+
+
+class TestPreview(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame(
+            {
+                "number": [str(i) for i in range(1_000)],
+                "email": [f"user{i}@example.org" for i in range(1_000)],
+            }
+        )
+        patch = mock.patch.object(
+            preview,
+            "get_dataframe",
+            side_effect=lambda _, version_id, columns: self.df[columns].copy(),
+        )
+        self.get_dataframe = patch.start()
+        self.addCleanup(patch.stop)
+        cache_patch = mock.patch.object(preview, "version_cache", VersionCache())
+        cache_patch.start()
+        self.addCleanup(cache_patch.stop)
+
+    def test_operation_runs_on_the_first_rows_of_the_columns(self):
+        result = preview_operation("df", "v1", "apply_script", "email", "x.split('@')[0]", rows=3)
+
+        self.assertEqual(result["after"]["email"].tolist(), ["user0", "user1", "user2"])
+        self.assertEqual(result["before"]["email"].iloc[0], "user0@example.org")
+        self.get_dataframe.assert_called_once_with("df", "v1", ["email"])
+
+    def test_version_is_downloaded_once(self):
+        preview_operation("df", "v1", "cast_to_numeric", "number", rows=5)
+        result = preview_operation("df", "v1", "fill_null", "number", to_fill="0", rows=5)
+
+        self.get_dataframe.assert_called_once()
+        self.assertEqual(result["after"]["number"].tolist(), ["0", "1", "2", "3", "4"])
+        self.assertEqual(self.df["number"].iloc[0], "0")
+
+    def test_random_rows_are_reproducible_and_in_order(self):
+        first = sample_rows(self.df, 10, random=True, seed=1)
+        self.assertTrue(first.index.is_monotonic_increasing)
+        pd.testing.assert_frame_equal(first, sample_rows(self.df, 10, random=True, seed=1))
+        self.assertFalse(first.index.equals(sample_rows(self.df, 10, random=True, seed=2).index))
+
+    def test_rows_must_be_positive(self):
+        for rows in [0, -5]:
+            with self.subTest(rows=rows), self.assertRaises(ValueError):
+                sample_rows(self.df, rows, random=False)
+        with self.assertRaises(ValueError):
+            preview_operation("df", "v1", "cast_to_numeric", "number", rows=-5)
+
+    def test_cache_evicts_least_recently_used_columns(self):
+        cache = VersionCache(max_bytes=int(self.df[["number"]].memory_usage(deep=True).sum() * 1.5))
+
+        cache.get("df", "v1", ["number"])
+        cache.get("df", "v2", ["number"])
+        cache.get("df", "v2", ["number"])
+
+        self.assertEqual(list(cache.frames), [("df", "v2", ("number",))])
+        self.assertEqual(cache.stats()["hits"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from backend.common.data_processors import infer_df, process_operation_apply_script
+from backend.common.script_engine import SAFE_NAMESPACES, CompiledScript, compile_script
+from backend.common.tests.test_data_processors import SHOWCASE_DATA_DIR
+
+
+VECTORIZED_SCRIPTS = [
+    "x ** 2",
+    "x * 2 + 1",
+    "-x + 0.5",
+    "abs(x - 500)",
+    "x / 3",
+    "x // 7",
+    "x % 7",
+    "round(x / 3)",
+    "round(x, 2)",
+    "max(x, 300)",
+    "min(x, 500, 300.5)",
+    "pow(x, 2) % 13",
+    "math.sqrt(x)",
+    "math.floor(x / 7)",
+    "math.log(x, 2)",
+    "math.pi * x",
+    "x > 400",
+    "100 < x <= 500",
+]
+ROW_BY_ROW_SCRIPTS = [
+    ("Number Pow", "x ** 10"),
+    ("Number Pow", "round(x / 3, 2)"),
+    ("Number Pow", "str(x)"),
+    ("Name substring", "x[:3]"),
+    ("Email split", "x.split('@')[0]"),
+    ("Grade equal", "x == 'A'"),
+    ("Date", "x.year"),
+]
+
+
+def legacy_apply_script(col, raw_script):
+    return col.apply(lambda x: eval(raw_script, SAFE_NAMESPACES, {"x": x}))
+
+
+class TestScriptEngine(unittest.TestCase):
+    def setUp(self):
+        self.df = infer_df(pd.read_csv(SHOWCASE_DATA_DIR / "5_show_apply_function.csv"))
+
+    def assert_same_as_eval(self, col, raw_script):
+        expected = legacy_apply_script(self.df[col].copy(), raw_script)
+        result = process_operation_apply_script(self.df.copy(), col, raw_script)[col]
+        pd.testing.assert_series_equal(result, expected)
+
+    def test_numeric_scripts_are_vectorized(self):
+        for raw_script in VECTORIZED_SCRIPTS:
+            with self.subTest(script=raw_script):
+                with mock.patch.object(CompiledScript, "apply_per_row") as per_row:
+                    compile_script(raw_script).apply(self.df["Number Pow"])
+                per_row.assert_not_called()
+                self.assert_same_as_eval("Number Pow", raw_script)
+
+    def test_other_scripts_fall_back_to_eval(self):
+        for col, raw_script in ROW_BY_ROW_SCRIPTS:
+            with self.subTest(script=raw_script):
+                self.assert_same_as_eval(col, raw_script)
+
+    def test_missing_values_fall_back_to_eval(self):
+        col = pd.Series([1.5, None, 4.0])
+
+        pd.testing.assert_series_equal(
+            compile_script("max(x, 2)").apply(col), legacy_apply_script(col, "max(x, 2)")
+        )
+
+    def test_errors_are_raised_like_eval(self):
+        with self.assertRaises(ZeroDivisionError):
+            compile_script("1 / (x - 103)").apply(self.df["Number Pow"])
+        with self.assertRaises(ValueError):
+            compile_script("math.sqrt(x - 500)").apply(self.df["Number Pow"])
+
+
+class TestMemoizedScript(unittest.TestCase):
+    def test_repetitive_column_is_evaluated_once_per_value(self):
+        col = pd.Series(["a@x.org", "b@y.com", None, float("nan"), "a@x.org"] * 20, name="email")
+        stats = {}
+
+        result = compile_script("str(x).split('@')[0]").apply(col, stats)
+
+        pd.testing.assert_series_equal(result, legacy_apply_script(col, "str(x).split('@')[0]"))
+        # Two distinct values plus None and NaN, which str() tells apart.
+        self.assertEqual(stats, {"mode": "memoized", "evaluations": 4, "saved_evaluations": 96})
+
+    def test_memoized_result_keeps_apply_dtype_and_index(self):
+        cases = [
+            (pd.Series([1, None, 1, 2] * 5, dtype="Int64", index=range(100, 120)), "str(x)"),
+            (pd.Series(pd.to_datetime(["2020-01-01", None, "2021-01-01"] * 5)), "x.year"),
+            (pd.Series([1.5, 2.5] * 10), "x if x > 2 else str(x)"),
+        ]
+        for col, raw_script in cases:
+            with self.subTest(script=raw_script, dtype=str(col.dtype)):
+                stats = {}
+                result = compile_script(raw_script).apply(col, stats)
+                pd.testing.assert_series_equal(result, legacy_apply_script(col, raw_script))
+                self.assertEqual(stats["mode"], "memoized")
+
+    def test_values_a_script_can_tell_apart_are_not_memoized(self):
+        for col in [pd.Series([1, 1.0, True] * 10, dtype=object), pd.Series([0.0, -0.0] * 10)]:
+            with self.subTest(values=col.unique().tolist()):
+                stats = {}
+                result = compile_script("str(x)").apply(col, stats)
+                pd.testing.assert_series_equal(result, legacy_apply_script(col, "str(x)"))
+                self.assertEqual(stats["mode"], "per_row")
+
+    def test_distinct_column_is_evaluated_per_row(self):
+        stats = {}
+        compile_script("x.upper()").apply(pd.Series(["a", "b", "c", "a"]), stats)
+
+        self.assertEqual(stats, {"mode": "per_row", "evaluations": 4, "saved_evaluations": 0})
+
+
+if __name__ == "__main__":
+    unittest.main()
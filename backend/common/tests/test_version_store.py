@@ -0,0 +1,181 @@
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from backend.common import version_store
+from backend.common.row_filters import filter_dataframe
+from backend.common.version_store import (
+    get_dataframe,
+    get_dataframe_head,
+    get_empty_dataframe,
+    get_operation_input,
+    get_version_chain,
+    should_checkpoint,
+)
+
+
+def version(version_id, parent=None, materialized=False, **fields):
+    return {
+        "version_id": version_id,
+        **({"parent_version_id": parent} if parent else {}),
+        "materialized": materialized,
+        "status": "processed",
+        **fields,
+    }
+
+
+class TestVersionStore(unittest.TestCase):
+    def setUp(self):
+        self.versions = [
+            {"version_id": "v0", "operation": "initialize", "status": "processed"},
+            version("v1", "v0", operation="cast_to_numeric", column="number", replay_seconds=1.0),
+            version(
+                "v2", "v1", operation="fill_null", column="number", to_fill="0", replay_seconds=1.0
+            ),
+            version(
+                "v3",
+                "v2",
+                materialized=True,
+                operation="apply_script",
+                column="number",
+                script="x * 10",
+            ),
+            version(
+                "v4",
+                "v3",
+                operation="batch",
+                replay_seconds=1.0,
+                steps=[
+                    {"operation": "apply_script", "column": "number", "script": "x + 1"},
+                    {"operation": "apply_script", "column": "number", "script": "x * 2"},
+                ],
+            ),
+        ]
+        self.snapshots = {
+            "v0": pd.DataFrame({"number": ["1", None]}),
+            "v3": pd.DataFrame({"number": [10.0, 0.0]}),
+        }
+        patch = mock.patch.object(
+            version_store,
+            "get_dataframe_by_id",
+            side_effect=lambda _: {"versions": self.versions},
+        )
+        patch.start()
+        self.addCleanup(patch.stop)
+        patch = mock.patch.object(
+            version_store.minio_client,
+            "get_dataframe",
+            side_effect=self.read_snapshot,
+        )
+        self.get_snapshot = patch.start()
+        self.addCleanup(patch.stop)
+
+    def read_snapshot(self, _, version_id, columns=None, filters=None):
+        df = self.snapshots[version_id].copy()
+        if filters is not None:
+            df = filter_dataframe(df, filters)
+        return df if columns is None else df[columns]
+
+    def test_chain_stops_at_nearest_checkpoint(self):
+        self.assertEqual(get_version_chain("df", "v0"), ("v0", []))
+        chain = get_version_chain("df", "v2")
+        self.assertEqual(chain.checkpoint_version_id, "v0")
+        self.assertEqual([v["version_id"] for v in chain.versions], ["v1", "v2"])
+        self.assertEqual(get_version_chain("df", "v4").checkpoint_version_id, "v3")
+
+    def test_versions_are_replayed_from_their_checkpoint(self):
+        self.assertEqual(get_dataframe("df", "v2")["number"].tolist(), [1.0, 0.0])
+        self.assertEqual(get_dataframe("df", "v4")["number"].tolist(), [22.0, 2.0])
+
+    def test_head_is_replayed_on_the_first_rows_when_safe(self):
+        self.versions.append(version("v5", "v3", operation="cast_to_string", column="number"))
+        self.versions.append(
+            version("v6", "v5", operation="fill_null", column="number", strategy="bfill")
+        )
+        with mock.patch.object(
+            version_store.minio_client,
+            "get_dataframe_head",
+            side_effect=lambda _, version_id, rows: (self.snapshots[version_id].head(rows), 2),
+        ) as get_head:
+            head, row_cnt = get_dataframe_head("df", "v5", 1)
+            self.assertEqual(head["number"].tolist(), ["10.0"])
+            self.assertEqual(row_cnt, 2)
+
+            # A bfill needs the rows after.
+            head, row_cnt = get_dataframe_head("df", "v6", 1)
+            self.assertEqual(get_head.call_count, 1)
+            self.assertEqual(len(head), 1)
+
+    def test_filters_are_applied_to_the_checkpoint_when_replay_keeps_rows(self):
+        self.snapshots["v3"] = pd.DataFrame({"number": [10.0, 0.0], "id": [1, 2]})
+        self.versions.append(version("v5", "v3", operation="cast_to_string", column="number"))
+
+        result = get_dataframe("df", "v5", ["number"], [("id", "==", 2)])
+        self.assertEqual(result["number"].tolist(), ["0.0"])
+        self.assertEqual(self.get_snapshot.call_args.args[3], [("id", "==", 2)])
+
+        # Scripts change number, the filter is on its value once replayed.
+        result = get_dataframe("df", "v4", ["id"], [("number", "==", 2.0)])
+        self.assertEqual(result["id"].tolist(), [2])
+        self.assertIsNone(self.get_snapshot.call_args.args[3])
+        self.assertEqual(self.get_snapshot.call_args.args[2], ["id", "number"])
+
+    def test_operation_input_is_the_changed_columns_of_a_manifest(self):
+        self.snapshots["v3"] = pd.DataFrame(
+            {"number": [10.0, 0.0], "id": [1, 2], "name": ["a", "b"]}
+        )
+        manifest = {"columns": [{"name": name} for name in ["number", "id", "name"]]}
+        with mock.patch.object(version_store.minio_client, "get_manifest", return_value=manifest):
+            df, base_version_id = get_operation_input("df", "v4", ["name"])
+        # number changed since the checkpoint v3.
+        self.assertEqual(list(df.columns), ["number", "name"])
+        self.assertEqual(df["number"].tolist(), [22.0, 2.0])
+        self.assertEqual(base_version_id, "v3")
+
+        with mock.patch.object(version_store.minio_client, "get_manifest", return_value=None):
+            df, base_version_id = get_operation_input("df", "v4", ["name"])
+        self.assertEqual(list(df.columns), ["number", "id", "name"])
+        self.assertIsNone(base_version_id)
+
+    def test_operation_input_of_a_missing_column_raises(self):
+        for manifest in [{"columns": [{"name": "number"}]}, None]:
+            with self.subTest(manifest=manifest), mock.patch.object(
+                version_store.minio_client, "get_manifest", return_value=manifest
+            ), self.assertRaises(KeyError):
+                get_operation_input("df", "v4", ["missing"])
+
+    def test_empty_dataframe_has_the_dtypes_of_the_version(self):
+        with mock.patch.object(
+            version_store.minio_client,
+            "get_empty_dataframe",
+            side_effect=lambda _, version_id: self.snapshots[version_id].iloc[:0],
+        ) as get_empty:
+            self.assertEqual(get_empty_dataframe("df", "v0").dtypes["number"], object)
+            get_empty.assert_called_once_with("df", "v0")
+            self.get_snapshot.assert_not_called()
+
+            # cast_to_numeric isn't head safe, v1 is replayed whole.
+            empty = get_empty_dataframe("df", "v1")
+        self.assertEqual(len(empty), 0)
+        self.assertEqual(empty.dtypes["number"], "float64")
+
+    def test_failed_version_has_no_data(self):
+        self.versions[2]["status"] = "failed"
+
+        with self.assertRaises(ValueError):
+            get_dataframe("df", "v2")
+
+    def test_checkpoint_every_n_operations_or_replay_seconds(self):
+        with mock.patch.object(version_store, "CHECKPOINT_EVERY_OPERATIONS", 3):
+            self.assertFalse(should_checkpoint("df", "v1"))
+            self.assertTrue(should_checkpoint("df", "v2"))
+            # The batch counts as its two steps.
+            self.assertTrue(should_checkpoint("df", "v4"))
+        with mock.patch.object(version_store, "CHECKPOINT_REPLAY_SECONDS", 2.0):
+            self.assertTrue(should_checkpoint("df", "v2"))
+            self.assertFalse(should_checkpoint("df", "v4"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,157 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+import pandas as pd
+
+from common import views
+
+
+class TestProcessAsync(SimpleTestCase):
+    def setUp(self):
+        self.url = "/api/dataframes/frame/process-async/"
+        self.df = pd.DataFrame({"a": [1.5, 2.0], "b": ["x", None]})
+        patches = {
+            "insert_version": mock.patch.object(views, "insert_version"),
+            "should_checkpoint": mock.patch.object(views, "should_checkpoint", return_value=False),
+            "get_empty_dataframe": mock.patch.object(
+                views, "get_empty_dataframe", return_value=self.df.iloc[:0]
+            ),
+            "get_operation_input": mock.patch.object(
+                views, "get_operation_input", return_value=(self.df, "base")
+            ),
+            "get_dataframe": mock.patch.object(views, "get_dataframe"),
+            "process": mock.patch.object(views.multiprocessing, "Process"),
+        }
+        self.mocks = {name: patch.start() for name, patch in patches.items()}
+        for patch in patches.values():
+            self.addCleanup(patch.stop)
+
+    def test_dtypes_select_columns_without_reading_the_version(self):
+        response = self.client.post(
+            self.url,
+            {"version_id": "v1", "dtypes": "number", "operation": {"type": "cast_to_string"}},
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()["column"], ["a"])
+        self.mocks["get_operation_input"].assert_called_once_with("frame", "v1", ["a"])
+        self.mocks["get_dataframe"].assert_not_called()
+
+
+class TestProcessBatchAsync(SimpleTestCase):
+    def setUp(self):
+        self.url = "/api/dataframes/frame/process-batch-async/"
+        self.df = pd.DataFrame({"a": ["1", "2"], "b": ["x", None]})
+        patches = {
+            "insert_version": mock.patch.object(views, "insert_version"),
+            "should_checkpoint": mock.patch.object(views, "should_checkpoint", return_value=False),
+            "get_operation_input": mock.patch.object(
+                views, "get_operation_input", return_value=(self.df, "base")
+            ),
+            "process": mock.patch.object(views.multiprocessing, "Process"),
+        }
+        self.mocks = {name: patch.start() for name, patch in patches.items()}
+        for patch in patches.values():
+            self.addCleanup(patch.stop)
+
+    def post(self, data):
+        return self.client.post(self.url, data, content_type="application/json")
+
+    def test_starts_one_job_for_all_steps(self):
+        response = self.post(
+            {
+                "version_id": "v1",
+                "operations": [
+                    {"column": "a", "operation": {"type": "cast_to_numeric"}},
+                    {"column": "b", "operation": {"type": "fill_null", "to_fill": "y"}},
+                ],
+            }
+        )
+
+        self.assertEqual(response.status_code, 202)
+        steps = [
+            {"operation": "cast_to_numeric", "column": "a"},
+            {"operation": "fill_null", "to_fill": "y", "column": "b"},
+        ]
+        self.assertEqual(response.json()["steps"], steps)
+        self.assertEqual(response.json()["previous_version_id"], "v1")
+        self.mocks["get_operation_input"].assert_called_once_with("frame", "v1", ["a", "b"])
+        version = self.mocks["insert_version"].call_args.args[1]
+        self.assertEqual(version["parent_version_id"], "v1")
+        self.assertEqual(version["steps"], steps)
+        process_args = self.mocks["process"].call_args.kwargs["args"]
+        self.assertIs(process_args[0], self.df)
+        self.assertEqual(process_args[3], steps)
+        self.assertEqual(process_args[5], "base")
+        self.mocks["process"].return_value.start.assert_called_once_with()
+
+    def test_missing_columns_are_rejected_before_the_version_is_inserted(self):
+        self.mocks["get_operation_input"].side_effect = KeyError("columns ['c'] not found")
+        response = self.post(
+            {
+                "version_id": "v1",
+                "operations": [{"column": "c", "operation": {"type": "cast_to_numeric"}}],
+            }
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.mocks["insert_version"].assert_not_called()
+        self.mocks["process"].assert_not_called()
+
+    def test_rejects_incomplete_requests(self):
+        cases = {
+            "no version": {"operations": [{"column": "a", "operation": {"type": "fill_null"}}]},
+            "no operations": {"version_id": "v1"},
+            "empty operations": {"version_id": "v1", "operations": []},
+            "no column": {"version_id": "v1", "operations": [{"operation": {"type": "fill_null"}}]},
+            "no type": {"version_id": "v1", "operations": [{"column": "a", "operation": {}}]},
+            "batch step": {
+                "version_id": "v1",
+                "operations": [{"column": "a", "operation": {"type": "batch"}}],
+            },
+        }
+        for name, data in cases.items():
+            with self.subTest(case=name):
+                self.assertEqual(self.post(data).status_code, 400)
+        self.mocks["insert_version"].assert_not_called()
+        self.mocks["process"].assert_not_called()
+
+
+class TestPreviewOperation(SimpleTestCase):
+    def setUp(self):
+        self.url = "/api/dataframes/frame/preview/"
+        self.df = pd.DataFrame({"a": ["1", "2"]})
+        patch = mock.patch.object(
+            views,
+            "preview_operation",
+            return_value={"before": self.df, "after": self.df, "script_stats": {}, "seconds": 0},
+        )
+        self.preview = patch.start()
+        self.addCleanup(patch.stop)
+
+    def post(self, **data):
+        data = {"version_id": "v1", "column": "a", "operation": {"type": "cast_to_numeric"}, **data}
+        return self.client.post(self.url, data, content_type="application/json")
+
+    def test_rows_must_be_positive(self):
+        for rows in [0, -5]:
+            with self.subTest(rows=rows):
+                self.assertEqual(self.post(rows=rows).status_code, 400)
+        self.preview.assert_not_called()
+
+    def test_random_is_parsed_as_a_boolean(self):
+        for value, expected in [(True, True), ("true", True), (False, False), ("false", False)]:
+            with self.subTest(random=value):
+                self.assertEqual(self.post(random=value).status_code, 200)
+                self.assertIs(self.preview.call_args.kwargs["random"], expected)
+        self.assertEqual(self.post(random="maybe").status_code, 400)
+
+    def test_only_errors_of_the_operation_are_bad_requests(self):
+        self.preview.side_effect = ZeroDivisionError("division by zero")
+        self.assertEqual(self.post().status_code, 400)
+
+        self.preview.side_effect = ConnectionError("storage unreachable")
+        with self.assertRaises(ConnectionError):
+            self.post()
@@ -0,0 +1,225 @@
+import logging
+from typing import NamedTuple
+
+import pandas as pd
+
+from . import minio_client
+from .data_processors import apply_operation
+from .mongo_client import get_dataframe_by_id
+from .operation_planner import operation_columns
+from .processing_enum import FillStrategy, OperationType, ProcessStatus
+from .row_filters import filter_columns, filter_dataframe
+
+
+logger = logging.getLogger(__name__)
+
+# Operations whose result on the first rows of a column is exactly the first
+# rows of their result on the whole column, dtype included. Most others see
+# the whole column: to_numeric picks int or float from every value, category
+# lists every value, a mean or a bfill depends on later rows.
+HEAD_SAFE_OPERATIONS = ["cast_to_string", "cast_to_boolean", "cast_to_timedelta"]
+HEAD_SAFE_FILL_STRATEGIES = [FillStrategy.CONSTANT, FillStrategy.FFILL]
+# Of those, the operations whose result on any rows of a column is those rows
+# of their result on the whole column, they can be replayed after filtering
+# rows. A forward fill needs the rows before.
+ROW_SAFE_OPERATIONS = HEAD_SAFE_OPERATIONS
+ROW_SAFE_FILL_STRATEGIES = [FillStrategy.CONSTANT]
+
+# A version is uploaded (a checkpoint) once this many operations separate it
+# from the previous checkpoint, or once replaying them takes this long.
+CHECKPOINT_EVERY_OPERATIONS = 10
+CHECKPOINT_REPLAY_SECONDS = 10.0
+
+
+class VersionChain(NamedTuple):
+    checkpoint_version_id: str
+    # Versions to replay on top of the checkpoint, oldest first.
+    versions: list
+
+
+def is_materialized(version: dict) -> bool:
+    # Versions from before the operation log were all uploaded.
+    return version.get("materialized", True)
+
+
+def get_version_chain(dataframe_id: str, version_id: str) -> VersionChain:
+    """Return the nearest checkpoint of version_id and the versions above it."""
+    dataframe_meta = get_dataframe_by_id(dataframe_id)
+    if dataframe_meta is None:
+        raise KeyError(f"dataframe {dataframe_id} not found")
+    versions = {version["version_id"]: version for version in dataframe_meta["versions"]}
+
+    chain = []
+    version = versions[version_id]
+    while not is_materialized(version):
+        if version.get("status") == ProcessStatus.FAIL:
+            raise ValueError(f"version {version['version_id']} failed, it has no data")
+        chain.append(version)
+        version = versions[version["parent_version_id"]]
+    return VersionChain(version["version_id"], chain[::-1])
+
+
+def get_dataframe(
+    dataframe_id: str,
+    version_id: str,
+    columns: list | None = None,
+    filters: list | None = None,
+) -> pd.DataFrame:
+    """Return the data of any version, downloaded or replayed.
+
+    The nearest checkpoint is downloaded and the operations of the versions
+    above it are applied again, in order. With columns, only those are
+    downloaded and replayed, every operation works on a single column.
+    filters (see row_filters) are applied to the download when replaying
+    gives the same rows either way, see can_filter_checkpoint, otherwise to
+    the replayed version.
+    """
+    chain = get_version_chain(dataframe_id, version_id)
+    if filters is not None and not can_filter_checkpoint(chain, filters):
+        read_columns = None
+        if columns is not None:
+            read_columns = list(dict.fromkeys(columns + filter_columns(filters)))
+        df = filter_dataframe(get_dataframe(dataframe_id, version_id, read_columns), filters)
+        return df if columns is None else df[columns]
+
+    df = minio_client.get_dataframe(dataframe_id, chain.checkpoint_version_id, columns, filters)
+    for version in chain.versions:
+        df = replay_version(df, version)
+    if chain.versions:
+        logger.info(
+            "version %s replayed from %s over %s versions",
+            version_id,
+            chain.checkpoint_version_id,
+            len(chain.versions),
+        )
+    return df
+
+
+def can_filter_checkpoint(chain: VersionChain, filters: list) -> bool:
+    """Whether filtering the checkpoint then replaying gives the rows of the
+    version matching filters: no operation changes a filter column, and each
+    gives the same values on any rows of a column as on the whole of it.
+    """
+    filtered = set(filter_columns(filters))
+    return all(
+        is_row_safe(step) and not filtered.intersection(operation_columns(step["column"]))
+        for version in chain.versions
+        for step in version_steps(version)
+    )
+
+
+def get_operation_input(
+    dataframe_id: str, version_id: str, columns: list
+) -> tuple[pd.DataFrame, str | None]:
+    """Return what operations on columns of version_id need of it, and the
+    base_version_id to upload their result with (see
+    minio_client.upload_dataframe).
+
+    When the checkpoint of version_id has a manifest, only columns and those
+    changed since the checkpoint are read, the others are taken from its
+    manifest. Otherwise the whole version is read and the base is None.
+    Raise KeyError if one of columns isn't in the version, no operation adds
+    or removes a column so the checkpoint's are the version's.
+    """
+    chain = get_version_chain(dataframe_id, version_id)
+    manifest = minio_client.get_manifest(dataframe_id, chain.checkpoint_version_id)
+    if manifest is None:
+        df = get_dataframe(dataframe_id, version_id)
+        check_columns(columns, df.columns)
+        return df, None
+    names = [entry["name"] for entry in manifest["columns"]]
+    check_columns(columns, names)
+    # Repeated names can't be told apart in a manifest.
+    if len(set(names)) < len(names):
+        return get_dataframe(dataframe_id, version_id), None
+
+    changed = list(columns)
+    for version in chain.versions:
+        for step in version_steps(version):
+            changed.extend(operation_columns(step["column"]))
+    changed = [name for name in names if name in changed]
+    return get_dataframe(dataframe_id, version_id, changed), chain.checkpoint_version_id
+
+
+def get_empty_dataframe(dataframe_id: str, version_id: str) -> pd.DataFrame:
+    """Return a version without its rows, for its columns and dtypes.
+
+    A checkpoint's are read from its Parquet footers only. Replayed
+    operations can change dtypes, so those of a replayed version come from
+    replaying its first row, see get_dataframe_head.
+    """
+    chain = get_version_chain(dataframe_id, version_id)
+    if not chain.versions:
+        return minio_client.get_empty_dataframe(dataframe_id, version_id)
+    return get_dataframe_head(dataframe_id, version_id, 1)[0].iloc[:0]
+
+
+def check_columns(columns: list, names) -> None:
+    missing = [column for column in columns if column not in names]
+    if missing:
+        raise KeyError(f"columns {missing} not found")
+
+
+def get_dataframe_head(dataframe_id: str, version_id: str, rows: int) -> tuple[pd.DataFrame, int]:
+    """Return the first rows of a version and its number of rows.
+
+    Only the first row groups of the checkpoint are read when every operation
+    replayed on top of it is head safe, otherwise the whole version is.
+    """
+    chain = get_version_chain(dataframe_id, version_id)
+    if not all(is_head_safe(step) for v in chain.versions for step in version_steps(v)):
+        df = get_dataframe(dataframe_id, version_id)
+        return df.iloc[:rows], len(df)
+
+    df, row_cnt = minio_client.get_dataframe_head(dataframe_id, chain.checkpoint_version_id, rows)
+    for version in chain.versions:
+        df = replay_version(df, version)
+    return df, row_cnt
+
+
+def is_head_safe(step: dict) -> bool:
+    if step["operation"] == OperationType.FILL_NULL:
+        return step.get("strategy", FillStrategy.CONSTANT) in HEAD_SAFE_FILL_STRATEGIES
+    return step["operation"] in HEAD_SAFE_OPERATIONS
+
+
+def is_row_safe(step: dict) -> bool:
+    if step["operation"] == OperationType.FILL_NULL:
+        return step.get("strategy", FillStrategy.CONSTANT) in ROW_SAFE_FILL_STRATEGIES
+    return step["operation"] in ROW_SAFE_OPERATIONS
+
+
+def replay_version(df: pd.DataFrame, version: dict) -> pd.DataFrame:
+    for step in version_steps(version):
+        present = [c for c in operation_columns(step["column"]) if c in df.columns]
+        if not present:
+            continue
+        column = present if isinstance(step["column"], list) else step["column"]
+        df = apply_operation(
+            df,
+            step["operation"],
+            column,
+            step.get("script"),
+            step.get("to_fill"),
+            strategy=step.get("strategy"),
+        )
+    return df
+
+
+def version_steps(version: dict) -> list:
+    # The steps actually run, when the planner rewrote the requested ones.
+    if "plan" in version:
+        return version["plan"]
+    if version["operation"] == OperationType.BATCH:
+        return version["steps"]
+    return [version]
+
+
+def should_checkpoint(dataframe_id: str, parent_version_id: str, operation_cnt: int = 1) -> bool:
+    """Whether a version of operation_cnt operations on top of parent_version_id
+    should be uploaded rather than left to replay.
+    """
+    chain = get_version_chain(dataframe_id, parent_version_id)
+    replay_cnt = operation_cnt + sum(len(version_steps(v)) for v in chain.versions)
+    replay_seconds = sum(v.get("replay_seconds", 0) for v in chain.versions)
+    return replay_cnt >= CHECKPOINT_EVERY_OPERATIONS or replay_seconds >= CHECKPOINT_REPLAY_SECONDS
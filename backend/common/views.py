@@ -1,6 +1,7 @@
 import json
 import logging
 import multiprocessing
+import tempfile
 import time
 import traceback
 import uuid
@@ -10,28 +11,84 @@ from django.http import FileResponse
 from django.views import generic
 
 import pandas as pd
+import pyarrow as pa
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 
+from .arrow_dtypes import ARROW_CSV_OPTIONS
 from .data_processors import (
     create_dataframe_async,
     map_df_to_json,
+    process_batch_async,
     process_dataframe_async,
 )
-from .minio_client import get_dataframe
+from .inference_cache import inference_cache
+from .ingestion import create_dataframe_streaming_async
 from .mongo_client import (
     get_dataframe_by_id,
     insert_version,
     save_to_mongo,
 )
+from .operation_planner import operation_columns
+from .preview import PREVIEW_ROWS, PREVIEW_SEED, preview_operation, version_cache
 from .processing_enum import OperationType, ProcessStatus
+from .version_store import (
+    get_dataframe,
+    get_dataframe_head,
+    get_empty_dataframe,
+    get_operation_input,
+    should_checkpoint,
+)
 
 
 logger = logging.getLogger(__name__)
 
+# CSV uploads from this size on (or with ?streaming=true) are streamed to
+# Parquet in chunks instead of being loaded in memory.
+STREAMING_INGESTION_MIN_BYTES = 256 * 1024 * 1024
+
+
+# Operations a batch step may not be, they don't apply to an existing version.
+NON_STEP_OPERATIONS = [OperationType.INITIALIZE, OperationType.BATCH]
+
+
+def to_operation_step(column, operation) -> dict | None:
+    """Return the version fields of one operation, None if a part is missing."""
+    if column is None or not isinstance(operation, dict):
+        return None
+    operation_type = operation.get("type", None)
+    if operation_type is None or operation_type in NON_STEP_OPERATIONS:
+        return None
+    raw_script = operation.get("script", None)
+    to_fill = operation.get("to_fill", None)
+    strategy = operation.get("strategy", None)
+    return {
+        "operation": operation_type,
+        **({"script": raw_script} if raw_script is not None else {}),
+        **({"to_fill": to_fill} if to_fill is not None else {}),
+        **({"strategy": strategy} if strategy is not None else {}),
+        "column": column,
+    }
+
+
+def parse_flag(value) -> bool:
+    """Return a JSON boolean, or "true"/"false" from a form, as a bool."""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.lower() in ["true", "false"]:
+        return value.lower() == "true"
+    raise ValueError(f"{value} isn't a boolean")
+
+
+def save_upload_to_disk(file_obj) -> str:
+    with tempfile.NamedTemporaryFile(suffix=".csv", delete=False) as destination:
+        for chunk in file_obj.chunks():
+            destination.write(chunk)
+    return destination.name
+
 
 class IndexView(generic.TemplateView):
     template_name = "common/index.html"
@@ -51,20 +108,22 @@ class ProcessDataFrameView(viewsets.ViewSet):
         file_obj = request.FILES["file"]
 
         if not file_obj:
-            return Response(
-                {"message": "No file uploaded"}, status=status.HTTP_400_BAD_REQUEST
-            )
+            return Response({"message": "No file uploaded"}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            if file_obj.name.endswith(".csv"):
-                df = pd.read_csv(file_obj)
+            streaming = file_obj.name.endswith(".csv") and (
+                file_obj.size >= STREAMING_INGESTION_MIN_BYTES
+                or request.query_params.get("streaming") == "true"
+            )
+            if streaming:
+                source = save_upload_to_disk(file_obj)
+            elif file_obj.name.endswith(".csv"):
+                source = pd.read_csv(file_obj, **ARROW_CSV_OPTIONS)
             elif file_obj.name.endswith(".xls") or file_obj.name.endswith(".xlsx"):
-                df = pd.read_excel(file_obj)
+                source = pd.read_excel(file_obj)
             else:
                 return Response(
-                    {
-                        "message": "Unsupported file type, only support .csv, .xls, .xlsx"
-                    },
+                    {"message": "Unsupported file type, only support .csv, .xls, .xlsx"},
                     status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
                 )
 
@@ -82,8 +141,8 @@ class ProcessDataFrameView(viewsets.ViewSet):
             save_to_mongo(to_save)
 
             process = multiprocessing.Process(
-                target=create_dataframe_async,
-                args=(df, to_save["dataframe_id"], init_version_id),
+                target=(create_dataframe_streaming_async if streaming else create_dataframe_async),
+                args=(source, to_save["dataframe_id"], init_version_id),
             )
             process.start()
 
@@ -98,9 +157,7 @@ class ProcessDataFrameView(viewsets.ViewSet):
         except Exception as e:
             logger.error("exception %s", e)
             traceback.print_exception(e)
-            return Response(
-                {"message": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+            return Response({"message": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     @action(
         detail=False,
@@ -112,36 +169,55 @@ class ProcessDataFrameView(viewsets.ViewSet):
         dataframe_id = kwargs.get("dataframe_id")
         request_data = request.data
         version_id = request_data.get("version_id", None)
+        # A column, a list of columns, or dtypes selecting the columns.
         column = request_data.get("column", None)
+        dtypes = request_data.get("dtypes", None)
         operation = request_data.get("operation", None)
         operation_type = None
         if operation:
             operation_type = operation.get("type", None)
 
-        if None in [dataframe_id, version_id, column, operation, operation_type]:
+        if column is None and dtypes is not None and version_id is not None:
+            try:
+                # Any selector of DataFrame.select_dtypes, e.g. "number".
+                empty = get_empty_dataframe(dataframe_id, version_id)
+                column = list(empty.select_dtypes(include=dtypes).columns)
+            except (KeyError, TypeError, ValueError) as e:
+                return Response({"message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if None in [dataframe_id, version_id, column, operation, operation_type] or column == []:
             return Response(
-                {
-                    "message": "Missing parameters. Please provide all required parameters."
-                },
+                {"message": "Missing parameters. Please provide all required parameters."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
         raw_script = operation.get("script", None)
         to_fill = operation.get("to_fill", None)
+        strategy = operation.get("strategy", None)
+
+        # Only the columns of the operation are read, see get_operation_input.
+        # Before the version is inserted, an error leaves none behind.
+        try:
+            prev_dataframe, base_version_id = get_operation_input(
+                dataframe_id, version_id, operation_columns(column)
+            )
+        except (KeyError, ValueError) as e:
+            return Response({"message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         updated_version_id = str(uuid.uuid4())
+        checkpoint = should_checkpoint(dataframe_id, version_id)
         update = {
             "version_id": updated_version_id,
+            "parent_version_id": version_id,
             "operation": operation_type,
             **({"script": raw_script} if raw_script is not None else {}),
             **({"to_fill": to_fill} if to_fill is not None else {}),
+            **({"strategy": strategy} if strategy is not None else {}),
             "column": column,
+            "materialized": checkpoint,
             "status": ProcessStatus.PROCESSING,
         }
         insert_version(dataframe_id, update)
 
-        prev_dataframe = get_dataframe(dataframe_id, version_id)
-
         process = multiprocessing.Process(
             target=process_dataframe_async,
             args=(
@@ -152,6 +228,9 @@ class ProcessDataFrameView(viewsets.ViewSet):
                 column,
                 raw_script,
                 to_fill,
+                checkpoint,
+                strategy,
+                base_version_id,
             ),
         )
         process.start()
@@ -166,6 +245,172 @@ class ProcessDataFrameView(viewsets.ViewSet):
         }
         return Response(response_data, status=status.HTTP_202_ACCEPTED)
 
+    @action(
+        detail=False,
+        methods=["post"],
+        permission_classes=[AllowAny],
+        url_path="dataframes/(?P<dataframe_id>[^/.]+)/process-batch-async",
+    )
+    def process_batch_async(self, request, *args, **kwargs):
+        """Apply an ordered list of operations in one job.
+
+        The columns of the steps are downloaded once and the result uploaded
+        once, as a single batch version that lists every step.
+        """
+        dataframe_id = kwargs.get("dataframe_id")
+        request_data = request.data
+        version_id = request_data.get("version_id", None)
+        operations = request_data.get("operations", None)
+
+        steps = None
+        if isinstance(operations, list) and operations:
+            steps = [
+                to_operation_step(operation.get("column", None), operation.get("operation", None))
+                if isinstance(operation, dict)
+                else None
+                for operation in operations
+            ]
+        if None in [dataframe_id, version_id, steps] or None in steps:
+            return Response(
+                {
+                    "message": "Missing parameters. Please provide a version_id and a non empty list of operations, each with a column and an operation type."
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # Before the version is inserted, an error leaves none behind.
+        try:
+            prev_dataframe, base_version_id = get_operation_input(
+                dataframe_id,
+                version_id,
+                [name for step in steps for name in operation_columns(step["column"])],
+            )
+        except (KeyError, ValueError) as e:
+            return Response({"message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        updated_version_id = str(uuid.uuid4())
+        checkpoint = should_checkpoint(dataframe_id, version_id, len(steps))
+        update = {
+            "version_id": updated_version_id,
+            "parent_version_id": version_id,
+            "operation": OperationType.BATCH,
+            "steps": steps,
+            "materialized": checkpoint,
+            "status": ProcessStatus.PROCESSING,
+        }
+        insert_version(dataframe_id, update)
+
+        process = multiprocessing.Process(
+            target=process_batch_async,
+            args=(
+                prev_dataframe,
+                dataframe_id,
+                updated_version_id,
+                steps,
+                checkpoint,
+                base_version_id,
+            ),
+        )
+        process.start()
+
+        response_data = {
+            "dataframe_id": dataframe_id,
+            "previous_version_id": version_id,
+            "version_id": updated_version_id,
+            "operation_type": OperationType.BATCH,
+            "steps": steps,
+            "status": ProcessStatus.PROCESSING,
+        }
+        return Response(response_data, status=status.HTTP_202_ACCEPTED)
+
+    @action(
+        detail=False,
+        methods=["post"],
+        permission_classes=[AllowAny],
+        url_path="dataframes/(?P<dataframe_id>[^/.]+)/preview",
+    )
+    def preview_operation(self, request, *args, **kwargs):
+        """Run an operation on a sample of a version and return the result
+        inline, no version is created.
+
+        rows (default PREVIEW_ROWS) are the first ones, or picked at random
+        with seed when random is true.
+        """
+        dataframe_id = kwargs.get("dataframe_id")
+        request_data = request.data
+        version_id = request_data.get("version_id", None)
+        column = request_data.get("column", None)
+        step = to_operation_step(column, request_data.get("operation", None))
+        if None in [dataframe_id, version_id, step]:
+            return Response(
+                {
+                    "message": "Missing parameters. Please provide a version_id, a column and an operation type."
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            rows = int(request_data.get("rows", PREVIEW_ROWS))
+            seed = int(request_data.get("seed", PREVIEW_SEED))
+            random = parse_flag(request_data.get("random", False))
+        except (TypeError, ValueError):
+            return Response(
+                {"message": "rows and seed must be integers, random a boolean."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if rows < 1:
+            return Response(
+                {"message": "rows must be at least 1."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            preview = preview_operation(
+                dataframe_id,
+                version_id,
+                step["operation"],
+                step["column"],
+                step.get("script"),
+                step.get("to_fill"),
+                step.get("strategy"),
+                rows=rows,
+                random=random,
+                seed=seed,
+            )
+        except (ValueError, TypeError, KeyError, ArithmeticError, SyntaxError, NameError) as e:
+            # What the script or the value to fill can raise, shown to the user.
+            logger.info("preview failed, %s", e)
+            return Response({"message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = {
+            "dataframe_id": dataframe_id,
+            "version_id": version_id,
+            "column": column,
+            "operation_type": step["operation"],
+            "before": json.loads(map_df_to_json(preview["before"])),
+            "data": json.loads(map_df_to_json(preview["after"])),
+            "script_stats": preview["script_stats"],
+            "seconds": preview["seconds"],
+        }
+        return Response(response, status=status.HTTP_200_OK)
+
+    @action(
+        detail=False,
+        methods=["get"],
+        permission_classes=[AllowAny],
+        url_path="preview-cache/stats",
+    )
+    def get_preview_cache_stats(self, request, *args, **kwargs):
+        return Response(version_cache.stats(), status=status.HTTP_200_OK)
+
+    @action(
+        detail=False,
+        methods=["get"],
+        permission_classes=[AllowAny],
+        url_path="inference-cache/stats",
+    )
+    def get_inference_cache_stats(self, request, *args, **kwargs):
+        return Response(inference_cache.stats(), status=status.HTTP_200_OK)
+
     @action(
         detail=False,
         methods=["get"],
@@ -176,9 +421,7 @@ class ProcessDataFrameView(viewsets.ViewSet):
         dataframe_id = kwargs.get("dataframe_id")
         if dataframe_id is None:
             return Response(
-                {
-                    "message": "Missing parameters. Please provide all required parameters."
-                },
+                {"message": "Missing parameters. Please provide all required parameters."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
         dataframe_meta = get_dataframe_by_id(dataframe_id)
@@ -199,10 +442,9 @@ class ProcessDataFrameView(viewsets.ViewSet):
         limit_size = 100000
         dataframe_id = kwargs.get("dataframe_id")
         version_id = kwargs.get("version_id")
-        dataframe = get_dataframe(dataframe_id, version_id)
-        # limit code display on FE
-        json_processed_data = json.loads(map_df_to_json(dataframe[:limit_size]))
-        actual_size = len(dataframe)
+        # limit code display on FE, only the rows shown are read.
+        dataframe, actual_size = get_dataframe_head(dataframe_id, version_id, limit_size)
+        json_processed_data = json.loads(map_df_to_json(dataframe))
         response = {
             "dataframe_id": dataframe_id,
             "version_id": version_id,
@@ -219,9 +461,24 @@ class ProcessDataFrameView(viewsets.ViewSet):
         url_path="dataframes/(?P<dataframe_id>[^/.]+)/download/(?P<version_id>[^/.]+)",
     )
     def download_dataframe(self, request, *args, **kwargs):
+        """Download a version as CSV.
+
+        ?columns=a,b downloads only those columns and ?filters=<JSON> only
+        the rows matching filters, e.g. [["age", ">=", 18]], see row_filters.
+        """
         dataframe_id = kwargs.get("dataframe_id")
         version_id = kwargs.get("version_id")
-        dataframe = get_dataframe(dataframe_id, version_id)
+        columns = request.query_params.get("columns", None)
+        filters = request.query_params.get("filters", None)
+        try:
+            dataframe = get_dataframe(
+                dataframe_id,
+                version_id,
+                columns.split(",") if columns else None,
+                json.loads(filters) if filters else None,
+            )
+        except (KeyError, ValueError, pa.ArrowException) as e:
+            return Response({"message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         buff = BytesIO()
         dataframe.to_csv(path_or_buf=buff)
         buff.seek(0)